@@ -6,10 +6,17 @@ from django.http import HttpResponse
 from django.urls import path, reverse
 from django.shortcuts import render
 
-from apps.assistant.models import AssistantSession, AIMessage, OpenAIRequestLog
+from apps.assistant.models import AssistantSession, OpenAIRequestLog, OpenAIUsageRollup, PromptBlob, ResponseCacheRollup
+from apps.chat.admin import ConversationMessageInline
 
 change_list_template = "admin/change_list.html"
 
+
+# 📌 **Historial de la sesión de IA, leído del registro de conversación**
+class AssistantConversationMessageInline(ConversationMessageInline):
+    fk_name = "assistant_session"
+
+
 # 📌 **Admin de AssistantSession**
 @admin.register(AssistantSession)
 class AssistantSessionAdmin(admin.ModelAdmin):
@@ -25,6 +32,7 @@ class AssistantSessionAdmin(admin.ModelAdmin):
     )
 
     readonly_fields = ("session_id", "start_time", "end_time")
+    inlines = [AssistantConversationMessageInline]
 
     def session_duration_formatted(self, obj):
         """Calcula la duración de la sesión para mostrar en la lista."""
@@ -35,39 +43,33 @@ class AssistantSessionAdmin(admin.ModelAdmin):
     
     session_duration_formatted.short_description = "Session Duration"
 
-# 📌 **Admin de AIMessage**
-@admin.register(AIMessage)
-class AIMessageAdmin(admin.ModelAdmin):
-    list_display = ("tenant", "session", "role", "short_content", "timestamp")
-    list_filter = ("role", "tenant", "timestamp")
-    search_fields = ("session__session_id", "content", "tenant__name")
-    ordering = ("-timestamp",)
-
-    fieldsets = (
-        ("Message Details", {"fields": ("tenant", "session", "role", "timestamp")}),
-        ("Content", {"fields": ("content",)}),
-    )
-
-    readonly_fields = ("timestamp",)
-
-    def short_content(self, obj):
-        """Muestra un preview corto del contenido del mensaje."""
-        return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
 
-    short_content.short_description = "Message Preview"
+# 📌 **Admin de PromptBlob**
+@admin.register(PromptBlob)
+class PromptBlobAdmin(admin.ModelAdmin):
+    list_display = ("hash", "kind", "size", "created_at")
+    list_filter = ("kind", "created_at")
+    search_fields = ("hash",)
+    ordering = ("-created_at",)
+    readonly_fields = ("hash", "kind", "size", "created_at")
 
 
 # 📌 **Admin de OpenAIRequestLog**
 @admin.register(OpenAIRequestLog)
 class OpenAIRequestLogAdmin(admin.ModelAdmin):
-    list_display = ("request_id", "tenant", "endpoint", "status_code", "timestamp")
-    list_filter = ("status_code", "endpoint", "tenant", "timestamp")
+    list_display = ("request_id", "tenant", "purpose", "route", "model", "status_code", "latency_ms", "total_tokens", "cost_usd", "timestamp")
+    list_filter = ("status_code", "purpose", "route", "endpoint", "model", "tenant", "timestamp")
     search_fields = ("request_id", "endpoint", "tenant__name")
     ordering = ("-timestamp",)
+    list_select_related = ("tenant",)
+    raw_id_fields = ("session", "prompt_blob", "menu_blob")
 
     fieldsets = (
-        ("Request Details", {"fields": ("request_id", "tenant", "endpoint", "status_code", "timestamp")}),
-        ("Request & Response Data", {"fields": ("payload", "response")}),
+        ("Request Details", {"fields": ("request_id", "tenant", "session", "endpoint", "purpose", "route", "model", "status_code", "timestamp")}),
+        ("Usage", {"fields": ("latency_ms", "prompt_tokens", "completion_tokens", "total_tokens", "cost_usd")}),
+        ("Prompt Breakdown", {"fields": ("tenant_prompt_tokens", "menu_tokens", "history_tokens")}),
+        ("Request & Response Data", {"fields": ("prompt_blob", "menu_blob", "request_delta", "response_delta")}),
+        ("Legacy Data", {"fields": ("payload", "response"), "classes": ("collapse",)}),
     )
 
     readonly_fields = ("timestamp",)
@@ -79,15 +81,53 @@ class OpenAIRequestLogAdmin(admin.ModelAdmin):
                 "request_id": req.request_id,
                 "tenant": req.tenant.name,
                 "endpoint": req.endpoint,
+                "purpose": req.purpose,
+                "route": req.route,
+                "model": req.model,
                 "status_code": req.status_code,
                 "timestamp": req.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "latency_ms": req.latency_ms,
+                "prompt_tokens": req.prompt_tokens,
+                "completion_tokens": req.completion_tokens,
+                "total_tokens": req.total_tokens,
+                "cost_usd": str(req.cost_usd) if req.cost_usd is not None else None,
+                "prompt_blob": req.prompt_blob_id,
+                "menu_blob": req.menu_blob_id,
+                "request_delta": req.request_delta,
+                "response_delta": req.response_delta,
                 "payload": req.payload,
                 "response": req.response,
             }
-            for req in queryset
+            for req in queryset.select_related("tenant")
         ]
         response = HttpResponse(json.dumps(data, indent=4), content_type="application/json")
         response["Content-Disposition"] = 'attachment; filename="openai_requests.json"'
         return response
 
     export_requests_as_json.short_description = "📄 Export OpenAI Requests as JSON"
+
+
+# 📌 **Admin de OpenAIUsageRollup**
+@admin.register(OpenAIUsageRollup)
+class OpenAIUsageRollupAdmin(admin.ModelAdmin):
+    list_display = ("date", "tenant", "purpose", "model", "calls", "errors", "total_tokens", "cost_usd", "avg_latency_ms")
+    list_filter = ("purpose", "model", "tenant", "date")
+    search_fields = ("tenant__name",)
+    ordering = ("-date", "tenant")
+    list_select_related = ("tenant",)
+
+    def avg_latency_ms(self, obj):
+        """Latencia media por llamada en el día."""
+        return round(obj.latency_ms / obj.calls) if obj.calls else 0
+
+    avg_latency_ms.short_description = "Avg Latency (ms)"
+
+
+# 📌 **Admin de ResponseCacheRollup**
+@admin.register(ResponseCacheRollup)
+class ResponseCacheRollupAdmin(admin.ModelAdmin):
+    list_display = ("date", "tenant", "hits", "misses", "latency_saved_ms")
+    list_filter = ("tenant", "date")
+    search_fields = ("tenant__name",)
+    ordering = ("-date", "tenant")
+    list_select_related = ("tenant",)
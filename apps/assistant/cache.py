@@ -0,0 +1,98 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .intents import normalize_message
+from .models import ResponseCacheRollup
+
+
+def content_version(content):
+    """Huella corta y estable de un contenido (prompt, menú...) para usarla en claves de caché."""
+    return hashlib.sha1(str(content).encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Caché en memoria de respuestas informativas del asistente, con TTL y expulsión LRU.
+    Las claves incluyen tenant, versión de menú, versión de prompt, idioma y la pregunta normalizada,
+    por lo que un cambio de menú o de prompt invalida las entradas sin necesidad de borrarlas.
+    Los aciertos y fallos de cada tenant se guardan en la BD con `record_response_cache_lookup`.
+    """
+
+    def __init__(self, max_entries=1000, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build_key(tenant_id, menu_version, prompt_version, language, question):
+        return (str(tenant_id), str(menu_version), str(prompt_version), language, normalize_message(question))
+
+    def get(self, key):
+        """Devuelve la entrada cacheada (`{"response", "latency_ms", ...}`) o None si no está o ha caducado."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry
+
+            if entry:
+                del self._entries[key]
+            return None
+
+    def set(self, key, response, latency_ms):
+        """Guarda una respuesta junto con la latencia que costó generarla."""
+        with self._lock:
+            self._entries[key] = {
+                "response": response,
+                "latency_ms": latency_ms,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def record_response_cache_lookup(tenant, entry):
+    """
+    Suma un acierto (con la latencia que ahorra `entry`) o un fallo al agregado diario del tenant, en la BD
+    para que lo vean todos los procesos. Solo se llama en los turnos que pueden cachearse.
+    """
+    rollup, _ = ResponseCacheRollup.objects.get_or_create(tenant=tenant, date=timezone.localdate())
+    if entry:
+        values = {"hits": F("hits") + 1, "latency_saved_ms": F("latency_saved_ms") + round(entry["latency_ms"])}
+    else:
+        values = {"misses": F("misses") + 1}
+    ResponseCacheRollup.objects.filter(pk=rollup.pk).update(**values)
+
+
+def response_cache_report(days=30):
+    """Aciertos, fallos, tasa de acierto y latencia ahorrada por tenant en los últimos `days` días."""
+    rows = (
+        ResponseCacheRollup.objects.filter(date__gte=timezone.localdate() - timedelta(days=days))
+        .values("tenant__name")
+        .annotate(hits=Sum("hits"), misses=Sum("misses"), latency_saved_ms=Sum("latency_saved_ms"))
+        .order_by("tenant__name")
+    )
+    report = []
+    for row in rows:
+        lookups = row["hits"] + row["misses"]
+        report.append({**row, "hit_rate": round(row["hits"] / lookups * 100, 1) if lookups else 0.0})
+    return report
+
+
+response_cache = ResponseCache(
+    max_entries=settings.ASSISTANT_RESPONSE_CACHE["MAX_ENTRIES"],
+    ttl=settings.ASSISTANT_RESPONSE_CACHE["TTL"],
+)
@@ -0,0 +1,134 @@
+import re
+
+from .intents import normalize_message
+
+# 🔹 Estados del flujo guiado (guardados en `AssistantSession.context["flow_state"]`)
+STATE_AWAITING_TABLE = "awaiting_table"
+STATE_ORDERING = "ordering"
+
+BARE_NUMBER_RE = re.compile(r"^\s*\d{1,3}\s*$")
+TABLE_NUMBER_RE = re.compile(r"^(?:(?:estoy en |estamos en )?(?:la )?mesa\s*(?:numero\s*)?|(?:table|i m at table)\s*)?(\d{1,3})$")
+TABLE_MENTION_RE = re.compile(r"\b(?:mesa|table)\s*(?:numero\s*|number\s*)?(\d{1,3})\b")
+TABLE_CHANGE_RE = re.compile(r"^(?:(?:cambio a|cambiamos a|estoy en|estamos en|now at) )?(?:la )?(?:mesa|table)\s*(\d{1,3})$")
+CATEGORIES_REQUEST_RE = re.compile(
+    r"^(?:(?:ver|quiero ver|ensename|muestrame|dame|pasame) )?(?:la |el |las )?(?:carta|menu|categorias)(?: por favor)?$"
+    r"|^(?:(?:show me|see|can i see) )?(?:the )?(?:menu|categories)(?: please)?$"
+)
+
+# 🗣️ Respuestas guionizadas (solo idiomas con plantilla; el resto sigue por el asistente)
+SCRIPTS = {
+    "es": {
+        "greeting": "😊 ¡Hola! Bienvenido a {tenant}. 🙋 Antes de comenzar, ¿podrías indicarme en qué mesa te encuentras? 👌",
+        "ask_table": "🙋 Para poder atenderte necesito tu número de mesa. ¿En qué mesa te encuentras?",
+        "invalid_table": "😔 La mesa {table} no existe. Por favor, indícame un número de mesa entre 1 y {table_count}.",
+        "table_confirmed": "✅ ¡Perfecto, mesa {table}! {categories}",
+        "categories": "Estas son las categorías de nuestra carta: {names}. ¿Cuál te gustaría explorar? 😊",
+        "no_menu": "¿Qué te apetece tomar? 😊",
+    },
+    "en": {
+        "greeting": "😊 Hi! Welcome to {tenant}. 🙋 Before we start, could you tell me your table number? 👌",
+        "ask_table": "🙋 I need your table number to help you. Which table are you at?",
+        "invalid_table": "😔 Table {table} doesn't exist. Please give me a table number between 1 and {table_count}.",
+        "table_confirmed": "✅ Great, table {table}! {categories}",
+        "categories": "These are our menu categories: {names}. Which one would you like to explore? 😊",
+        "no_menu": "What would you like to have? 😊",
+    },
+}
+
+
+def is_bare_number(text):
+    """Mensajes que son solo un número (p. ej. la mesa): no hace falta detectar el idioma."""
+    return bool(BARE_NUMBER_RE.match(text or ""))
+
+
+def extract_table_number(normalized):
+    """Extrae el número de mesa de un mensaje normalizado (`7`, `mesa 7`, `estoy en la mesa 7`...)."""
+    match = TABLE_NUMBER_RE.match(normalized) or TABLE_MENTION_RE.search(normalized)
+    return int(match.group(1)) if match else None
+
+
+def is_valid_table(tenant, table):
+    return table >= 1 and (not tenant.table_count or table <= tenant.table_count)
+
+
+def categories_text(script, menu_data):
+    names = [category["category"] for category in (menu_data or {}).get("menu", []) if category.get("items")]
+    return script["categories"].format(names=", ".join(names)) if names else script["no_menu"]
+
+
+def run_scripted_flow(user_message, session, language, menu_data):
+    """
+    Máquina de estados por sesión para los pasos guionizados (saludo, número de mesa, categorías),
+    resueltos sin llamar al LLM. Devuelve `(reply, user_message)`: si `reply` no es None se envía
+    tal cual; si no, el turno sigue hacia el asistente con `user_message` (que puede ser el mensaje
+    que el cliente escribió antes de dar la mesa).
+    """
+    tenant = session.tenant
+    script = SCRIPTS.get(language)
+    if not tenant.scripted_flow_enabled or script is None:
+        return None, user_message
+
+    context = session.context or {}
+    state = context.get("flow_state")
+    normalized = normalize_message(user_message)
+    table = extract_table_number(normalized)
+
+    if state == STATE_ORDERING:
+        if CATEGORIES_REQUEST_RE.match(normalized):
+            return categories_text(script, menu_data), user_message
+        if TABLE_CHANGE_RE.match(normalized) and is_valid_table(tenant, table):
+            save_flow_state(session, STATE_ORDERING, table_number=str(table))  # 🔄 Cambio de mesa
+            return script["table_confirmed"].format(table=table, categories="").strip(), user_message
+        return None, user_message
+
+    if table is None:
+        # 🙋 Primer mensaje o sigue sin mesa: saludar/pedir mesa y guardar el mensaje para después
+        pending = None if is_greeting_or_empty(normalized) else user_message
+        save_flow_state(session, STATE_AWAITING_TABLE, pending_message=pending or context.get("pending_message"))
+        key = "greeting" if state is None else "ask_table"
+        return script[key].format(tenant=tenant.name), user_message
+
+    if not is_valid_table(tenant, table):
+        save_flow_state(session, STATE_AWAITING_TABLE, pending_message=context.get("pending_message"))
+        return script["invalid_table"].format(table=table, table_count=tenant.table_count), user_message
+
+    pending = context.get("pending_message")
+    save_flow_state(session, STATE_ORDERING, table_number=str(table), pending_message=None)
+    print(f"🧾 Mesa {table} capturada sin llamar al asistente.", flush=True)
+
+    if pending:
+        return None, pending  # El asistente atiende lo que el cliente pidió antes de dar la mesa
+    if not TABLE_NUMBER_RE.match(normalized):
+        return None, user_message  # "Mesa 7, ¿tenéis tortilla?": la mesa ya está capturada, el resto al asistente
+    return script["table_confirmed"].format(table=table, categories=categories_text(script, menu_data)), user_message
+
+
+def is_greeting_or_empty(normalized):
+    return not normalized or bool(re.match(r"^(?:hola|buenas(?: tardes| noches)?|buenos dias|hey|hi|hello)$", normalized))
+
+
+def save_flow_state(session, state, **values):
+    """Guarda el estado del flujo (y valores asociados) en `session.context`."""
+    context = session.context or {}
+    context["flow_state"] = state
+    for key, value in values.items():
+        if value is None:
+            context.pop(key, None)
+        else:
+            context[key] = value
+    session.context = context
+    session.save(update_fields=["context"])
+
+
+def flow_state_message(session):
+    """Mensaje de sistema con el estado capturado, para que el modelo no lo deduzca del historial."""
+    table_number = (session.context or {}).get("table_number")
+    if not session.tenant.scripted_flow_enabled or not table_number:
+        return None
+    return {
+        "role": "system",
+        "content": (
+            f"🧾 Estado de la conversación: el cliente está en la mesa {table_number} (ya confirmada). "
+            f"No vuelvas a preguntar el número de mesa y usa table_number \"{table_number}\" en submit_order."
+        ),
+    }
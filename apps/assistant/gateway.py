@@ -0,0 +1,285 @@
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import openai
+from django.conf import settings
+
+# 🔁 Errores transitorios que merece la pena reintentar
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # Incluye APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class OpenAIGatewayError(Exception):
+    """Error definitivo del gateway tras agotar reintentos, plazo y modelo de respaldo."""
+
+
+class DeadlineExceeded(OpenAIGatewayError):
+    """Se agotó el plazo total asignado a la llamada."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por modelo: tras `failure_threshold` fallos consecutivos se abre durante
+    `reset_timeout` segundos; después deja pasar una llamada de prueba (half-open).
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open":
+                return False
+            if self.state == "half-open":
+                # 🔹 Solo una llamada de prueba: se reabre hasta conocer su resultado
+                self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class EndpointMetrics:
+    """Latencias (ventana deslizante) y contadores de errores de un endpoint/modelo."""
+
+    def __init__(self, window=500):
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.hedged = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency_ms):
+        with self._lock:
+            self.calls += 1
+            self.latencies.append(latency_ms)
+
+    def record_error(self, error):
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+            if isinstance(error, (openai.APITimeoutError, DeadlineExceeded)):
+                self.timeouts += 1
+
+    def percentile(self, pct):
+        with self._lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def snapshot(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "hedged": self.hedged,
+            "fallbacks": self.fallbacks,
+            "error_rate": round(self.errors / self.calls * 100, 1) if self.calls else 0.0,
+            "p50_ms": round(self.percentile(50) or 0),
+            "p95_ms": round(self.percentile(95) or 0),
+        }
+
+
+class OpenAIGateway:
+    """
+    Punto único de acceso a OpenAI (asistente, detección de idioma, traducción y transcripción).
+    Aplica plazo por llamada, reintentos acotados con jitter, peticiones "hedged" opcionales
+    cuando se supera el p95, circuit breaker con modelo de respaldo y métricas por endpoint.
+    """
+
+    def __init__(self, config=None):
+        config = config or settings.OPENAI_GATEWAY
+        self.deadlines = config["DEADLINES"]
+        self.max_retries = config["MAX_RETRIES"]
+        self.backoff_base = config["BACKOFF_BASE"]
+        self.hedge_enabled = config["HEDGE_ENABLED"]
+        self.hedge_min_samples = config["HEDGE_MIN_SAMPLES"]
+        self.fallback_model = config["FALLBACK_MODEL"]
+        self.fallback_budget = config["FALLBACK_BUDGET"]
+        self.breaker_failure_threshold = config["BREAKER_FAILURE_THRESHOLD"]
+        self.breaker_reset_timeout = config["BREAKER_RESET_TIMEOUT"]
+
+        self._client = None
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._metrics = defaultdict(EndpointMetrics)
+        self._executor = ThreadPoolExecutor(max_workers=config["HEDGE_MAX_WORKERS"], thread_name_prefix="openai-hedge")
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+    def chat(self, purpose="chat", deadline=None, **payload):
+        """
+        Equivalente a `chat.completions.create(**payload)` con resiliencia y modelo de respaldo.
+        Con respaldo, el modelo principal solo dispone de la parte del plazo que no queda reservada
+        (`FALLBACK_BUDGET`), para que un principal lento no deje al respaldo sin tiempo.
+        """
+        budget = deadline or self.deadlines.get(purpose, self.deadlines["chat"])
+        deadline_at = time.monotonic() + budget
+        primary_model = payload["model"]
+        models = [primary_model]
+        if self.fallback_model and self.fallback_model != primary_model:
+            models.append(self.fallback_model)
+        primary_deadline_at = deadline_at - budget * self.fallback_budget if len(models) > 1 else deadline_at
+
+        last_error = None
+        for model in models:
+            breaker = self._breaker(model)
+            if not breaker.allow():
+                print(f"⛔ Circuito abierto para {model}, probando modelo de respaldo...", flush=True)
+                continue
+
+            if model != primary_model:
+                self._metrics[f"chat.completions:{primary_model}"].fallbacks += 1
+                print(f"🔀 Usando modelo de respaldo {model} para '{purpose}'", flush=True)
+
+            def call(timeout, model=model):
+                return self._get_client(timeout).chat.completions.create(**{**payload, "model": model})
+
+            try:
+                model_deadline_at = primary_deadline_at if model == primary_model else deadline_at
+                response = self._execute(f"chat.completions:{model}", call, model_deadline_at, hedge=self.hedge_enabled)
+            except RETRYABLE_ERRORS + (DeadlineExceeded,) as e:
+                breaker.record_failure()
+                last_error = e
+                continue
+            except openai.OpenAIError as e:
+                raise OpenAIGatewayError(str(e)) from e
+
+            breaker.record_success()
+            return response
+
+        raise OpenAIGatewayError(f"OpenAI no disponible para '{purpose}': {last_error or 'circuito abierto'}") from last_error
+
+    def transcribe(self, audio_path, model="whisper-1", deadline=None):
+        """Transcribe un archivo de audio con reintentos y plazo (sin hedging ni respaldo)."""
+        with open(audio_path, "rb") as audio_file:
+            audio = (audio_path.rsplit("/", 1)[-1], audio_file.read())
+
+        deadline_at = time.monotonic() + (deadline or self.deadlines["transcribe"])
+
+        def call(timeout):
+            return self._get_client(timeout).audio.transcriptions.create(model=model, file=audio)
+
+        try:
+            return self._execute(f"audio.transcriptions:{model}", call, deadline_at, hedge=False)
+        except (openai.OpenAIError, DeadlineExceeded) as e:
+            raise OpenAIGatewayError(str(e)) from e
+
+    def metrics(self):
+        """Métricas por endpoint/modelo y estado de los circuit breakers."""
+        return {
+            "endpoints": {name: metrics.snapshot() for name, metrics in sorted(self._metrics.items())},
+            "breakers": {model: breaker.state for model, breaker in self._breakers.items()},
+        }
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+    def _get_client(self, timeout):
+        with self._lock:
+            if self._client is None:
+                self._client = openai.OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    base_url=settings.OPENAI_BASE_URL,
+                    max_retries=0,
+                )
+        return self._client.with_options(timeout=timeout, max_retries=0)
+
+    def _breaker(self, model):
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(self.breaker_failure_threshold, self.breaker_reset_timeout)
+            return self._breakers[model]
+
+    def _execute(self, endpoint, call, deadline_at, hedge):
+        """Ejecuta `call(timeout)` con reintentos acotados y backoff exponencial con jitter."""
+        metrics = self._metrics[endpoint]
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+
+            started_at = time.perf_counter()
+            try:
+                result = self._call_with_hedge(call, remaining, metrics) if hedge else call(remaining)
+            except RETRYABLE_ERRORS + (DeadlineExceeded,) as e:
+                metrics.record_error(e)
+                last_error = e
+                print(f"⚠️ {endpoint} intento {attempt + 1} fallido: {e}", flush=True)
+            except openai.OpenAIError as e:
+                metrics.record_error(e)
+                raise
+            else:
+                metrics.record_success((time.perf_counter() - started_at) * 1000)
+                return result
+
+            if attempt < self.max_retries:
+                backoff = random.uniform(0, self.backoff_base * (2 ** attempt))  # Full jitter
+                time.sleep(max(0, min(backoff, deadline_at - time.monotonic())))
+
+        if last_error:
+            raise last_error
+        raise DeadlineExceeded(f"Plazo agotado para {endpoint}")
+
+    def _call_with_hedge(self, call, timeout, metrics):
+        """Lanza una segunda petición idéntica si la primera supera el p95 observado."""
+        hedge_after = metrics.percentile(95) if len(metrics.latencies) >= self.hedge_min_samples else None
+        if hedge_after is None or hedge_after / 1000 >= timeout:
+            return call(timeout)
+
+        deadline_at = time.monotonic() + timeout
+        futures = [self._executor.submit(call, timeout)]
+        done, _ = wait(futures, timeout=hedge_after / 1000)
+        if not done:
+            metrics.hedged += 1
+            futures.append(self._executor.submit(call, max(0.1, deadline_at - time.monotonic())))
+
+        last_error = None
+        while futures:
+            done, pending = wait(futures, timeout=max(0, deadline_at - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+            futures = list(pending)
+
+        if last_error:
+            raise last_error
+        raise DeadlineExceeded("Plazo agotado esperando respuesta de OpenAI")
+
+
+gateway = OpenAIGateway()
@@ -0,0 +1,99 @@
+import re
+
+from text_unidecode import unidecode
+
+from apps.menu.dietary import DIET_GLUTEN_FREE, DIET_VEGAN, DIET_VEGETARIAN
+from apps.menu.lookup import singular_key
+
+INTENT_INFORMATIONAL = "informational"
+INTENT_ORDERING = "ordering"
+INTENT_OTHER = "other"
+
+# 🔹 Verbos y expresiones típicas de un pedido (texto ya normalizado, sin acentos)
+ORDERING_PATTERNS = [
+    r"\bquiero\b", r"\bquisiera\b", r"\bponme\b", r"\bpon(?:ga|game)?\b", r"\bme (?:pones|traes|das)\b",
+    r"\bpara mi\b", r"\bpido\b", r"\bpedir\b", r"\banade\b", r"\banadir\b", r"\bagrega\b", r"\bquita\b",
+    r"\bsin (?!gluten\b|lactosa\b|azucar\b)\w+", r"\bcon extra\b", r"\botr[oa]s?\b", r"\bconfirm", r"\bpagar\b", r"\bcuenta\b",
+    r"\bi(?:'d| would)? like\b", r"\bi want\b", r"\bcan i (?:get|have)\b", r"\border\b", r"\badd\b", r"\bwithout\b",
+    r"^\d+\s*x?\s+\w", r"\b(?:un|una|dos|tres|cuatro|cinco)\s+\w+\s+(?:y|,)",
+]
+
+# 🔹 Preguntas informativas sobre la carta que no dependen del estado de la conversación
+INFORMATIONAL_PATTERNS = [
+    r"\bque (?:\w+ )?(?:teneis|tienes|tienen|hay|ofreceis|llevan?)\b", r"\bteneis\b", r"\btienen\b", r"\bhay\b",
+    r"\bcategorias?\b", r"\bcarta\b", r"\bmenu\b", r"\bbebidas\b", r"\bpostres\b", r"\bentrantes\b",
+    r"\bsin gluten\b", r"\bveganos?\b", r"\bvegetarian[oa]s?\b", r"\balergenos?\b", r"\bingredientes\b",
+    r"\bcuanto (?:cuesta|vale|cuestan|valen)\b", r"\bprecios?\b", r"\bhorario\b",
+    r"\bwhat (?:do you have|are your|is in)\b", r"\bdo you have\b", r"\bcategories\b", r"\bgluten[- ]free\b",
+    r"\bvegan\b", r"\ballergens?\b", r"\bhow much\b",
+]
+
+# 🥗 Dietas mencionadas en el mensaje y expresiones que indican que el cliente quiere evitar un alérgeno
+DIET_PATTERNS = {
+    DIET_VEGAN: r"\bvegan(?:[oa]s?)?\b",
+    DIET_VEGETARIAN: r"\bvegetarian(?:[oa]s?)?\b",
+    DIET_GLUTEN_FREE: r"\bsin gluten\b|\bgluten free\b|\bceliac(?:[oa]s?)?\b",
+}
+ALLERGEN_CUE_PATTERN = r"\b(?:sin|ni|without|free|alergi\w*|allergic|intoleran\w*|no (?:puedo|tomo|como))\b"
+
+# 🔹 Preguntas que remiten a algo dicho antes ("¿y eso cuánto cuesta?"): sin el historial no tienen respuesta
+FOLLOW_UP_PATTERNS = [
+    r"\b(?:es[aeo]s?|esto|aquel\w*|it|that|this|those|them)\b",
+    r"^(?:y )?(?:cuanto (?:cuesta|vale|cuestan|valen)|que (?:lleva|llevan)|precio|how much(?: is it)?)$",
+]
+
+_ORDERING_RE = re.compile("|".join(ORDERING_PATTERNS))
+_INFORMATIONAL_RE = re.compile("|".join(INFORMATIONAL_PATTERNS))
+_FOLLOW_UP_RE = re.compile("|".join(FOLLOW_UP_PATTERNS))
+_DIET_RES = {diet: re.compile(pattern) for diet, pattern in DIET_PATTERNS.items()}
+_ALLERGEN_CUE_RE = re.compile(ALLERGEN_CUE_PATTERN)
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_message(text):
+    """Normaliza un mensaje: minúsculas, sin acentos, sin puntuación y con espacios colapsados."""
+    text = unidecode(text or "").lower()
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def classify_intent(text):
+    """
+    Clasifica localmente (sin llamar al LLM) la intención de un mensaje del cliente.
+    Devuelve `informational`, `ordering` u `other`.
+    """
+    normalized = normalize_message(text)
+    if not normalized:
+        return INTENT_OTHER
+    if _ORDERING_RE.search(normalized):
+        return INTENT_ORDERING
+    if _INFORMATIONAL_RE.search(normalized):
+        return INTENT_INFORMATIONAL
+    return INTENT_OTHER
+
+
+def is_self_contained(text):
+    """¿Se entiende el mensaje sin el historial? Las preguntas que remiten a algo anterior no se cachean."""
+    return not _FOLLOW_UP_RE.search(normalize_message(text))
+
+
+def mentions_dietary_constraints(text):
+    """Comprobación barata previa a `extract_dietary_constraints`: ¿menciona el mensaje alguna dieta o restricción?"""
+    normalized = normalize_message(text)
+    return bool(_ALLERGEN_CUE_RE.search(normalized)) or any(pattern.search(normalized) for pattern in _DIET_RES.values())
+
+
+def extract_dietary_constraints(text, allergen_names):
+    """
+    Alérgenos a evitar y dietas que pide el mensaje ("¿qué puedo comer sin gluten ni lactosa?").
+    `allergen_names` es `{clave: nombre}` de los alérgenos de la carta; solo se reconocen esos.
+    Devuelve `(allergens, diets)`, ambas listas vacías si el mensaje no habla de ello.
+    """
+    normalized = normalize_message(text)
+    diets = [diet for diet, pattern in _DIET_RES.items() if pattern.search(normalized)]
+    allergens = []
+    if _ALLERGEN_CUE_RE.search(normalized):
+        words = f" {singular_key(normalized)} "
+        allergens = [name for key, name in allergen_names.items() if f" {key} " in words]
+    return allergens, diets
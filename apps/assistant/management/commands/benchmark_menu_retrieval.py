@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.assistant.retrieval import MenuIndex
+from apps.assistant.usage import estimate_tokens
+
+QUERIES = [
+    "¿Tenéis algo sin gluten?",
+    "Quiero dos cafés con leche y una tostada",
+    "qué hamburguesas hay",
+    "¿La tarta de queso lleva huevo?",
+    "ponme un bocadillo de jamon",
+    "tenéis batidos veganos?",
+    "una ensalada de la casa grande",
+    "croquetas caseras",
+]
+
+
+def synthetic_menu_data(items, seed=42):
+    """Menú sintético con el formato de `get_menu_data`: ~25 productos por categoría, con extras y alérgenos."""
+    rng = random.Random(seed)
+    words = ["café", "tostada", "zumo", "bocadillo", "tarta", "croqueta", "ensalada", "perrito", "hamburguesa", "batido"]
+    modifiers = ["con leche", "de jamón", "mixto", "especial", "de la casa", "vegano", "grande", "doble", "sin gluten", "de queso"]
+    allergens = ["Gluten", "Lactosa", "Huevo", "Frutos secos", "Soja", "Pescado", "Mostaza", "Sésamo"]
+    extras = [{"name": f"Extra de {word}", "price": 0.5, "available": True} for word in ["queso", "bacon", "aguacate", "huevo", "nata"]]
+
+    menu = []
+    for index in range(items):
+        if index % 25 == 0:
+            menu.append({"category": f"Categoría {len(menu) + 1}", "order": len(menu) + 1, "items": []})
+        name = f"{rng.choice(words).capitalize()} {rng.choice(modifiers)} {index}"
+        menu[-1]["items"].append({
+            "name": name,
+            "description": f"{name} preparado al momento",
+            "price": round(rng.uniform(1, 15), 2),
+            "available": True,
+            "extras": rng.sample(extras, k=2),
+            "allergens": rng.sample(allergens, k=2),
+        })
+    for category in menu:
+        category["total_categories"] = len(menu)
+    return {"menu": menu}
+
+
+class Command(BaseCommand):
+    help = "Mide el ahorro de tokens y la latencia de enviar solo el menú relevante (índice TF-IDF local)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, nargs="+", default=[50, 200, 1000], help="Tamaños del menú sintético")
+        parser.add_argument("--iterations", type=int, default=200, help="Búsquedas por consulta")
+
+    def handle(self, *args, **options):
+        config = settings.ASSISTANT_MENU_RETRIEVAL
+        iterations = options["iterations"]
+
+        for items in options["items"]:
+            menu_data = synthetic_menu_data(items)
+            full_tokens = estimate_tokens(str(menu_data))
+
+            start = time.perf_counter()
+            index = MenuIndex(menu_data)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            subset_tokens, fallbacks = [], 0
+            start = time.perf_counter()
+            for _ in range(iterations):
+                for query in QUERIES:
+                    index.search(query, config["TOP_K"])
+            search_ms = (time.perf_counter() - start) * 1000 / (iterations * len(QUERIES))
+
+            for query in QUERIES:
+                subset = index.subset(query, config["TOP_K"], config["MIN_SCORE"])
+                if subset is None:
+                    fallbacks += 1
+                subset_tokens.append(estimate_tokens(str(subset or menu_data)))
+            average_tokens = sum(subset_tokens) / len(subset_tokens)
+
+            self.stdout.write(f"📋 Menú sintético: {items} productos (top-k {config['TOP_K']})")
+            self.stdout.write(f"🏗️ Construcción del índice (una vez por versión de menú): {build_ms:.1f} ms")
+            self.stdout.write(f"⚡ Búsqueda: {search_ms:.3f} ms/consulta")
+            self.stdout.write(
+                f"🔢 Tokens del menú: {full_tokens} completo → {average_tokens:.0f} de media "
+                f"({fallbacks}/{len(QUERIES)} consultas sin resultados usan el completo)"
+            )
+            self.stdout.write(self.style.SUCCESS(f"✅ Ahorro: {100 * (1 - average_tokens / full_tokens):.0f}% de los tokens del menú"))
@@ -0,0 +1,57 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.assistant.utils import ProductNameMatcher, restore_placeholders
+
+
+def legacy_protect_product_names(text, product_list):
+    """Implementación anterior: un `re.sub` por producto (solo para comparar)."""
+    protected_names = {}
+    for idx, product in enumerate(product_list):
+        placeholder = f"##PRODUCT{idx}##"
+        protected_names[placeholder] = product
+        text = re.sub(rf'\b{re.escape(product)}\b', placeholder, text, flags=re.IGNORECASE)
+    return text, protected_names
+
+
+class Command(BaseCommand):
+    help = "Compara la protección de nombres de productos (legacy vs matcher precompilado)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=500, help="Número de productos del menú sintético")
+        parser.add_argument("--iterations", type=int, default=200, help="Respuestas traducidas simuladas")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        words = ["café", "tostada", "zumo", "bocadillo", "tarta", "croqueta", "ensalada", "perrito", "hamburguesa", "batido"]
+        modifiers = ["con leche", "de jamón", "mixto", "especial", "de la casa", "vegano", "grande", "doble", "sin gluten", "clásico"]
+        product_names = [f"{rng.choice(words).capitalize()} {rng.choice(modifiers)} {i}" for i in range(options["items"])]
+
+        mentioned = rng.sample(product_names, k=min(8, len(product_names)))
+        text = "🌟 Este es tu pedido: " + ", ".join(f"2x {name} - 4.40€" for name in mentioned) + ". ¿Deseas añadir algo más? 😉"
+
+        iterations = options["iterations"]
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            legacy_protect_product_names(text, product_names)
+        legacy_ms = (time.perf_counter() - start) * 1000 / iterations
+
+        start = time.perf_counter()
+        matcher = ProductNameMatcher(product_names)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            protected, names = matcher.protect(text)
+            restore_placeholders(protected, names)
+        matcher_ms = (time.perf_counter() - start) * 1000 / iterations
+
+        self.stdout.write(f"📋 Menú sintético: {len(product_names)} productos, {iterations} iteraciones")
+        self.stdout.write(f"🐢 Legacy (re.sub por producto): {legacy_ms:.3f} ms/respuesta")
+        self.stdout.write(f"🏗️ Construcción del matcher (una vez por versión de menú): {build_ms:.3f} ms")
+        self.stdout.write(f"⚡ Matcher precompilado (proteger + restaurar): {matcher_ms:.3f} ms/respuesta")
+        self.stdout.write(self.style.SUCCESS(f"✅ Speedup: x{legacy_ms / matcher_ms:.1f}"))
@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.assistant.models import OpenAIRequestLog, PromptBlob
+from apps.assistant.request_log import blob_hash
+
+MENU_PREFIX = "📋 Menú en español: "
+
+
+def compact_legacy_row(log, blobs):
+    """Convierte un registro con `payload`/`response` completos al formato compacto (blobs + deltas)."""
+    messages = (log.payload or {}).get("messages") or []
+    system_messages = [m.get("content") or "" for m in messages if m.get("role") == "system"]
+
+    prompt = system_messages[0] if system_messages else None
+    menu = next((m[len(MENU_PREFIX):] for m in system_messages[1:] if m.startswith(MENU_PREFIX)), None)
+
+    for content, kind, field in ((prompt, "prompt", "prompt_blob_id"), (menu, "menu", "menu_blob_id")):
+        if content:
+            content_hash = blob_hash(content)
+            blobs.setdefault(content_hash, PromptBlob(hash=content_hash, kind=kind, content=content, size=len(content)))
+            setattr(log, field, content_hash)
+
+    non_system = [m for m in messages if m.get("role") != "system"]
+    log.model = log.model or (log.payload or {}).get("model")
+    log.request_delta = {
+        "user_message": non_system[-1].get("content") if non_system else None,
+        "history_messages": max(len(non_system) - 1, 0),
+        "temperature": (log.payload or {}).get("temperature"),
+    }
+
+    response = log.response or {}
+    if "error" in response:
+        log.response_delta = {"error": response["error"]}
+    else:
+        choice = (response.get("choices") or [{}])[0]
+        message = choice.get("message") or {}
+        log.response_delta = {
+            "id": response.get("id"),
+            "content": message.get("content"),
+            "tool_calls": [
+                {"name": call["function"]["name"], "arguments": call["function"]["arguments"]}
+                for call in message.get("tool_calls") or []
+            ],
+            "finish_reason": choice.get("finish_reason"),
+        }
+        usage = response.get("usage") or {}
+        log.prompt_tokens = usage.get("prompt_tokens")
+        log.completion_tokens = usage.get("completion_tokens")
+        log.total_tokens = usage.get("total_tokens")
+        log.model = response.get("model") or log.model
+
+    log.payload = None
+    log.response = None
+
+
+class Command(BaseCommand):
+    help = "Compacta los OpenAIRequestLog antiguos: mueve prompt y menú a PromptBlob y conserva solo deltas y tokens."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Registros procesados por transacción")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+
+        while True:
+            batch = list(OpenAIRequestLog.objects.filter(payload__isnull=False).order_by("timestamp")[:batch_size])
+            if not batch:
+                break
+
+            blobs = {}
+            for log in batch:
+                compact_legacy_row(log, blobs)
+
+            with transaction.atomic():
+                PromptBlob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+                OpenAIRequestLog.objects.bulk_update(batch, [
+                    "model", "prompt_blob", "menu_blob", "request_delta", "response_delta", "payload", "response",
+                    "prompt_tokens", "completion_tokens", "total_tokens",
+                ])
+
+            total += len(batch)
+            self.stdout.write(f"📦 {total} registros compactados...")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Compactación terminada: {total} registros."))
@@ -0,0 +1,83 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('kind', models.CharField(choices=[('prompt', 'Prompt'), ('menu', 'Menu'), ('other', 'Other')], default='other', max_length=20, verbose_name='Kind')),
+                ('content', models.TextField(verbose_name='Content')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='Size (chars)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+            ],
+            options={
+                'verbose_name': 'Prompt Blob',
+                'verbose_name_plural': 'Prompt Blobs',
+            },
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='completion_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Completion Tokens'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='latency_ms',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Latency (ms)'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='model',
+            field=models.CharField(blank=True, max_length=50, null=True, verbose_name='Model'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='prompt_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Prompt Tokens'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='request_delta',
+            field=models.JSONField(blank=True, null=True, verbose_name='Request Delta'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='response_delta',
+            field=models.JSONField(blank=True, null=True, verbose_name='Response Delta'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='total_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Total Tokens'),
+        ),
+        migrations.AlterField(
+            model_name='openairequestlog',
+            name='payload',
+            field=models.JSONField(blank=True, null=True, verbose_name='Request Payload'),
+        ),
+        migrations.AlterField(
+            model_name='openairequestlog',
+            name='response',
+            field=models.JSONField(blank=True, null=True, verbose_name='API Response'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='menu_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='assistant.promptblob', verbose_name='Menu'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='prompt_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='assistant.promptblob', verbose_name='Prompt'),
+        ),
+    ]
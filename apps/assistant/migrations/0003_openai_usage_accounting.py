@@ -0,0 +1,70 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0002_compact_openai_request_log'),
+        ('tenants', '0005_tenant_response_cache_enabled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='cost_usd',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=12, null=True, verbose_name='Cost (USD)'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='history_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='History Tokens (est.)'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='menu_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Menu Tokens (est.)'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='purpose',
+            field=models.CharField(choices=[('chat', 'Chat'), ('detect', 'Language Detection'), ('translate', 'Translation'), ('transcribe', 'Transcription')], db_index=True, default='chat', max_length=20, verbose_name='Purpose'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='assistant.assistantsession', verbose_name='Assistant Session'),
+        ),
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='tenant_prompt_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Tenant Prompt Tokens (est.)'),
+        ),
+        migrations.CreateModel(
+            name='OpenAIUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('purpose', models.CharField(choices=[('chat', 'Chat'), ('detect', 'Language Detection'), ('translate', 'Translation'), ('transcribe', 'Transcription')], max_length=20, verbose_name='Purpose')),
+                ('model', models.CharField(blank=True, default='', max_length=50, verbose_name='Model')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='Calls')),
+                ('errors', models.PositiveIntegerField(default=0, verbose_name='Errors')),
+                ('prompt_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Prompt Tokens')),
+                ('completion_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Completion Tokens')),
+                ('total_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Total Tokens')),
+                ('tenant_prompt_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Tenant Prompt Tokens (est.)')),
+                ('menu_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Menu Tokens (est.)')),
+                ('history_tokens', models.PositiveBigIntegerField(default=0, verbose_name='History Tokens (est.)')),
+                ('latency_ms', models.PositiveBigIntegerField(default=0, verbose_name='Total Latency (ms)')),
+                ('cost_usd', models.DecimalField(decimal_places=6, default=0, max_digits=14, verbose_name='Cost (USD)')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tenants.tenant', verbose_name='Tenant')),
+            ],
+            options={
+                'verbose_name': 'OpenAI Usage Rollup',
+                'verbose_name_plural': 'OpenAI Usage Rollups',
+                'unique_together': {('tenant', 'date', 'purpose', 'model')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0003_openai_usage_accounting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='openairequestlog',
+            name='route',
+            field=models.CharField(blank=True, max_length=10, null=True, verbose_name='Route'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:54
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0004_openairequestlog_route'),
+        ('chat', '0002_conversation_log'),  # Los mensajes ya están copiados al registro de conversación
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='AIMessage',
+        ),
+    ]
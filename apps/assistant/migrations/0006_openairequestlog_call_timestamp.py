@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-19 13:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0005_delete_aimessage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='openairequestlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Timestamp'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-19 13:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0006_openairequestlog_call_timestamp'),
+        ('tenants', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponseCacheRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Hits')),
+                ('misses', models.PositiveIntegerField(default=0, verbose_name='Misses')),
+                ('latency_saved_ms', models.PositiveBigIntegerField(default=0, verbose_name='Latency Saved (ms)')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tenants.tenant', verbose_name='Tenant')),
+            ],
+            options={
+                'verbose_name': 'Response Cache Rollup',
+                'verbose_name_plural': 'Response Cache Rollups',
+                'unique_together': {('tenant', 'date')},
+            },
+        ),
+    ]
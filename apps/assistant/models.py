@@ -1,6 +1,7 @@
 import uuid
 
 from django.db import models
+from django.utils.timezone import now
 
 from apps.chat.models import ChatSession
 from apps.tenants.models import Tenant
@@ -38,29 +39,35 @@ class AssistantSession(models.Model):
     session_duration.fget.short_description = "Session Duration"
 
 
-# 📌 **Modelo de Mensajes de la IA**
-class AIMessage(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    tenant = models.ForeignKey(
-        Tenant, on_delete=models.CASCADE, verbose_name="Tenant"
-    )  # Relación con el inquilino
-    session = models.ForeignKey(
-        AssistantSession, on_delete=models.CASCADE, related_name="messages", verbose_name="Assistant Session"
-    )  # Relación con la sesión IA
-    role = models.CharField(
-        max_length=20,
-        choices=[
-            ("user", "User"),
-            ("assistant", "Assistant"),
-            ("system", "System"),
-        ],
-        verbose_name="Sender Role",
-    )  # Quién envió el mensaje
-    content = models.TextField(verbose_name="Message Content")  # Contenido del mensaje
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Timestamp")  # Fecha y hora
+# 📌 **Modelo de Contenidos Grandes Deduplicados (prompt, menú...)**
+class PromptBlob(models.Model):
+    KIND_CHOICES = [
+        ("prompt", "Prompt"),
+        ("menu", "Menu"),
+        ("other", "Other"),
+    ]
+
+    hash = models.CharField(max_length=64, primary_key=True, verbose_name="SHA-256")  # Direccionado por contenido
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default="other", verbose_name="Kind")
+    content = models.TextField(verbose_name="Content")
+    size = models.PositiveIntegerField(default=0, verbose_name="Size (chars)")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+
+    class Meta:
+        verbose_name = "Prompt Blob"
+        verbose_name_plural = "Prompt Blobs"
 
     def __str__(self):
-        return f'{self.role.capitalize()} Message at {self.timestamp.strftime("%Y-%m-%d %H:%M:%S")}'
+        return f'{self.kind} {self.hash[:12]} ({self.size} chars)'
+
+
+# 📌 **Propósitos de las llamadas a OpenAI**
+PURPOSE_CHOICES = [
+    ("chat", "Chat"),
+    ("detect", "Language Detection"),
+    ("translate", "Translation"),
+    ("transcribe", "Transcription"),
+]
 
 
 # 📌 **Modelo de Registro de Solicitudes a OpenAI**
@@ -72,11 +79,78 @@ class OpenAIRequestLog(models.Model):
     request_id = models.CharField(
         max_length=100, unique=True, verbose_name="Request ID"
     )  # ID único de la solicitud
+    session = models.ForeignKey(
+        AssistantSession, on_delete=models.SET_NULL, null=True, blank=True, related_name="+", verbose_name="Assistant Session"
+    )  # Sesión que originó la llamada (si la hay)
     endpoint = models.CharField(max_length=100, verbose_name="API Endpoint")  # Endpoint de OpenAI
-    payload = models.JSONField(verbose_name="Request Payload")  # Datos enviados
-    response = models.JSONField(verbose_name="API Response")  # Respuesta de OpenAI
+    purpose = models.CharField(
+        max_length=20, choices=PURPOSE_CHOICES, default="chat", db_index=True, verbose_name="Purpose"
+    )  # Para qué se hizo la llamada
+    model = models.CharField(max_length=50, blank=True, null=True, verbose_name="Model")  # Modelo usado
+    route = models.CharField(max_length=10, blank=True, null=True, verbose_name="Route")  # Ruta del turno (light/menu/full)
+    prompt_blob = models.ForeignKey(
+        PromptBlob, on_delete=models.PROTECT, null=True, blank=True, related_name="+", verbose_name="Prompt"
+    )  # Prompt del sistema (deduplicado)
+    menu_blob = models.ForeignKey(
+        PromptBlob, on_delete=models.PROTECT, null=True, blank=True, related_name="+", verbose_name="Menu"
+    )  # Menú serializado (deduplicado)
+    request_delta = models.JSONField(blank=True, null=True, verbose_name="Request Delta")  # Solo lo nuevo del turno
+    response_delta = models.JSONField(blank=True, null=True, verbose_name="Response Delta")  # Contenido y tool calls
+    payload = models.JSONField(blank=True, null=True, verbose_name="Request Payload")  # Legacy: payload completo
+    response = models.JSONField(blank=True, null=True, verbose_name="API Response")  # Legacy: respuesta completa
     status_code = models.IntegerField(verbose_name="HTTP Status Code")  # Código HTTP
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Timestamp")  # Fecha y hora
+    latency_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name="Latency (ms)")
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True, verbose_name="Prompt Tokens")
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True, verbose_name="Completion Tokens")
+    total_tokens = models.PositiveIntegerField(null=True, blank=True, verbose_name="Total Tokens")
+    tenant_prompt_tokens = models.PositiveIntegerField(null=True, blank=True, verbose_name="Tenant Prompt Tokens (est.)")
+    menu_tokens = models.PositiveIntegerField(null=True, blank=True, verbose_name="Menu Tokens (est.)")
+    history_tokens = models.PositiveIntegerField(null=True, blank=True, verbose_name="History Tokens (est.)")
+    cost_usd = models.DecimalField(max_digits=12, decimal_places=6, null=True, blank=True, verbose_name="Cost (USD)")
+    timestamp = models.DateTimeField(default=now, editable=False, verbose_name="Timestamp")  # Momento de la llamada (no de la escritura en lote)
 
     def __str__(self):
         return f'OpenAI Request {self.request_id} - {self.endpoint}'
+
+
+# 📌 **Modelo de Agregados Diarios de Consumo de OpenAI**
+class OpenAIUsageRollup(models.Model):
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, verbose_name="Tenant")
+    date = models.DateField(verbose_name="Date")
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES, verbose_name="Purpose")
+    model = models.CharField(max_length=50, default="", blank=True, verbose_name="Model")
+    calls = models.PositiveIntegerField(default=0, verbose_name="Calls")
+    errors = models.PositiveIntegerField(default=0, verbose_name="Errors")
+    prompt_tokens = models.PositiveBigIntegerField(default=0, verbose_name="Prompt Tokens")
+    completion_tokens = models.PositiveBigIntegerField(default=0, verbose_name="Completion Tokens")
+    total_tokens = models.PositiveBigIntegerField(default=0, verbose_name="Total Tokens")
+    tenant_prompt_tokens = models.PositiveBigIntegerField(default=0, verbose_name="Tenant Prompt Tokens (est.)")
+    menu_tokens = models.PositiveBigIntegerField(default=0, verbose_name="Menu Tokens (est.)")
+    history_tokens = models.PositiveBigIntegerField(default=0, verbose_name="History Tokens (est.)")
+    latency_ms = models.PositiveBigIntegerField(default=0, verbose_name="Total Latency (ms)")
+    cost_usd = models.DecimalField(max_digits=14, decimal_places=6, default=0, verbose_name="Cost (USD)")
+
+    class Meta:
+        verbose_name = "OpenAI Usage Rollup"
+        verbose_name_plural = "OpenAI Usage Rollups"
+        unique_together = ("tenant", "date", "purpose", "model")
+
+    def __str__(self):
+        return f'{self.tenant} {self.date} {self.purpose} ({self.total_tokens} tokens)'
+
+
+# 📌 **Modelo de Agregados Diarios de la Caché de Respuestas Informativas**
+class ResponseCacheRollup(models.Model):
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, verbose_name="Tenant")
+    date = models.DateField(verbose_name="Date")
+    hits = models.PositiveIntegerField(default=0, verbose_name="Hits")
+    misses = models.PositiveIntegerField(default=0, verbose_name="Misses")
+    latency_saved_ms = models.PositiveBigIntegerField(default=0, verbose_name="Latency Saved (ms)")
+
+    class Meta:
+        verbose_name = "Response Cache Rollup"
+        verbose_name_plural = "Response Cache Rollups"
+        unique_together = ("tenant", "date")
+
+    def __str__(self):
+        return f'{self.tenant} {self.date} ({self.hits} hits / {self.misses} misses)'
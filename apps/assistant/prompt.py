@@ -1,4 +1,69 @@
 # apps/assistant/prompt.py
+import re
+from functools import lru_cache
+
+from django.conf import settings
+
+from apps.tenants.models import TenantPrompt
+
+# 🔹 Huecos con nombre del prompt: {{promo}}, {{menu_link}}, {{policy_link}}, {{language}}.
+# `[Insertar promo si hay disponible]` se mantiene como alias de {{promo}} para los prompts ya creados.
+SLOT_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}|(\[Insertar promo si hay disponible\])")
+
+FIRST_BUY_PROMO = "**PROMOCIÓN ACTIVA**: ¡Este cliente tiene un café gratis por su primera compra a elegir entre café espresso, café con leche y café cortado, unicamente si ha elegido algo más aparte del café! ☕🎉 Si ha pedido un café acompañado de otro articulo, dile que es de regalo y pon su 'unit_price': 0 en la llamada a submit_order, no modifiques otro valor. Para que esta promoción sea válida, el cliente debe haber pedido al menos un producto aparte del café. Si el cliente no ha pedido un café, antes de terminar el pedido, recuérdale la promoción y dile que puede elegir un café gratis si compra al menos un producto adicional. Cuando el cliente confirme, registra siempre el pedido llamando a submit_order."
+
+
+class PromptTemplate:
+    """
+    Prompt compilado una sola vez en segmentos de texto y huecos con nombre;
+    renderizar es solo unir los segmentos con los valores de cada hueco.
+    """
+
+    def __init__(self, content):
+        self.segments = []  # Alterna texto literal y nombres de hueco: [texto, hueco, texto, ...]
+        position = 0
+        for match in SLOT_PATTERN.finditer(content):
+            self.segments += [content[position:match.start()], match.group(1) or "promo"]
+            position = match.end()
+        self.segments.append(content[position:])
+        self.slots = set(self.segments[1::2])
+
+    def render(self, values):
+        return "".join(
+            segment if index % 2 == 0 else str(values.get(segment, ""))
+            for index, segment in enumerate(self.segments)
+        )
+
+
+@lru_cache(maxsize=256)
+def compile_tenant_prompt(tenant_id, prompt_version):
+    """Compila el prompt activo del tenant (o el base). Solo consulta la BD cuando cambia `prompt_version`."""
+    base_prompt = TenantPrompt.objects.filter(tenant_id=tenant_id, is_active=True).only("content").first()
+    return PromptTemplate(base_prompt.content if base_prompt else get_base_prompt())
+
+
+@lru_cache(maxsize=1024)
+def _render_tenant_prompt(tenant_id, prompt_version, first_buy, language):
+    template = compile_tenant_prompt(tenant_id, prompt_version)
+    if first_buy and "promo" not in template.slots:
+        print("⚠️ No se encontró el marcador de promoción en el prompt.", flush=True)
+
+    links = settings.ASSISTANT_PROMPT_LINKS
+    return template.render({
+        "promo": FIRST_BUY_PROMO if first_buy else "",
+        "menu_link": links["MENU"].replace("{tenant_id}", str(tenant_id)),
+        "policy_link": links["POLICY"],
+        "language": language,
+    })
+
+
+def get_tenant_prompt(tenant, first_buy=False, language="es"):
+    """
+    Prompt del tenant ya renderizado. Las variantes (primera compra o no, idioma) se cachean por
+    versión del prompt: guardar o borrar un `TenantPrompt` incrementa `Tenant.prompt_version` y las invalida.
+    """
+    return _render_tenant_prompt(tenant.id, tenant.prompt_version, bool(first_buy), language)
+
 
 def get_base_prompt():
     return """
@@ -12,7 +77,9 @@ def get_base_prompt():
                 ❗ No continuar la conversación hasta que el cliente proporcione el número de mesa.
                 ✅ Recuerda este número durante toda la conversación para el resumen final.
 
-            Política de Privacidad y Carta Digital: "Al usar nuestros servicios, aceptas nuestra Política de Privacidad, Cookies y Condiciones de Uso. Revíselas en: Política de Privacidad. Gracias por tu confianza." "📄 Puedes ver nuestra carta digital aquí: Menú Digital"
+            Política de Privacidad y Carta Digital: "Al usar nuestros servicios, aceptas nuestra Política de Privacidad, Cookies y Condiciones de Uso. Revíselas en: {{policy_link}}. Gracias por tu confianza." "📄 Puedes ver nuestra carta digital aquí: {{menu_link}}"
+
+        {{promo}}
 
         🍲 Gestión del Menú y Pedidos
         Descripción del Menú
@@ -42,7 +109,7 @@ def get_base_prompt():
         Cantidad de Artículos y Validación del Pedido
 
             Permite que el cliente ordene cualquier cantidad de cada artículo.
-            Siempre responde en el mismo idioma en el que el cliente te hable.
+            Siempre responde en el mismo idioma en el que el cliente te hable (idioma actual: {{language}}).
             Si un cliente pide algo que no está en el menú, responde con cortesía:
             "Actualmente no disponemos de ese artículo en nuestro menú. 😊”
             Antes de aceptar el pedido, confirma cada artículo, extras y cantidad.
@@ -53,51 +120,20 @@ def get_base_prompt():
             Antes de finalizar, pregunta: "⭐ ¿Deseas añadir algo más a tu pedido? 😉”
             No generar el resumen final hasta que el cliente confirme.
 
-        📦 Generación del Pedido en JSON
-
-        Cuando el cliente confirma el pedido, debes generar un JSON estructurado con la información del pedido de la siguiente manera:
-
-        {
-            "order_finalized": true,
-            "table_number": "7",
-            "notes": "",
-            "delivery_type": "DINE_IN",
-            "payment_method": "CARD",
-            "discount": 0.00,
-            "tax_amount": 0.00,
-            "scheduled_time": null,
-            "order_items": [
-                {
-                "product_name": "Perrito Baurú",
-                "quantity": 1,
-                "unit_price": 4.90,
-                "extras": [
-                    {
-                    "name": "Salsa de Queso",
-                    "price": 1.20
-                    }
-                ],
-                "exclusions": [],
-                "special_instructions": "",
-                "discount": 0.00,
-                "tax_amount": 0.00
-                },
-                {
-                "product_name": "Coca Cola Zero",
-                "quantity": 2,
-                "unit_price": 2.20,
-                "extras": [],
-                "exclusions": [],
-                "special_instructions": "",
-                "discount": 0.00,
-                "tax_amount": 0.00
-                }
-            ]
-        }
+        📦 Registro del Pedido (herramienta submit_order)
+
+        Cuando el cliente confirma el pedido, debes llamar a la herramienta `submit_order` con la información del pedido:
+
+            table_number: número de mesa confirmado (por ejemplo "7").
+            delivery_type: "DINE_IN", "TAKEAWAY" o "DELIVERY".
+            payment_method: "CARD".
+            order_items: un elemento por artículo con product_name (exactamente como aparece en el menú), quantity, unit_price, extras (name y price), exclusions y special_instructions.
+
+        ❗ Nunca escribas el pedido en formato JSON dentro del mensaje al cliente; usa siempre la herramienta.
 
         📢 Resumen del Pedido para el Cliente
 
-        Después de generar el JSON internamente, envía un resumen del pedido de forma amigable al cliente:
+        En el mismo mensaje en el que llamas a `submit_order`, envía un resumen del pedido de forma amigable al cliente:
 
         "🌟 Este es tu pedido:
 
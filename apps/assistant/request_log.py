@@ -0,0 +1,190 @@
+import atexit
+import hashlib
+import queue
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from apps.assistant.models import OpenAIRequestLog, PromptBlob
+from apps.assistant.usage import estimate_cost, update_usage_rollups
+
+
+def blob_hash(content):
+    """Hash SHA-256 del contenido, usado como clave del `PromptBlob`."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def summarize_response(response):
+    """Extrae de la respuesta de OpenAI solo lo necesario: contenido, tool calls, modelo y uso de tokens."""
+    if response is None:
+        return None, {}
+
+    usage = getattr(response, "usage", None)
+    usage_fields = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+    }
+
+    choices = getattr(response, "choices", None)
+    if not choices:  # Transcripciones y otras respuestas sin `choices`
+        text = getattr(response, "text", None)
+        return ({"text": text} if text is not None else None), usage_fields
+
+    message = choices[0].message
+    return {
+        "id": getattr(response, "id", None),
+        "content": message.content,
+        "tool_calls": [
+            {"name": call.function.name, "arguments": call.function.arguments}
+            for call in (message.tool_calls or [])
+        ],
+        "finish_reason": choices[0].finish_reason,
+    }, usage_fields
+
+
+class RequestLogWriter:
+    """
+    Escritor asíncrono de `OpenAIRequestLog`: encola las filas y las inserta en lotes con
+    `bulk_create` desde un hilo en segundo plano. Los contenidos grandes y repetidos
+    (prompt, menú) se guardan una sola vez como `PromptBlob` direccionados por hash.
+    """
+
+    def __init__(self, batch_size=50, flush_interval=2.0, asynchronous=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.asynchronous = asynchronous
+        self._queue = queue.Queue()
+        self._known_blobs = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def log(self, tenant, request_id, endpoint, purpose="chat", session=None, model=None, route=None, prompt=None,
+            menu=None, request_delta=None, response=None, error=None, latency_ms=None, breakdown=None):
+        """Registra una llamada a OpenAI (con tokens y coste) sin bloquear el camino caliente."""
+        blobs = []
+        prompt_hash = self._blob(prompt, "prompt", blobs)
+        menu_hash = self._blob(menu, "menu", blobs)
+
+        response_delta, usage = summarize_response(response)
+        if error is not None:
+            response_delta = {"error": str(error)}
+
+        row = OpenAIRequestLog(
+            tenant=tenant,
+            request_id=request_id,
+            session=session,
+            endpoint=endpoint,
+            purpose=purpose,
+            model=model,
+            route=route,
+            prompt_blob_id=prompt_hash,
+            menu_blob_id=menu_hash,
+            request_delta=request_delta,
+            response_delta=response_delta,
+            status_code=500 if error is not None else 200,
+            latency_ms=round(latency_ms) if latency_ms is not None else None,
+            cost_usd=estimate_cost(model, usage.get("prompt_tokens"), usage.get("completion_tokens")),
+            **usage,
+            **(breakdown or {}),
+        )
+
+        if not self.asynchronous:
+            self._write(blobs, [row])
+            return
+
+        self._queue.put((blobs, row))
+        self._ensure_thread()
+
+    def flush(self):
+        """Escribe inmediatamente todo lo pendiente en la cola."""
+        blobs, rows = [], []
+        while True:
+            try:
+                item_blobs, row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            blobs += item_blobs
+            rows.append(row)
+        if rows:
+            self._write(blobs, rows)
+
+    def _blob(self, content, kind, blobs):
+        if not content:
+            return None
+        content_hash = blob_hash(content)
+        if content_hash not in self._known_blobs:
+            blobs.append(PromptBlob(hash=content_hash, kind=kind, content=content, size=len(content)))
+        return content_hash
+
+    def _write(self, blobs, rows):
+        if blobs:
+            unique_blobs = list({blob.hash: blob for blob in blobs}.values())
+            saved_blobs = self._insert(PromptBlob, unique_blobs, ignore_conflicts=True)
+            self._known_blobs.update(blob.hash for blob in saved_blobs)
+        rows = self._insert(OpenAIRequestLog, rows)
+        if not rows:
+            return
+
+        try:
+            update_usage_rollups(rows)
+        except Exception as e:
+            print(f"❌ Error actualizando agregados de consumo de OpenAI: {e}", flush=True)
+
+    def _insert(self, model, objs, **options):
+        """
+        Inserta `objs` con un `bulk_create` atómico; si el lote falla, reintenta fila a fila para no
+        perder las válidas y registra cada fila rechazada. Devuelve las filas guardadas.
+        """
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(objs, batch_size=self.batch_size, **options)
+            return objs
+        except Exception as e:
+            print(f"⚠️ Lote de {len(objs)} {model.__name__} rechazado ({e}), reintentando fila a fila...", flush=True)
+
+        saved = []
+        for obj in objs:
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create([obj], **options)
+            except Exception as e:
+                label = getattr(obj, "request_id", None) or obj.pk
+                print(f"❌ {model.__name__} {label} descartado: {e}", flush=True)
+            else:
+                saved.append(obj)
+        return saved
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="openai-request-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            blobs, rows = list(first[0]), [first[1]]
+            while len(rows) < self.batch_size:
+                try:
+                    item_blobs, row = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                blobs += item_blobs
+                rows.append(row)
+
+            self._write(blobs, rows)
+            connections.close_all()  # 🔹 Respeta CONN_MAX_AGE=0 también en el hilo de escritura
+
+
+request_log_writer = RequestLogWriter(
+    batch_size=settings.OPENAI_REQUEST_LOG["BATCH_SIZE"],
+    flush_interval=settings.OPENAI_REQUEST_LOG["FLUSH_INTERVAL"],
+    asynchronous=settings.OPENAI_REQUEST_LOG["ASYNC"],
+)
+atexit.register(request_log_writer.flush)
@@ -0,0 +1,144 @@
+import math
+import threading
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+from apps.menu.lookup import normalize_name
+from apps.menu.versioning import get_menu_version
+
+NGRAM_SIZE = 3
+
+
+def char_ngrams(text):
+    """N-gramas de caracteres por palabra (con bordes), sobre el texto normalizado sin tildes."""
+    grams = []
+    for word in normalize_name(text).split():
+        padded = f" {word} "
+        if len(padded) <= NGRAM_SIZE:
+            grams.append(padded)
+            continue
+        grams.extend(padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1))
+    return grams
+
+
+class MenuIndex:
+    """
+    Índice TF-IDF de n-gramas de caracteres sobre los productos del menú (nombre, categoría,
+    descripción, extras y alérgenos). Se guarda como índice invertido en arrays de NumPy:
+    por cada n-grama, los productos donde aparece y su peso, así que puntuar una consulta es
+    un único `bincount` sobre las listas de los n-gramas de la pregunta.
+    """
+
+    def __init__(self, menu_data):
+        self.items = [
+            (category, product)
+            for category in (menu_data or {}).get("menu", [])
+            for product in category.get("items", [])
+        ]
+        self.categories = [category["category"] for category in (menu_data or {}).get("menu", []) if category.get("items")]
+
+        documents = [Counter(char_ngrams(self._document_text(category, product))) for category, product in self.items]
+        document_frequency = Counter(gram for counts in documents for gram in counts)
+        total = len(documents)
+        self.idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+
+        # 🔹 Pesos TF (sublineal) × IDF normalizados (L2) por producto, agrupados por n-grama
+        postings = {}
+        for doc_id, counts in enumerate(documents):
+            weights = {gram: (1 + math.log(count)) * self.idf[gram] for gram, count in counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+            for gram, weight in weights.items():
+                postings.setdefault(gram, []).append((doc_id, weight / norm))
+
+        self._slices = {}
+        doc_ids, weights, offset = [], [], 0
+        for gram, entries in postings.items():
+            self._slices[gram] = (offset, offset + len(entries))
+            offset += len(entries)
+            doc_ids.extend(doc_id for doc_id, _ in entries)
+            weights.extend(weight for _, weight in entries)
+        self._doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self._weights = np.asarray(weights, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.items)
+
+    @staticmethod
+    def _document_text(category, product):
+        return " ".join([
+            product["name"], product["name"], category["category"],  # El nombre pesa el doble que el resto
+            product.get("description") or "",
+            " ".join(extra["name"] for extra in product.get("extras", [])),
+            " ".join(product.get("allergens", [])),
+        ])
+
+    def search(self, query, k):
+        """Devuelve hasta `k` pares `(índice del producto, similitud coseno)` ordenados de mayor a menor."""
+        counts = Counter(gram for gram in char_ngrams(query) if gram in self._slices)
+        if not counts or not self.items:
+            return []
+
+        query_weights = {gram: (1 + math.log(count)) * self.idf[gram] for gram, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in query_weights.values()))
+        doc_ids = np.concatenate([self._doc_ids[slice(*self._slices[gram])] for gram in query_weights])
+        weights = np.concatenate([
+            self._weights[slice(*self._slices[gram])] * (weight / norm) for gram, weight in query_weights.items()
+        ])
+        scores = np.bincount(doc_ids, weights=weights, minlength=len(self.items))
+
+        k = min(k, len(self.items))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in top if scores[doc_id] > 0]
+
+    def subset(self, query, k, min_score):
+        """
+        Menú reducido a los `k` productos más relevantes para el mensaje, más la lista completa de
+        categorías. Devuelve None si nada supera `min_score` (el llamador usa entonces el menú completo).
+        """
+        hits = [(doc_id, score) for doc_id, score in self.search(query, k) if score >= min_score]
+        if not hits:
+            return None
+
+        selected = {}
+        for doc_id, _ in sorted(hits):
+            category, product = self.items[doc_id]
+            selected.setdefault(category["category"], {**category, "items": []})["items"].append(product)
+        return {"categories": self.categories, "menu": list(selected.values())}
+
+
+_indexes = {}  # tenant_id → (menu_version, MenuIndex)
+_indexes_lock = threading.Lock()
+
+
+def get_menu_index(tenant, menu_data):
+    """Índice de recuperación del menú del tenant, reconstruido solo cuando cambia `menu_version`."""
+    menu_version = get_menu_version(tenant)
+    cached = _indexes.get(tenant.id)
+    if cached and cached[0] == menu_version:
+        return cached[1]
+
+    index = MenuIndex(menu_data)
+    with _indexes_lock:
+        _indexes[tenant.id] = (menu_version, index)
+    return index
+
+
+def select_menu_for_turn(tenant, menu_data, user_message, full_menu_required=False):
+    """
+    Menú que se envía al modelo en este turno: el subconjunto relevante para el mensaje si el menú
+    es grande, o el completo cuando el resumen del pedido lo necesita (o la búsqueda no encuentra nada).
+    Devuelve `(menu, subset_used)`.
+    """
+    config = settings.ASSISTANT_MENU_RETRIEVAL
+    if not config["ENABLED"] or full_menu_required or not menu_data:
+        return menu_data, False
+
+    index = get_menu_index(tenant, menu_data)
+    if len(index) < config["MIN_ITEMS"]:
+        return menu_data, False
+
+    subset = index.subset(user_message, config["TOP_K"], config["MIN_SCORE"])
+    return (subset, True) if subset else (menu_data, False)
@@ -0,0 +1,107 @@
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+from .gateway import EndpointMetrics
+from .intents import INTENT_INFORMATIONAL, INTENT_ORDERING, classify_intent, normalize_message
+
+ROUTE_LIGHT = "light"  # Modelo ligero, sin menú y con historial recortado
+ROUTE_MENU = "menu"    # Menú completo e historial recortado, sin herramienta de pedido
+ROUTE_FULL = "full"    # Contexto completo y `submit_order`: reservado para turnos de pedido
+
+# 🔹 Turnos triviales que no necesitan la carta: saludos, agradecimientos, confirmaciones, número de mesa...
+TRIVIAL_PATTERNS = [
+    r"^(?:hola|buenas(?: tardes| noches)?|buenos dias|hey|hi|hello|good (?:morning|afternoon|evening))$",
+    r"^(?:muchas )?gracias(?: .{0,20})?$", r"^(?:thanks|thank you)(?: .{0,20})?$",
+    r"^(?:si|vale|ok|okay|perfecto|genial|de acuerdo|claro|yes|sure|no|nope|no gracias)$",
+    r"^(?:adios|hasta luego|chao|bye|nos vemos)$",
+    r"^(?:(?:estoy en |estamos en )?(?:la )?mesa\s*(?:numero\s*)?)?\d{1,3}$", r"^(?:table\s*)?\d{1,3}$",
+]
+
+# 🔹 Confirmaciones que, con un pedido en curso, pueden cerrar el pedido (necesitan `submit_order`)
+CONFIRMATION_PATTERN = re.compile(r"^(?:si|vale|ok|okay|perfecto|de acuerdo|claro|yes|sure|confirm\w*|eso es todo|nada mas)$")
+
+_TRIVIAL_RE = re.compile("|".join(TRIVIAL_PATTERNS))
+
+
+def complexity_score(normalized, mentions_product):
+    """
+    Clasificador ligero: puntúa la complejidad de un mensaje ya normalizado.
+    Por debajo de `ASSISTANT_ROUTER["LIGHT_MAX_SCORE"]` el turno se considera trivial.
+    """
+    words = normalized.split()
+    score = len(words) / 4
+    score += 3 if mentions_product else 0
+    score += 1 if any(word.isdigit() for word in words) and len(words) > 2 else 0
+    return score
+
+
+def route_turn(user_message, session, product_matcher):
+    """
+    Decide cómo atender un turno sin llamar al LLM. Devuelve `(route, intent, reason)`:
+    los turnos de pedido (o con un pedido en curso) van siempre por la ruta completa.
+    """
+    intent = classify_intent(user_message)
+    normalized = normalize_message(user_message)
+    order_in_progress = bool((session.context or {}).get("order_in_progress"))
+
+    if intent == INTENT_ORDERING:
+        return ROUTE_FULL, intent, "intención de pedido"
+
+    if order_in_progress and CONFIRMATION_PATTERN.match(normalized):
+        return ROUTE_FULL, intent, "confirmación con pedido en curso"
+
+    mentions_product = product_matcher.mentions(user_message)
+    if _TRIVIAL_RE.match(normalized) and not order_in_progress:
+        return ROUTE_LIGHT, intent, "regla de turno trivial"
+
+    if intent == INTENT_INFORMATIONAL:
+        return (ROUTE_FULL if order_in_progress else ROUTE_MENU), intent, "consulta sobre la carta"
+
+    if mentions_product:
+        return ROUTE_FULL, intent, "menciona un producto"
+
+    if not order_in_progress and complexity_score(normalized, mentions_product) <= settings.ASSISTANT_ROUTER["LIGHT_MAX_SCORE"]:
+        return ROUTE_LIGHT, intent, "baja complejidad"
+
+    return ROUTE_FULL, intent, "por defecto"
+
+
+def route_config(route):
+    """Modelo, historial, menú y herramientas que corresponden a cada ruta."""
+    config = settings.ASSISTANT_ROUTER
+    return {
+        ROUTE_LIGHT: {"model": config["LIGHT_MODEL"], "history": config["LIGHT_HISTORY"], "menu": False, "tools": False},
+        ROUTE_MENU: {"model": config["FULL_MODEL"], "history": config["MENU_HISTORY"], "menu": True, "tools": False},
+        ROUTE_FULL: {"model": config["FULL_MODEL"], "history": config["FULL_HISTORY"], "menu": True, "tools": True},
+    }[route]
+
+
+class RouteStats:
+    """Decisiones y latencias por ruta (proceso actual), para el dashboard del asistente."""
+
+    def __init__(self):
+        self._metrics = defaultdict(EndpointMetrics)
+        self._reasons = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def record(self, route, reason, latency_ms, error=None):
+        with self._lock:
+            self._reasons[route][reason] += 1
+        if error is not None:
+            self._metrics[route].record_error(error)
+        else:
+            self._metrics[route].record_success(latency_ms)
+
+    def snapshot(self):
+        with self._lock:
+            reasons = {route: dict(counts) for route, counts in self._reasons.items()}
+        return {
+            route: {**metrics.snapshot(), "reasons": reasons.get(route, {})}
+            for route, metrics in sorted(self._metrics.items())
+        }
+
+
+route_stats = RouteStats()
@@ -1,91 +1,102 @@
 # Python standard library imports
 import json
-import re
+import time
 import uuid
 
-# Third party imports
-import openai
-from django.conf import settings
-
 # Local application imports
-from .prompt import get_base_prompt
-from apps.assistant.models import AIMessage, OpenAIRequestLog
-from apps.chat.models import ChatMessage
-from apps.menu.services import get_menu_data
-from apps.orders.services import save_order_to_db
-from apps.tenants.models import TenantPrompt
+from .cache import record_response_cache_lookup, response_cache
+from .flow import flow_state_message, is_bare_number, run_scripted_flow
+from .gateway import OpenAIGatewayError, gateway
+from .intents import (
+    INTENT_INFORMATIONAL, INTENT_ORDERING, extract_dietary_constraints, is_self_contained, mentions_dietary_constraints,
+)
+from .prompt import get_tenant_prompt
+from .tools import FILTER_MENU_TOOL, SUBMIT_ORDER_TOOL, parse_filter_menu_arguments, parse_submit_order_arguments
+from .usage import check_prompt_budget, prompt_breakdown
+from .utils import get_product_name_matcher, restore_placeholders
+from .request_log import request_log_writer
+from .retrieval import select_menu_for_turn
+from .router import route_config, route_stats, route_turn
+from apps.chat.services import flush_turn_messages, log_turn_message
+from apps.menu.dietary import get_dietary_index
+from apps.menu.stock import OutOfStockError
+from apps.menu.versioning import get_menu_version
+from apps.orders.services import build_order_summary, resolve_order_items, save_order_to_db
 from apps.whatsapp.utils import (
     send_policy_interactive_message,
 )
 
-
-openai.api_key = settings.OPENAI_API_KEY
-
-def remove_json_blocks(text):
-    """Eliminar cualquier bloque JSON del texto, ya sea en Markdown o como parte del mensaje."""
-    
-    # 🏷️ Paso 1: Eliminar bloques JSON en formato Markdown ```json ... ```
-    text = re.sub(r'```json.*?```', '', text, flags=re.DOTALL).strip()
-
-    # 🏷️ Paso 2: Detectar y eliminar JSON al final del texto
-    json_match = re.search(r'(\{.*"order_finalized":\s*true.*\})', text, re.DOTALL)
-    
-    if json_match:
-        print("📦 JSON detectado y eliminado:", json_match.group(1), flush=True)
-        text = text.replace(json_match.group(1), "").strip()
-
-    return text
-
-def detect_language_openai(text):
+def log_auxiliary_call(session, purpose, model, text, started_at, response=None, error=None):
+    """Registra las llamadas auxiliares (detección de idioma, traducción) para la contabilidad de tokens."""
+    if session is None:
+        return
+    request_log_writer.log(
+        tenant=session.tenant,
+        request_id=str(uuid.uuid4()),
+        endpoint="ChatCompletion",
+        purpose=purpose,
+        session=session,
+        model=getattr(response, "model", None) or model,
+        request_delta={"chars": len(text or "")},
+        response=response,
+        error=error,
+        latency_ms=(time.perf_counter() - started_at) * 1000,
+    )
+
+def detect_language_openai(text, session=None):
     """Detecta el idioma de un mensaje usando OpenAI"""
+    started_at = time.perf_counter()
     try:
-        response = openai.chat.completions.create(
+        response = gateway.chat(
+            purpose="detect",
             model="gpt-4o-mini",
             messages=[{"role": "system", "content": "Detecta el idioma de este texto y responde solo con el código de idioma ISO 639-1. Si unicamente te escriben un valor numerico (1 o 4), el idioma sigue siendo español:"},
                       {"role": "user", "content": text}]
         )
+        log_auxiliary_call(session, "detect", "gpt-4o-mini", text, started_at, response=response)
         detected_lang = response.choices[0].message.content.strip()
         return detected_lang if len(detected_lang) == 2 else "es"  # Si falla, asumimos español
     except Exception as e:
+        log_auxiliary_call(session, "detect", "gpt-4o-mini", text, started_at, error=e)
         print(f"⚠️ Error detectando idioma: {e}", flush=True)
         return "es"  # Fallback a español en caso de error
     
-def translate_text_openai(text, target_language):
+def translate_text_openai(text, target_language, session=None):
     """Traduce un texto al idioma deseado usando OpenAI."""
+    started_at = time.perf_counter()
     try:
-        response = openai.chat.completions.create(
+        response = gateway.chat(
+            purpose="translate",
             model="gpt-4o-mini",
             messages=[{"role": "system", "content": f"Traduce este texto al {target_language}, si unicamente te escriben un valor numerico (1 o 4), el idioma sigue siendo español:"},
                       {"role": "user", "content": text}]
         )
+        log_auxiliary_call(session, "translate", "gpt-4o-mini", text, started_at, response=response)
         return response.choices[0].message.content.strip()
     except Exception as e:
+        log_auxiliary_call(session, "translate", "gpt-4o-mini", text, started_at, error=e)
         print(f"⚠️ Error traduciendo texto: {e}", flush=True)
         return text  # Si hay error, devolver el texto original
 
-def protect_product_names(text, product_list):
+def protect_product_names(text, matcher):
     """
     Sustituye los nombres de los productos en el texto por marcadores temporales
     para evitar que se traduzcan.
     """
-    protected_names = {}
-    for idx, product in enumerate(product_list):
-        placeholder = f"##PRODUCT{idx}##"
-        protected_names[placeholder] = product
-        text = re.sub(rf'\b{re.escape(product)}\b', placeholder, text, flags=re.IGNORECASE)
-    
-    return text, protected_names
+    return matcher.protect(text)
 
 def restore_product_names(text, protected_names):
     """
     Restaura los nombres originales de los productos en el texto después de la traducción.
     """
-    for placeholder, product in protected_names.items():
-        text = text.replace(placeholder, product)
-    return text
+    return restore_placeholders(text, protected_names)
 
-def generate_openai_response(message, session, contact, transcribed_text=None):
-    """Genera una respuesta de OpenAI asegurando que sea en el idioma del usuario"""
+def generate_openai_response(message, turn, transcribed_text=None):
+    """
+    Genera una respuesta de OpenAI asegurando que sea en el idioma del usuario.
+    `turn` es el `TurnContext` del mensaje: tenant, contacto, sesión y menú ya cargados.
+    """
+    session, contact = turn.session, turn.contact
 
     # 📌 Obtener el mensaje del usuario
     user_message = transcribed_text if transcribed_text else message.get('text', {}).get('body')
@@ -97,77 +108,169 @@ def generate_openai_response(message, session, contact, transcribed_text=None):
         send_policy_interactive_message(contact.phone_number, session.tenant)
         return "📜 Antes de continuar, por favor acepta nuestra política de privacidad en el mensaje interactivo enviado. Gracias."
 
-    # 🔍 Detectar idioma antes de continuar
-    detected_language = detect_language_openai(user_message)
+    # 🔍 Detectar idioma antes de continuar (un número suelto, p. ej. la mesa, mantiene el idioma de la sesión)
+    if is_bare_number(user_message):
+        detected_language = session.last_detected_language or "es"
+    else:
+        detected_language = detect_language_openai(user_message, session=session)
     print(f"🔍 Idioma detectado: {detected_language}", flush=True)
 
     # 📍 Verificar si el idioma cambió en la sesión
     if session.last_detected_language != detected_language:
         print(f"🌍 Cambio de idioma detectado: {session.last_detected_language} → {detected_language}", flush=True)
         session.last_detected_language = detected_language
-        session.save()
+        session.save(update_fields=["last_detected_language"])
 
-    # 📋 Obtener el prompt base del tenant
-    base_prompt = TenantPrompt.objects.filter(tenant=session.tenant, is_active=True).first()
-    prompt_content = base_prompt.content if base_prompt else get_base_prompt()
-    
+    # 📋 Prompt del tenant ya compilado y renderizado (cacheado por versión, primera compra e idioma)
     if contact.first_buy:
         print("🎁 Este es el primer pedido del usuario. Insertando promoción en el prompt.", flush=True)
-
-        promo_message = "**PROMOCIÓN ACTIVA**: ¡Este cliente tiene un café gratis por su primera compra a elegir entre café espresso, café con leche y café cortado, unicamente si ha elegido algo más aparte del café! ☕🎉 Si ha pedido un café acompañado de otro articulo, dile que es de regalo y pon su 'unit_price': 0 en el JSON, no modifiques otro valor. Para que esta promoción sea válida, el cliente debe haber pedido al menos un producto aparte del café. Si el cliente no ha pedido un café, antes de terminar el pedido, recuérdale la promoción y dile que puede elegir un café gratis si compra al menos un producto adicional. Siempre genera el JSON, no te olvides de poner el 'order_finalized': true en el JSON."
-
-        # 🔹 Reemplazar marcador en el prompt
-        if "[Insertar promo si hay disponible]" in prompt_content:
-            prompt_content = prompt_content.replace("[Insertar promo si hay disponible]", promo_message)
-        else:
-            print("⚠️ No se encontró el marcador de promoción en el prompt.", flush=True)
-
-    # 📋 Obtener el menú del tenant
-    menu_data = get_menu_data(session.tenant)
-
-    # 🛑 Extraer nombres de productos para protegerlos antes de traducir
-    product_names = []
-    if menu_data:
-        for category in menu_data.get("menu", []):
-            for product in category.get("items", []):
-                product_names.append(product["name"])
+    prompt_content = get_tenant_prompt(session.tenant, first_buy=contact.first_buy, language=detected_language)
+
+    # 📋 Obtener el menú del tenant (una sola vez por turno)
+    menu_data = turn.menu_data
+
+    # 🧾 Pasos guionizados (saludo, mesa, categorías) resueltos sin llamar al asistente
+    scripted_started_at = time.perf_counter()
+    scripted_reply, user_message = run_scripted_flow(user_message, session, detected_language, menu_data)
+    if scripted_reply:
+        route_stats.record("scripted", (session.context or {}).get("flow_state"), (time.perf_counter() - scripted_started_at) * 1000)
+        save_assistant_reply(turn, scripted_reply)
+        return scripted_reply
+
+    # 🛑 Matcher precompilado de nombres de productos para protegerlos antes de traducir
+    product_matcher = get_product_name_matcher(session.tenant, menu_data)
+
+    # 🧭 Enrutar el turno localmente (reglas + clasificador ligero) y marcar si hay un pedido en curso
+    route, intent, route_reason = route_turn(user_message, session, product_matcher)
+    config = route_config(route)
+    print(f"🧭 Ruta '{route}' ({route_reason}) → {config['model']}", flush=True)
+    order_already_in_progress = bool((session.context or {}).get("order_in_progress"))
+    if intent == INTENT_ORDERING:
+        set_order_in_progress(session, True)
+
+    # 🧠 Caché de respuestas informativas (opt-in por tenant): preguntas sobre la carta que se entienden solas
+    # y sin pedido en curso. Se responden sin historial ni estado de la sesión, así que la respuesta solo
+    # depende de la clave (tenant, versiones de menú y prompt, idioma y pregunta normalizada)
+    cache_key = None
+    if (
+        session.tenant.response_cache_enabled
+        and intent == INTENT_INFORMATIONAL
+        and not (session.context or {}).get("order_in_progress")
+        and is_self_contained(user_message)
+    ):
+        cache_key = response_cache.build_key(
+            session.tenant.id,
+            get_menu_version(session.tenant),
+            f"{session.tenant.prompt_version}:{int(bool(contact.first_buy))}",
+            detected_language,
+            user_message,
+        )
+        cached_entry = response_cache.get(cache_key)
+        record_response_cache_lookup(session.tenant, cached_entry)
+        if cached_entry:
+            print("⚡ Respuesta servida desde la caché de respuestas informativas.", flush=True)
+            save_assistant_reply(turn, cached_entry["response"])
+            return cached_entry["response"]
+
+    if cache_key:
+        state_message = unresolved_message = None
+        context_messages = []
+    else:
+        # 🧾 Estado capturado por el flujo guiado (mesa confirmada) e ítems del último `submit_order` fuera de carta
+        state_message = flow_state_message(session)
+        unresolved_message = unresolved_items_message(session)
+
+        # 🗂️ Historial de la sesión (recortado según la ruta; el mensaje actual aún no está guardado)
+        context_messages = [
+            {"role": msg.role if msg.role in ['user', 'assistant', 'system'] else 'user', "content": msg.content}
+            for msg in session.messages.order_by('-timestamp')[:config["history"]][::-1]
+        ]
 
     # 🚀 Preparar el contexto inicial
     messages = [{"role": "system", "content": prompt_content}]
 
-    # 🗂️ Añadir el menú en español (sin traducción aún)
-    if menu_data:
-        messages.append({"role": "system", "content": f"📋 Menú en español: {menu_data}"})
+    # 🗂️ Añadir el menú en español (sin traducción aún), salvo en la ruta ligera. Con cartas grandes solo van
+    # los productos afines al mensaje; con un pedido ya en curso, el completo para poder resumirlo entero
+    turn_menu, menu_subset = select_menu_for_turn(
+        session.tenant, menu_data, user_message, full_menu_required=order_already_in_progress or not config["menu"]
+    )
+    if menu_subset:
+        print(f"🔎 Menú reducido a {sum(len(c['items']) for c in turn_menu['menu'])} productos relevantes.", flush=True)
+    menu_text = str(turn_menu) if turn_menu else None
+    if menu_text and config["menu"]:
+        messages.append({"role": "system", "content": f"📋 Menú en español: {menu_text}"})
+
+    # 🥗 Si el cliente pregunta por alérgenos o dietas, darle al modelo la lista de aptos ya calculada
+    dietary_message = dietary_filter_message(session, user_message) if config["menu"] else None
+    if dietary_message:
+        messages.append(dietary_message)
+
+    # 🧾 Inyectar el estado capturado por el flujo guiado (mesa confirmada)
+    if state_message:
+        messages.append(state_message)
+
+    # 🔎 Avisar al modelo de los ítems del último `submit_order` que no estaban en la carta
+    if unresolved_message:
+        messages.append(unresolved_message)
 
     # 🗂️ Añadir historial de la sesión
-    context_messages = [
-        {"role": msg.role if msg.role in ['user', 'assistant', 'system'] else 'user', "content": msg.content}
-        for msg in session.messages.order_by('-timestamp')[:30][::-1]
-    ]
     messages += context_messages
 
     # 🆕 Añadir el mensaje del usuario con etiqueta de idioma
     messages.append({"role": "user", "content": f"[Idioma detectado: {detected_language}] {user_message}"})
 
-    # 📦 Preparar la solicitud a OpenAI
+    # 📦 Preparar la solicitud a OpenAI (`filter_menu` con el menú, la herramienta de pedido solo en la ruta completa)
     request_id = str(uuid.uuid4())
     payload = {
-        "model": "gpt-4o-mini",
+        "model": config["model"],
         "messages": messages,
         "temperature": 0.4,
     }
+    tools = ([FILTER_MENU_TOOL] if config["menu"] else []) + ([SUBMIT_ORDER_TOOL] if config["tools"] else [])
+    if tools:
+        payload["tools"] = tools
+        payload["tool_choice"] = "auto"
+
+    # 📏 Desglose estimado del prompt y aviso si la parte estática supera el presupuesto
+    breakdown = prompt_breakdown(prompt_content, menu_text, context_messages)
+    check_prompt_budget(session.tenant, breakdown)
+    if not config["menu"]:
+        breakdown["menu_tokens"] = 0
+
+    # 📋 Lo que cambia en cada turno (el prompt y el menú se registran aparte, deduplicados)
+    request_delta = {
+        "user_message": messages[-1]["content"],
+        "history_messages": len(context_messages),
+        "temperature": payload["temperature"],
+        "route_reason": route_reason,
+    }
 
+    started_at = time.perf_counter()
+    chat_latency_ms = None
     try:
         # 🚀 Llamada a OpenAI
-        response = openai.chat.completions.create(**payload)
-        ai_response = response.choices[0].message.content
-        print(f"📩 Respuesta de la IA (antes de limpiar JSON): {ai_response}", flush=True)
-        
-        # ❌ Eliminar bloques JSON de la respuesta
-        ai_response = remove_json_blocks(ai_response)
-        
+        response = gateway.chat(purpose="chat", **payload)
+        chat_latency_ms = (time.perf_counter() - started_at) * 1000
+        route_stats.record(route, route_reason, chat_latency_ms)
+        response_message = response.choices[0].message
+        ai_response = response_message.content or ""
+        print(f"📩 Respuesta de la IA: {ai_response}", flush=True)
+
+        # 📦 Procesar la llamada a `submit_order` si el modelo ha finalizado el pedido
+        order_call = next(
+            (call for call in (response_message.tool_calls or []) if call.function.name == "submit_order"),
+            None,
+        )
+        if order_call:
+            ai_response = handle_submit_order_call(order_call, turn, ai_response)
+
+        # 🥗 Responder a `filter_menu` con el índice de alérgenos y pedir la respuesta final al modelo
+        filter_calls = [call for call in (response_message.tool_calls or []) if call.function.name == "filter_menu"]
+        if filter_calls and not order_call:
+            ai_response = answer_filter_menu_calls(response_message, filter_calls, payload, session, route) or ai_response
+
         # 🔍 Detectar el idioma de la respuesta de OpenAI
-        response_language = detect_language_openai(ai_response).lower()
+        response_language = detect_language_openai(ai_response, session=session).lower()
         print(f"🔍 Idioma detectado en respuesta de OpenAI: {response_language}", flush=True)
 
         # 🔄 Si la respuesta está en otro idioma, proteger nombres de productos antes de traducir
@@ -175,10 +278,10 @@ def generate_openai_response(message, session, contact, transcribed_text=None):
             print(f"🔄 Traduciendo respuesta de {response_language} a {detected_language}...", flush=True)
 
             # 🚀 Proteger nombres de productos
-            ai_response_protected, protected_names = protect_product_names(ai_response, product_names)
+            ai_response_protected, protected_names = protect_product_names(ai_response, product_matcher)
 
             # 🔄 Traducir el texto con nombres protegidos
-            translated_response = translate_text_openai(ai_response_protected, target_language=detected_language)
+            translated_response = translate_text_openai(ai_response_protected, target_language=detected_language, session=session)
 
             # 🔙 Restaurar nombres de productos después de traducir
             ai_response = restore_product_names(translated_response, protected_names)
@@ -186,78 +289,227 @@ def generate_openai_response(message, session, contact, transcribed_text=None):
         print(f"📩 Respuesta de la IA (final después de traducir y restaurar nombres): {ai_response}", flush=True)
 
         # 💾 Guardar SIEMPRE el mensaje de la IA
-        ChatMessage.objects.create(
-            tenant=session.tenant,
-            session=session.chat_session,
-            sender='bot',
-            message_content=ai_response
-        )
+        save_assistant_reply(turn, ai_response)
 
-        AIMessage.objects.create(
-            tenant=session.tenant,
-            session=session,
-            role='assistant',
-            content=ai_response
-        )
-        
-        # ✅ Verificar si hay un bloque JSON para la finalización del pedido
-        if 'order_finalized' in response.choices[0].message.content:
-            print("✅ Pedido finalizado detectado, procesando JSON...", flush=True)
-            context_messages.append({"role": "assistant", "content": response.choices[0].message.content})  # Añadir al historial
-            extract_order_json(context_messages, session)
-
-        # 📋 Registrar la solicitud y la respuesta
-        OpenAIRequestLog.objects.create(
+        # 🧠 Guardar la respuesta informativa en caché junto con la latencia que ha costado
+        if cache_key and not order_call:
+            response_cache.set(cache_key, ai_response, (time.perf_counter() - started_at) * 1000)
+
+        # 📋 Registrar la solicitud y la respuesta (asíncrono, prompt y menú deduplicados)
+        request_log_writer.log(
             tenant=session.tenant,
             request_id=request_id,
             endpoint="ChatCompletion",
-            payload=payload,
-            response=response.to_dict(),
-            status_code=200
+            session=session,
+            model=response.model,
+            route=route,
+            prompt=prompt_content,
+            menu=menu_text if config["menu"] else None,
+            request_delta=request_delta,
+            response=response,
+            latency_ms=chat_latency_ms,
+            breakdown=breakdown,
         )
 
         return ai_response
 
     except Exception as e:
         # 🚨 Registrar el error
-        OpenAIRequestLog.objects.create(
+        if chat_latency_ms is None:
+            route_stats.record(route, route_reason, None, error=e)
+        request_log_writer.log(
             tenant=session.tenant,
             request_id=request_id,
             endpoint="ChatCompletion",
-            payload=payload,
-            response={"error": str(e)},
-            status_code=500
+            session=session,
+            model=payload["model"],
+            route=route,
+            prompt=prompt_content,
+            menu=menu_text if config["menu"] else None,
+            request_delta=request_delta,
+            error=e,
+            latency_ms=(time.perf_counter() - started_at) * 1000,
         )
-        return f"Error al generar respuesta: {str(e)}"
+        print(f"❌ Error al generar respuesta: {e}", flush=True)
+        if isinstance(e, OpenAIGatewayError):
+            return "😔 Ahora mismo estamos teniendo problemas para responder. Por favor, inténtalo de nuevo en unos minutos."
+        return "😔 Ha ocurrido un error al procesar tu mensaje. Por favor, inténtalo de nuevo."
+
+
 
+def handle_submit_order_call(order_call, turn, ai_response):
+    """
+    Valida y guarda el pedido enviado por el modelo mediante `submit_order`.
+    Un pedido mal formado se rechaza aquí mismo, sin una segunda llamada al modelo.
+    """
+    session = turn.session
+    print(f"✅ Pedido recibido vía submit_order: {order_call.function.arguments}", flush=True)
+    try:
+        order_data = parse_submit_order_arguments(order_call.function.arguments)
+    except ValueError as e:
+        print(f"❌ Pedido rechazado: {e}", flush=True)
+        return "😔 No he podido registrar tu pedido. ¿Podrías confirmarme de nuevo los artículos y tu número de mesa?"
+
+    # 🧾 La mesa capturada por el flujo guiado prevalece sobre la que deduzca el modelo
+    captured_table = (session.context or {}).get("table_number")
+    if session.tenant.scripted_flow_enabled and captured_table:
+        order_data["table_number"] = captured_table
+
+    # 🔎 Resolver los ítems contra el índice del menú; si alguno no está en la carta, no se guarda nada
+    lines, unresolved = resolve_order_items(order_data, session.tenant)
+    if unresolved:
+        print(f"❌ Pedido con ítems no encontrados en la carta: {unresolved}", flush=True)
+        set_unresolved_items(session, unresolved)
+        return (
+            f"😔 No he encontrado en la carta: {', '.join(unresolved)}. "
+            "¿Podrías indicarme el nombre tal y como aparece en el menú?"
+        )
 
-def extract_order_json(context_messages, session):
-    print("🚀 Extrayendo JSON del pedido...", flush=True)
-    for msg in context_messages[::-1]:  # Revisar desde el final hacia atrás
-        content = msg.get("content", "")
+    try:
+        order = save_order_to_db(order_data, turn, lines=lines)
+    except OutOfStockError as e:
+        print(f"❌ Pedido rechazado por falta de stock: {e.products}", flush=True)
+        return (
+            f"😔 Lo sentimos, no nos queda suficiente de: {', '.join(e.products)}. "
+            "¿Quieres cambiarlo por otra cosa o pedir menos unidades?"
+        )
+    if not order:
+        return "😔 Ha ocurrido un problema al registrar tu pedido. ¿Podrías confirmarlo de nuevo?"
+
+    print("✅ Pedido guardado en la base de datos.", flush=True)
+    set_unresolved_items(session, None)
+    set_order_in_progress(session, False)
+    return ai_response or build_order_summary(order)
+
+
+def dietary_filter_message(session, user_message):
+    """
+    Mensaje de sistema con los productos aptos si el cliente pregunta por alérgenos o dietas (None si no).
+    El filtro sale del índice de bits del menú, así que no depende de que el modelo razone sobre la carta.
+    """
+    if not mentions_dietary_constraints(user_message):
+        return None
+
+    index = get_dietary_index(session.tenant)
+    allergens, diets = extract_dietary_constraints(user_message, index.allergen_names)
+    if not allergens and not diets:
+        return None
+
+    result = index.filter(allergens=allergens, diets=diets)
+    print(f"🥗 Filtro {result['allergens']} {result['diets']} → {len(result['products'])} productos aptos", flush=True)
+    return {
+        "role": "system",
+        "content": (
+            "🥗 Productos aptos para lo que pregunta el cliente, calculados a partir de la carta "
+            f"(usa solo estos, sin añadir otros): {json.dumps(result, ensure_ascii=False)}"
+        ),
+    }
 
-        # Eliminar posibles bloques de código Markdown (```json ... ```)
-        cleaned_content = re.sub(r'```json|```', '', content).strip()
 
-        # Verificar si el contenido tiene el JSON de finalización de pedido
-        if '"order_finalized": true' in cleaned_content:
-            print(f"📦 JSON encontrado: {cleaned_content}", flush=True)
+def answer_filter_menu_calls(response_message, filter_calls, payload, session, route):
+    """
+    Ejecuta las llamadas a `filter_menu` del modelo y le devuelve los resultados en una segunda llamada
+    (sin herramientas, para no encadenar más rondas). Devuelve el texto final o None si falla.
+    """
+    index = get_dietary_index(session.tenant)
+    tool_messages = []
+    for call in response_message.tool_calls:
+        if call.function.name != "filter_menu":
+            content = {"error": "Herramienta no disponible en este turno."}
+        else:
             try:
-                # Extraer el JSON usando expresiones regulares
-                json_match = re.search(r'\{.*"order_finalized": true.*\}', cleaned_content, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(0)
-
-                    # Convertir a diccionario
-                    order_data = json.loads(json_str)
-
-                    # Guardar el pedido
-                    save_order_to_db(order_data, session)
-                    
-                    print("✅ Pedido guardado en la base de datos.", flush=True)
-                else:
-                    print("❌ No se encontró un bloque JSON válido.", flush=True)
-
-            except json.JSONDecodeError as e:
-                print(f"❌ Error al decodificar JSON: {e}", flush=True)
-            break
+                allergens, diets = parse_filter_menu_arguments(call.function.arguments)
+                content = index.filter(allergens=allergens, diets=diets)
+            except ValueError as e:
+                content = {"error": str(e)}
+        tool_messages.append({"role": "tool", "tool_call_id": call.id, "content": json.dumps(content, ensure_ascii=False)})
+    print(f"🥗 filter_menu ejecutada localmente ({len(filter_calls)} llamadas)", flush=True)
+
+    follow_up = {key: value for key, value in payload.items() if key not in ("tools", "tool_choice")}
+    follow_up["messages"] = payload["messages"] + [
+        {
+            "role": "assistant",
+            "content": response_message.content,
+            "tool_calls": [
+                {"id": call.id, "type": "function", "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                for call in response_message.tool_calls
+            ],
+        },
+        *tool_messages,
+    ]
+
+    request_id = str(uuid.uuid4())
+    request_delta = {"tool": "filter_menu", "tool_results": len(tool_messages)}
+    started_at = time.perf_counter()
+    try:
+        response = gateway.chat(purpose="chat", **follow_up)
+    except Exception as e:
+        print(f"❌ Error al responder con el resultado de filter_menu: {e}", flush=True)
+        request_log_writer.log(
+            tenant=session.tenant,
+            request_id=request_id,
+            endpoint="ChatCompletion",
+            session=session,
+            model=follow_up["model"],
+            route=route,
+            request_delta=request_delta,
+            error=e,
+            latency_ms=(time.perf_counter() - started_at) * 1000,
+        )
+        return None
+
+    request_log_writer.log(
+        tenant=session.tenant,
+        request_id=request_id,
+        endpoint="ChatCompletion",
+        session=session,
+        model=response.model,
+        route=route,
+        request_delta=request_delta,
+        response=response,
+        latency_ms=(time.perf_counter() - started_at) * 1000,
+    )
+    return response.choices[0].message.content
+
+
+def save_assistant_reply(turn, ai_response):
+    """Guarda la respuesta del asistente junto al mensaje del cliente del turno (una sola inserción)."""
+    log_turn_message(turn, "assistant", ai_response)
+    flush_turn_messages(turn)
+
+
+def set_order_in_progress(session, in_progress):
+    """Marca en el contexto de la sesión si el cliente tiene un pedido en curso."""
+    context = session.context or {}
+    if context.get("order_in_progress") == in_progress:
+        return
+    context["order_in_progress"] = in_progress
+    session.context = context
+    session.save(update_fields=["context"])
+
+
+def set_unresolved_items(session, names):
+    """Guarda (o borra, con None) en el contexto los ítems del pedido que no se encontraron en la carta."""
+    context = session.context or {}
+    if context.get("unresolved_items") == names or (names is None and "unresolved_items" not in context):
+        return
+    if names is None:
+        context.pop("unresolved_items", None)
+    else:
+        context["unresolved_items"] = names
+    session.context = context
+    session.save(update_fields=["context"])
+
+
+def unresolved_items_message(session):
+    """Mensaje de sistema con los ítems no encontrados, para que el modelo use los nombres exactos del menú."""
+    names = (session.context or {}).get("unresolved_items")
+    if not names:
+        return None
+    return {
+        "role": "system",
+        "content": (
+            f"⚠️ El último pedido no se registró: no existen en la carta {', '.join(names)}. "
+            "Usa en submit_order los nombres exactos del menú y, si el producto no existe, díselo al cliente."
+        ),
+    }
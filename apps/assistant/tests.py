@@ -1,3 +1,368 @@
-from django.test import TestCase
-
-# Create your tests here.
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+import openai
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.assistant.cache import response_cache
+from apps.assistant.gateway import OpenAIGateway
+from apps.assistant.models import AssistantSession, OpenAIRequestLog, OpenAIUsageRollup, PromptBlob, ResponseCacheRollup
+from apps.assistant.request_log import RequestLogWriter
+from apps.assistant.retrieval import MenuIndex, select_menu_for_turn
+from apps.assistant.services import generate_openai_response
+from apps.assistant.usage import update_usage_rollups
+from apps.assistant.utils import ProductNameMatcher, restore_placeholders
+from apps.chat.models import ChatSession, ConversationMessage
+from apps.menu.models import Category, Product
+from apps.orders.models import Order
+from apps.tenants.models import Tenant
+from apps.whatsapp.models import WhatsAppContact
+from apps.whatsapp.turn import TurnContext
+
+
+class ProductNameMatcherTests(SimpleTestCase):
+    def test_protect_and_restore_round_trip(self):
+        matcher = ProductNameMatcher(["Café", "Café con leche", "Tostada"])
+        text, protected = matcher.protect("Un café con leche y una TOSTADA")
+        self.assertEqual(text, "Un ##PRODUCT1## y una ##PRODUCT2##")
+        self.assertEqual(restore_placeholders(text, protected), "Un Café con leche y una Tostada")
+
+    def test_case_folding_that_lower_does_not_round_trip(self):
+        # IGNORECASE casa "iskender" con "İskender" y "salmon" con "ſalmon", pero `.lower()` no los iguala
+        matcher = ProductNameMatcher(["İskender", "ſalmon"])
+        text, protected = matcher.protect("Quiero iskender y salmon")
+        self.assertEqual(text, "Quiero ##PRODUCT0## y ##PRODUCT1##")
+        self.assertEqual(protected, {"##PRODUCT0##": "İskender", "##PRODUCT1##": "ſalmon"})
+
+
+def large_menu():
+    """Carta con tres categorías y 45 productos, más que el mínimo para recortarla."""
+    names = {
+        "Hamburguesas": ["Hamburguesa clásica", "Hamburguesa con queso", "Hamburguesa de pollo"],
+        "Cafés": ["Café con leche", "Café solo", "Capuchino"],
+        "Postres": ["Tarta de queso", "Brownie", "Helado de vainilla"],
+    }
+    return {"menu": [
+        {"category": category, "items": [
+            {"name": f"{name} {size}", "description": "", "extras": [], "allergens": []}
+            for name in products for size in ("pequeño", "mediano", "grande", "XL", "XXL")
+        ]}
+        for category, products in names.items()
+    ]}
+
+
+class MenuRetrievalTests(SimpleTestCase):
+    RETRIEVAL = {"ENABLED": True, "TOP_K": 5, "MIN_ITEMS": 40, "MIN_SCORE": 0.3}
+
+    def setUp(self):
+        self.tenant = Tenant(id=uuid.uuid4(), menu_version=1)
+
+    def test_search_ranks_the_matching_products_first_despite_typos(self):
+        index = MenuIndex(large_menu())
+        top = [index.items[doc_id][1]["name"] for doc_id, _ in index.search("amburguesa con keso grande", 3)]
+        self.assertEqual(top[0], "Hamburguesa con queso grande")
+
+    def test_large_menus_are_cut_to_the_relevant_items_with_every_category(self):
+        with override_settings(ASSISTANT_MENU_RETRIEVAL=self.RETRIEVAL):
+            menu, subset_used = select_menu_for_turn(self.tenant, large_menu(), "¿Tenéis capuchino?")
+
+        self.assertTrue(subset_used)
+        self.assertEqual(menu["categories"], ["Hamburguesas", "Cafés", "Postres"])
+        items = [item["name"] for category in menu["menu"] for item in category["items"]]
+        self.assertLessEqual(len(items), 5)
+        self.assertTrue(items and all(name.startswith("Capuchino") for name in items))
+
+    def test_full_menu_when_small_required_or_nothing_matches(self):
+        menu_data = large_menu()
+        with override_settings(ASSISTANT_MENU_RETRIEVAL=self.RETRIEVAL):
+            self.assertEqual(select_menu_for_turn(self.tenant, menu_data, "capuchino", full_menu_required=True), (menu_data, False))
+            self.assertEqual(select_menu_for_turn(self.tenant, menu_data, "wifi"), (menu_data, False))
+        with override_settings(ASSISTANT_MENU_RETRIEVAL={**self.RETRIEVAL, "MIN_ITEMS": 100}):
+            self.assertEqual(select_menu_for_turn(Tenant(id=uuid.uuid4(), menu_version=1), menu_data, "capuchino"), (menu_data, False))
+
+
+def fake_completion(content, tool_calls=None):
+    """Respuesta mínima con la forma de `ChatCompletion` que leen los servicios."""
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], model="gpt-4o-mini", usage=None)
+
+
+class SlowPrimaryClient:
+    """Cliente falso: el modelo principal agota su timeout y el de respaldo responde al momento."""
+
+    def __init__(self, primary_model):
+        self.primary_model = primary_model
+        self.timeouts = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, **payload):
+        timeout = self.timeouts[model] = self.timeout
+        if model == self.primary_model:
+            time.sleep(timeout)
+            raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        return fake_completion(f"Respuesta de {model}")
+
+
+class GatewayFallbackDeadlineTests(SimpleTestCase):
+    def test_slow_primary_leaves_budget_for_the_fallback(self):
+        gateway = OpenAIGateway({
+            **settings.OPENAI_GATEWAY,
+            "DEADLINES": {"chat": 0.5},
+            "MAX_RETRIES": 0,
+            "HEDGE_ENABLED": False,
+            "FALLBACK_MODEL": "gpt-4o",
+            "FALLBACK_BUDGET": 0.4,
+        })
+        client = SlowPrimaryClient("gpt-4o-mini")
+
+        def get_client(timeout):
+            client.timeout = timeout
+            return client
+
+        with mock.patch.object(gateway, "_get_client", side_effect=get_client):
+            response = gateway.chat(model="gpt-4o-mini", messages=[])
+
+        self.assertEqual(response.choices[0].message.content, "Respuesta de gpt-4o")
+        self.assertLessEqual(client.timeouts["gpt-4o-mini"], 0.3)
+        self.assertGreaterEqual(client.timeouts["gpt-4o"], 0.15)
+
+
+class ResponseCacheContextTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.tenant = Tenant.objects.create(
+            name="Bar Test", owner_name="-", phone_number="34600000000", phone_number_id="test-id",
+            whatsapp_access_token="-", nif="-", response_cache_enabled=True,
+        )
+        self.replies = iter(["Respuesta A", "Respuesta B", "Respuesta C"])
+        self.chat_payloads = []
+
+    def start_turn(self, phone, history=()):
+        contact = WhatsAppContact.objects.create(phone_number=phone, wa_id=phone, policy_accepted=True, first_buy=False)
+        chat_session = ChatSession.objects.create(tenant=self.tenant, phone_number=phone)
+        session = AssistantSession.objects.create(tenant=self.tenant, chat_session=chat_session, phone_number=phone)
+        ConversationMessage.objects.bulk_create([
+            ConversationMessage(tenant=self.tenant, chat_session=chat_session, assistant_session=session, role=role, content=content)
+            for role, content in history
+        ])
+        turn = TurnContext(tenant=self.tenant, contact=contact)
+        turn.__dict__["menu_data"] = {"menu": []}
+        turn.attach_session(session)
+        return turn
+
+    def ask(self, turn, text):
+        def chat(purpose, **payload):
+            if purpose == "detect":
+                return fake_completion("es")
+            self.chat_payloads.append(payload)
+            return fake_completion(next(self.replies))
+
+        with mock.patch("apps.assistant.services.gateway.chat", side_effect=chat), \
+                mock.patch("apps.assistant.services.request_log_writer"):
+            return generate_openai_response({"text": {"body": text}}, turn)
+
+    def test_sessions_with_different_histories_do_not_share_a_reply(self):
+        first = self.start_turn("34611111111", [("user", "¿Tenéis hamburguesas?"), ("assistant", "Sí, la clásica.")])
+        second = self.start_turn("34622222222", [("user", "¿Tenéis ensaladas?"), ("assistant", "Sí, la César.")])
+
+        self.assertEqual(self.ask(first, "¿Cuánto cuesta?"), "Respuesta A")
+        self.assertEqual(self.ask(second, "¿Cuánto cuesta?"), "Respuesta B")
+
+    def test_self_contained_questions_share_the_cached_reply_whatever_the_history(self):
+        first = self.start_turn("34611111111", [("user", "¿Tenéis hamburguesas?"), ("assistant", "Sí, la clásica.")])
+        second = self.start_turn("34622222222")
+
+        self.assertEqual(self.ask(first, "¿Qué bebidas tenéis?"), "Respuesta A")
+        self.assertEqual(self.ask(second, "¿qué BEBIDAS tenéis"), "Respuesta A")
+
+        # La respuesta cacheable se genera sin el historial de la sesión
+        self.assertEqual([message["role"] for message in self.chat_payloads[0]["messages"]], ["system", "system", "user"])
+        rollup = ResponseCacheRollup.objects.get(tenant=self.tenant)
+        self.assertEqual((rollup.hits, rollup.misses), (1, 1))
+
+
+class ScriptedFlowTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(
+            name="Bar Test", owner_name="-", phone_number="34600000000", phone_number_id="test-id",
+            whatsapp_access_token="-", nif="-", scripted_flow_enabled=True, table_count=10,
+        )
+        contact = WhatsAppContact.objects.create(phone_number="34611111111", wa_id="34611111111", policy_accepted=True, first_buy=False)
+        chat_session = ChatSession.objects.create(tenant=self.tenant, phone_number=contact.phone_number)
+        self.session = AssistantSession.objects.create(tenant=self.tenant, chat_session=chat_session, phone_number=contact.phone_number)
+        self.turn = TurnContext(tenant=self.tenant, contact=contact)
+        self.turn.__dict__["menu_data"] = {"menu": [
+            {"category": "Cafés", "items": [{"name": "Café con leche"}]},
+            {"category": "Postres", "items": [{"name": "Tarta de queso"}]},
+        ]}
+        self.turn.attach_session(self.session)
+        self.chat_payloads = []
+
+        patcher = mock.patch("apps.assistant.services.request_log_writer")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, text):
+        def chat(purpose, **payload):
+            if purpose == "detect":
+                return fake_completion("es")
+            self.chat_payloads.append(payload)
+            return fake_completion("Sí, tenemos tortilla.")
+
+        with mock.patch("apps.assistant.services.gateway.chat", side_effect=chat):
+            return generate_openai_response({"text": {"body": text}}, self.turn)
+
+    def test_greeting_and_table_capture_do_not_call_the_assistant(self):
+        self.assertIn("¿podrías indicarme en qué mesa", self.send("Hola"))
+        self.assertIn("La mesa 42 no existe", self.send("42"))
+        self.assertEqual(self.send("mesa 7"), "✅ ¡Perfecto, mesa 7! Estas son las categorías de nuestra carta: Cafés, Postres. ¿Cuál te gustaría explorar? 😊")
+
+        self.assertEqual(self.chat_payloads, [])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.context, {"flow_state": "ordering", "table_number": "7"})
+
+    def test_question_asked_before_the_table_goes_to_the_assistant_with_the_captured_table(self):
+        self.send("¿Tenéis tortilla?")
+        self.assertEqual(self.send("5"), "Sí, tenemos tortilla.")
+
+        (payload,) = self.chat_payloads
+        self.assertTrue(payload["messages"][-1]["content"].endswith("¿Tenéis tortilla?"))
+        self.assertTrue(any("mesa 5 (ya confirmada)" in message["content"] for message in payload["messages"]))
+
+
+class SubmitOrderToolTests(TestCase):
+    ITEM = {
+        "product_name": "Café con leche", "quantity": 2, "unit_price": 1.5, "extras": [],
+        "exclusions": [], "special_instructions": "", "discount": 0, "tax_amount": 0,
+    }
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(
+            name="Bar Test", owner_name="-", phone_number="34600000000", phone_number_id="test-id",
+            whatsapp_access_token="-", nif="-",
+        )
+        category = Category.objects.create(tenant=self.tenant, name="Cafés")
+        Product.objects.create(tenant=self.tenant, category=category, name="Café con leche", price=Decimal("1.50"))
+        contact = WhatsAppContact.objects.create(phone_number="34611111111", wa_id="34611111111", policy_accepted=True, first_buy=False)
+        chat_session = ChatSession.objects.create(tenant=self.tenant, phone_number=contact.phone_number)
+        session = AssistantSession.objects.create(tenant=self.tenant, chat_session=chat_session, phone_number=contact.phone_number)
+        self.turn = TurnContext(tenant=self.tenant, contact=contact)
+        self.turn.attach_session(session)
+        self.chat_calls = 0
+
+        # 🔹 Registro de OpenAI, Graph API y Redsys fuera del turno
+        for target in (
+            "apps.assistant.services.request_log_writer",
+            "apps.orders.services.send_whatsapp_message",
+            "apps.orders.services.generate_payment_link",
+        ):
+            patcher = mock.patch(target, return_value="https://pago.test/1")
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def submit(self, **arguments):
+        order = {
+            "table_number": "5", "notes": "", "delivery_type": "DINE_IN", "payment_method": "CARD",
+            "discount": 0, "tax_amount": 0, "scheduled_time": None, "order_items": [self.ITEM], **arguments,
+        }
+        tool_call = SimpleNamespace(function=SimpleNamespace(name="submit_order", arguments=json.dumps(order)))
+
+        def chat(purpose, **payload):
+            if purpose == "detect":
+                return fake_completion("es")
+            self.chat_calls += 1
+            return fake_completion(None, tool_calls=[tool_call])
+
+        with mock.patch("apps.assistant.services.gateway.chat", side_effect=chat):
+            return generate_openai_response({"text": {"body": "Eso es todo, confirmo"}}, self.turn)
+
+    def test_submit_order_call_saves_the_order_and_replies_with_its_summary(self):
+        reply = self.submit()
+
+        order = Order.objects.get(tenant=self.tenant)
+        self.assertEqual((order.table_number, order.total_price), ("5", Decimal("3.00")))
+        self.assertIn("2x Café con leche", reply)
+        self.assertNotIn("order_finalized", reply)
+        self.assertEqual(self.chat_calls, 1)
+
+    def test_malformed_order_is_rejected_without_a_second_model_call(self):
+        reply = self.submit(order_items=[{**self.ITEM, "quantity": 0}])
+
+        self.assertIn("No he podido registrar tu pedido", reply)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.chat_calls, 1)
+
+
+class RequestLogWriterTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(
+            name="Bar Test", owner_name="-", phone_number="34600000000", phone_number_id="test-id",
+            whatsapp_access_token="-", nif="-",
+        )
+        # Sin hilo de escritura: la cola se vacía a mano con `flush()`
+        patcher = mock.patch.object(RequestLogWriter, "_ensure_thread")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.writer = RequestLogWriter(batch_size=2)
+
+    def log(self, request_id):
+        self.writer.log(
+            tenant=self.tenant, request_id=request_id, endpoint="ChatCompletion", model="gpt-4o-mini",
+            prompt="Eres el camarero de Bar Test.", menu="📋 Menú: café, tostada", response=fake_completion("Hola"),
+        )
+
+    def inserts(self, queries, table):
+        # `INSERT INTO` o, con `ignore_conflicts`, `INSERT OR IGNORE INTO` / `INSERT ... ON CONFLICT`
+        return [query for query in queries if query["sql"].startswith("INSERT") and f'INTO "{table}"' in query["sql"]]
+
+    def test_flush_writes_in_batches_and_stores_repeated_blobs_once(self):
+        for number in range(5):
+            self.log(f"req-{number}")
+        with CaptureQueriesContext(connection) as queries:
+            self.writer.flush()
+
+        self.assertEqual(OpenAIRequestLog.objects.count(), 5)
+        self.assertEqual(len(self.inserts(queries, "assistant_openairequestlog")), 3)
+        self.assertEqual(PromptBlob.objects.count(), 2)
+        self.assertEqual(len(self.inserts(queries, "assistant_promptblob")), 1)
+
+        # 🔹 Un prompt ya guardado no se vuelve a enviar
+        self.log("req-5")
+        with CaptureQueriesContext(connection) as queries:
+            self.writer.flush()
+        self.assertEqual(self.inserts(queries, "assistant_promptblob"), [])
+        self.assertEqual(OpenAIRequestLog.objects.count(), 6)
+
+    def test_rejected_row_does_not_drop_the_rest_of_the_batch(self):
+        for request_id in ("req-1", "req-2", "req-1", "req-3"):
+            self.log(request_id)
+        self.writer.flush()
+
+        self.assertEqual(
+            sorted(OpenAIRequestLog.objects.values_list("request_id", flat=True)), ["req-1", "req-2", "req-3"]
+        )
+        self.assertEqual(OpenAIUsageRollup.objects.get(tenant=self.tenant).calls, 3)
+
+    def test_rollups_use_the_day_of_each_call(self):
+        today = timezone.localdate()
+        late_yesterday = timezone.make_aware(datetime.combine(today - timedelta(days=1), datetime.max.time()))
+        rows = [
+            OpenAIRequestLog(tenant=self.tenant, purpose="chat", model="gpt-4o-mini", status_code=200, timestamp=late_yesterday),
+            OpenAIRequestLog(tenant=self.tenant, purpose="chat", model="gpt-4o-mini", status_code=200),
+        ]
+        update_usage_rollups(rows)
+
+        self.assertEqual(
+            dict(OpenAIUsageRollup.objects.filter(tenant=self.tenant).values_list("date", "calls")),
+            {today - timedelta(days=1): 1, today: 1},
+        )
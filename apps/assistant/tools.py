@@ -0,0 +1,148 @@
+import json
+
+from apps.menu.dietary import DIETS
+from apps.orders.models import DELIVERY_TYPE_CHOICES
+
+DELIVERY_TYPES = [value for value, _ in DELIVERY_TYPE_CHOICES]
+
+# 📦 Esquema estricto de la herramienta `submit_order` (OpenAI function calling)
+SUBMIT_ORDER_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "submit_order",
+        "description": "Registra el pedido confirmado por el cliente. Llamar solo cuando el cliente haya confirmado que no quiere añadir nada más.",
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "table_number": {"type": "string", "description": "Número de mesa confirmado por el cliente."},
+                "notes": {"type": "string"},
+                "delivery_type": {"type": "string", "enum": DELIVERY_TYPES},
+                "payment_method": {"type": "string", "enum": ["CARD"]},
+                "discount": {"type": "number"},
+                "tax_amount": {"type": "number"},
+                "scheduled_time": {"type": ["string", "null"]},
+                "order_items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "product_name": {"type": "string", "description": "Nombre exacto del producto en el menú."},
+                            "quantity": {"type": "integer"},
+                            "unit_price": {"type": "number"},
+                            "extras": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "name": {"type": "string"},
+                                        "price": {"type": "number"},
+                                    },
+                                    "required": ["name", "price"],
+                                    "additionalProperties": False,
+                                },
+                            },
+                            "exclusions": {"type": "array", "items": {"type": "string"}},
+                            "special_instructions": {"type": "string"},
+                            "discount": {"type": "number"},
+                            "tax_amount": {"type": "number"},
+                        },
+                        "required": [
+                            "product_name", "quantity", "unit_price", "extras",
+                            "exclusions", "special_instructions", "discount", "tax_amount",
+                        ],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": [
+                "table_number", "notes", "delivery_type", "payment_method",
+                "discount", "tax_amount", "scheduled_time", "order_items",
+            ],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+# 🥗 Herramienta `filter_menu`: productos aptos según alérgenos y dietas, calculados localmente
+FILTER_MENU_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "filter_menu",
+        "description": (
+            "Devuelve los productos de la carta (con sus extras aptos) que no contienen los alérgenos indicados "
+            "y cumplen las dietas pedidas. Úsala ante cualquier pregunta sobre alérgenos, intolerancias o dietas."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "allergens": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Alérgenos que el cliente quiere evitar, en español (p. ej. Gluten, Lactosa).",
+                },
+                "diets": {"type": "array", "items": {"type": "string", "enum": list(DIETS)}},
+            },
+            "required": ["allergens", "diets"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+def parse_submit_order_arguments(arguments):
+    """
+    Valida los argumentos de `submit_order` y devuelve el `order_data` que espera `save_order_to_db`.
+    Lanza `ValueError` si el pedido está mal formado.
+    """
+    try:
+        order_data = json.loads(arguments)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Argumentos de submit_order no son JSON válido: {e}")
+
+    if not isinstance(order_data, dict):
+        raise ValueError("Los argumentos de submit_order deben ser un objeto.")
+
+    if not str(order_data.get("table_number") or "").strip():
+        raise ValueError("Falta el número de mesa.")
+
+    if order_data.get("delivery_type", "DINE_IN") not in DELIVERY_TYPES:
+        raise ValueError(f"Tipo de entrega no válido: {order_data.get('delivery_type')}")
+
+    order_items = order_data.get("order_items")
+    if not isinstance(order_items, list) or not order_items:
+        raise ValueError("El pedido no contiene artículos.")
+
+    for item in order_items:
+        if not isinstance(item, dict) or not str(item.get("product_name") or "").strip():
+            raise ValueError("Hay un artículo sin nombre de producto.")
+        quantity = item.get("quantity")
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise ValueError(f"Cantidad no válida para {item.get('product_name')}: {quantity}")
+        if not isinstance(item.get("unit_price", 0), (int, float)) or item.get("unit_price", 0) < 0:
+            raise ValueError(f"Precio no válido para {item.get('product_name')}.")
+        for extra in item.get("extras") or []:
+            if not isinstance(extra, dict) or not str(extra.get("name") or "").strip():
+                raise ValueError(f"Extra sin nombre en {item.get('product_name')}.")
+
+    return order_data
+
+
+def parse_filter_menu_arguments(arguments):
+    """Valida los argumentos de `filter_menu` y devuelve `(allergens, diets)`. Lanza `ValueError` si están mal formados."""
+    try:
+        data = json.loads(arguments)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Argumentos de filter_menu no son JSON válido: {e}")
+
+    if not isinstance(data, dict):
+        raise ValueError("Los argumentos de filter_menu deben ser un objeto.")
+
+    allergens, diets = data.get("allergens") or [], data.get("diets") or []
+    if not isinstance(allergens, list) or not all(isinstance(name, str) for name in allergens):
+        raise ValueError("`allergens` debe ser una lista de nombres.")
+    if not isinstance(diets, list) or any(diet not in DIETS for diet in diets):
+        raise ValueError(f"Dietas no válidas: {diets}")
+
+    return allergens, diets
@@ -0,0 +1,95 @@
+import math
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from apps.assistant.models import OpenAIUsageRollup
+
+# 🔹 Aproximación estándar para texto en español/inglés: ~4 caracteres por token
+CHARS_PER_TOKEN = 4
+
+_warned_prompt_sizes = {}
+_warned_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """Estimación barata del número de tokens de un texto (sin tokenizador)."""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def prompt_breakdown(tenant_prompt, menu, history_messages):
+    """Desglose estimado del prompt enviado al modelo: prompt del tenant, menú e historial."""
+    return {
+        "tenant_prompt_tokens": estimate_tokens(tenant_prompt),
+        "menu_tokens": estimate_tokens(menu),
+        "history_tokens": sum(estimate_tokens(message.get("content")) for message in history_messages),
+    }
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Coste en USD según `OPENAI_MODEL_PRICING` (precio por millón de tokens de entrada/salida)."""
+    if not model or prompt_tokens is None:
+        return None
+
+    # 🔹 Los modelos llegan con sufijo de versión (p. ej. `gpt-4o-mini-2024-07-18`): usar el prefijo más largo
+    pricing = settings.OPENAI_MODEL_PRICING
+    prefix = max((name for name in pricing if model.startswith(name)), key=len, default=None)
+    if prefix is None:
+        return None
+
+    input_price, output_price = pricing[prefix]
+    cost = (prompt_tokens * input_price + (completion_tokens or 0) * output_price) / 1_000_000
+    return Decimal(str(round(cost, 6)))
+
+
+def check_prompt_budget(tenant, breakdown):
+    """
+    Avisa cuando la parte estática del prompt (prompt del tenant + menú) supera
+    `ASSISTANT_PROMPT_BUDGET_TOKENS`. Solo se avisa una vez por tamaño para no inundar los logs.
+    """
+    budget = settings.ASSISTANT_PROMPT_BUDGET_TOKENS
+    static_tokens = breakdown["tenant_prompt_tokens"] + breakdown["menu_tokens"]
+    if not budget or static_tokens <= budget:
+        return False
+
+    with _warned_lock:
+        if _warned_prompt_sizes.get(tenant.id) == static_tokens:
+            return True
+        _warned_prompt_sizes[tenant.id] = static_tokens
+
+    print(
+        f"⚠️ El prompt estático de {tenant.name} ocupa ~{static_tokens} tokens "
+        f"(prompt {breakdown['tenant_prompt_tokens']} + menú {breakdown['menu_tokens']}), "
+        f"por encima del presupuesto de {budget}.",
+        flush=True,
+    )
+    return True
+
+
+def update_usage_rollups(rows):
+    """
+    Acumula un lote de `OpenAIRequestLog` en los agregados diarios por tenant, propósito y modelo.
+    Cada fila cuenta en el día (local) de su llamada, aunque el lote se escriba pasada la medianoche.
+    """
+    totals = defaultdict(lambda: defaultdict(int))
+
+    for row in rows:
+        group = totals[(row.tenant_id, timezone.localdate(row.timestamp), row.purpose, row.model or "")]
+        group["calls"] += 1
+        group["errors"] += 1 if row.status_code >= 400 else 0
+        for field in (
+            "prompt_tokens", "completion_tokens", "total_tokens",
+            "tenant_prompt_tokens", "menu_tokens", "history_tokens", "latency_ms",
+        ):
+            group[field] += getattr(row, field) or 0
+        group["cost_usd"] += row.cost_usd or Decimal("0")
+
+    for (tenant_id, date, purpose, model), values in totals.items():
+        rollup, _ = OpenAIUsageRollup.objects.get_or_create(tenant_id=tenant_id, date=date, purpose=purpose, model=model)
+        OpenAIUsageRollup.objects.filter(pk=rollup.pk).update(
+            **{field: F(field) + value for field, value in values.items()}
+        )
@@ -0,0 +1,80 @@
+import re
+
+from apps.menu.versioning import get_menu_version
+
+PLACEHOLDER_PATTERN = re.compile(r"##PRODUCT(\d+)##")
+
+
+class ProductNameMatcher:
+    """
+    Matcher precompilado con todos los nombres de productos de un menú.
+    Una única alternancia (ordenada de mayor a menor longitud) permite sustituir
+    todos los nombres por marcadores en una sola pasada sobre el texto.
+    """
+
+    def __init__(self, product_names):
+        self.names = []
+        self._index_by_name = {}
+
+        for name in product_names:
+            key = name.lower() if name else ""
+            if key and key not in self._index_by_name:
+                self._index_by_name[key] = len(self.names)
+                self.names.append(name)
+
+        # 🔹 Los nombres más largos primero para que "Café con leche" gane a "Café". Un grupo por nombre:
+        # el producto sale del grupo que ha coincidido (`lastindex`), no de volver a pasar el texto a
+        # minúsculas, que con IGNORECASE no siempre coincide ("İskender", "ſalmon")
+        ordered = sorted(range(len(self.names)), key=lambda idx: len(self.names[idx]), reverse=True)
+        self._index_by_group = dict(enumerate(ordered, start=1))
+        self.pattern = (
+            re.compile(
+                r"(?<!\w)(?:" + "|".join(f"({re.escape(self.names[idx])})" for idx in ordered) + r")(?!\w)",
+                re.IGNORECASE,
+            )
+            if ordered else None
+        )
+
+    def mentions(self, text):
+        """Indica si el texto menciona algún producto del menú."""
+        return bool(self.pattern and text and self.pattern.search(text))
+
+    def protect(self, text):
+        """Sustituye los nombres encontrados por `##PRODUCT{idx}##` y devuelve los usados."""
+        protected_names = {}
+        if not self.pattern or not text:
+            return text, protected_names
+
+        def _replace(match):
+            idx = self._index_by_group[match.lastindex]
+            placeholder = f"##PRODUCT{idx}##"
+            protected_names[placeholder] = self.names[idx]
+            return placeholder
+
+        return self.pattern.sub(_replace, text), protected_names
+
+
+_matchers = {}  # tenant_id → (menu_version, matcher)
+
+
+def get_product_name_matcher(tenant, menu_data):
+    """Devuelve el matcher del menú del tenant, construyéndolo solo si ha cambiado `menu_version`."""
+    menu_version = get_menu_version(tenant)
+    cached = _matchers.get(tenant.id)
+    if cached and cached[0] == menu_version:
+        return cached[1]
+
+    matcher = ProductNameMatcher(
+        product["name"]
+        for category in (menu_data or {}).get("menu", [])
+        for product in category.get("items", [])
+    )
+    _matchers[tenant.id] = (menu_version, matcher)
+    return matcher
+
+
+def restore_placeholders(text, protected_names):
+    """Restaura en una sola pasada los nombres protegidos con `ProductNameMatcher.protect`."""
+    if not protected_names:
+        return text
+    return PLACEHOLDER_PATTERN.sub(lambda m: protected_names.get(m.group(0), m.group(0)), text)
@@ -1,7 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.shortcuts import render
+from django.utils import timezone
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Count, Avg, F, ExpressionWrapper, fields
-from apps.assistant.models import AssistantSession
+from django.db.models import Count, Avg, F, ExpressionWrapper, Sum, fields
+from apps.assistant.cache import response_cache_report
+from apps.assistant.gateway import gateway
+from apps.assistant.router import route_stats
+from apps.assistant.models import AssistantSession, OpenAIUsageRollup
+from apps.chat.models import SessionReaperRun
+from apps.chat.reaper import storage_report
 
 @staff_member_required
 def assistant_dashboard(request):
@@ -24,11 +33,36 @@ def assistant_dashboard(request):
     # 🔹 Distribución de sesiones por Tenant
     sessions_by_tenant = AssistantSession.objects.values("tenant__name").annotate(count=Count("id"))
 
+    # 🔹 Caché de respuestas informativas de los últimos 30 días por Tenant (tasa de acierto y latencia ahorrada)
+    response_cache_by_tenant = response_cache_report()
+
+    # 🔹 Consumo de OpenAI de los últimos 30 días por Tenant y propósito
+    usage_by_tenant = (
+        OpenAIUsageRollup.objects.filter(date__gte=timezone.localdate() - timedelta(days=30))
+        .values("tenant__name", "purpose")
+        .annotate(
+            calls=Sum("calls"),
+            total_tokens=Sum("total_tokens"),
+            tenant_prompt_tokens=Sum("tenant_prompt_tokens"),
+            menu_tokens=Sum("menu_tokens"),
+            history_tokens=Sum("history_tokens"),
+            cost_usd=Sum("cost_usd"),
+        )
+        .order_by("tenant__name", "purpose")
+    )
+
     context = {
         "total_sessions": total_sessions,
         "active_sessions": active_sessions,
         "avg_duration": avg_duration_minutes,
         "sessions_by_tenant": sessions_by_tenant,
+        "response_cache_by_tenant": response_cache_by_tenant,
+        "openai_metrics": gateway.metrics(),
+        "usage_by_tenant": usage_by_tenant,
+        "route_stats": route_stats.snapshot(),
+        "prompt_budget_tokens": settings.ASSISTANT_PROMPT_BUDGET_TOKENS,
+        "session_reaper": SessionReaperRun.objects.first(),
+        "transcript_storage": storage_report(),
     }
 
     return render(request, "admin/assistant_dashboard.html", context)
@@ -5,7 +5,21 @@ from django.urls import path
 from django.utils.html import format_html
 from django.http import HttpResponse
 
-from apps.chat.models import ChatSession, ChatMessage, ConversationHistory
+from apps.chat.models import ChatSession, ConversationHistory, ConversationMessage
+
+
+# 📌 **Inline del Registro de Conversación (solo lectura)**
+class ConversationMessageInline(admin.TabularInline):
+    model = ConversationMessage
+    fk_name = "chat_session"
+    fields = ("timestamp", "role", "content")
+    readonly_fields = fields
+    ordering = ("timestamp",)
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 # 📌 **Admin de Sesiones de Chat**
@@ -18,7 +32,8 @@ class ChatSessionAdmin(admin.ModelAdmin):
     search_fields = ("phone_number", "id")
     ordering = ("-last_interaction",)
     readonly_fields = ("start_time", "last_interaction", "real_session_duration")
-    actions = ["end_sessions"]
+    inlines = [ConversationMessageInline]
+    actions = ["end_sessions", "export_conversations_json"]
 
     def id_short(self, obj):
         """Muestra un ID corto de la sesión para mayor legibilidad."""
@@ -32,6 +47,38 @@ class ChatSessionAdmin(admin.ModelAdmin):
         self.message_user(request, f"✅ {count} sesión(es) finalizada(s).", messages.SUCCESS)
 
     end_sessions.short_description = "🚫 Finalizar Sesiones"
+
+    def export_conversations_json(self, request, queryset):
+        """Exporta la conversación de las sesiones seleccionadas desde el registro (una consulta para todos los mensajes)."""
+        sessions = {
+            session.id: {
+                "session_id": str(session.id),
+                "tenant": session.tenant.name,
+                "phone_number": session.phone_number,
+                "conversation": [],
+            }
+            for session in queryset.select_related("tenant")
+        }
+        entries = (
+            ConversationMessage.objects.filter(chat_session_id__in=sessions)
+            .order_by("timestamp")
+            .values_list("chat_session_id", "role", "content", "timestamp")
+        )
+        for session_id, role, content, timestamp in entries:
+            sessions[session_id]["conversation"].append(
+                {"role": role, "content": content, "timestamp": timestamp.isoformat()}
+            )
+
+        # 🗄️ Las sesiones ya archivadas (mensajes purgados) se leen de su transcripción comprimida
+        for history in ConversationHistory.objects.filter(session_id__in=sessions).only("session_id", "transcript"):
+            if not sessions[history.session_id]["conversation"]:
+                sessions[history.session_id]["conversation"] = history.full_conversation
+
+        response = HttpResponse(json.dumps(list(sessions.values()), indent=4), content_type="application/json")
+        response["Content-Disposition"] = 'attachment; filename="chat_conversations.json"'
+        return response
+
+    export_conversations_json.short_description = "📥 Exportar Conversación en JSON"
     
     def real_session_duration(self, obj):
         """Muestra la duración de la sesión en formato legible."""
@@ -41,17 +88,23 @@ class ChatSessionAdmin(admin.ModelAdmin):
     real_session_duration.short_description = "Session Duration"
 
 
-# 📌 **Admin de Mensajes de Chat**
-@admin.register(ChatMessage)
-class ChatMessageAdmin(admin.ModelAdmin):
-    list_display = ("session", "tenant", "sender", "short_message", "timestamp")
-    list_filter = ("tenant", "sender", "timestamp")
-    search_fields = ("message_content", "session__id")
+# 📌 **Admin del Registro de Conversación**
+@admin.register(ConversationMessage)
+class ConversationMessageAdmin(admin.ModelAdmin):
+    list_display = ("chat_session", "tenant", "role", "short_message", "timestamp")
+    list_filter = ("tenant", "role", "timestamp")
+    search_fields = ("content", "chat_session__id", "assistant_session__session_id")
     ordering = ("-timestamp",)
+    list_select_related = ("tenant", "chat_session")
+    raw_id_fields = ("chat_session", "assistant_session")
+
+    def has_change_permission(self, request, obj=None):
+        """Registro de solo inserción: los mensajes no se editan."""
+        return False
 
     def short_message(self, obj):
         """Muestra un resumen del mensaje en la lista."""
-        return obj.message_content[:50] + "..." if len(obj.message_content) > 50 else obj.message_content
+        return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
 
     short_message.short_description = "Message Preview"
 
@@ -59,11 +112,31 @@ class ChatMessageAdmin(admin.ModelAdmin):
 # 📌 **Admin de Historial de Conversaciones**
 @admin.register(ConversationHistory)
 class ConversationHistoryAdmin(admin.ModelAdmin):
-    list_display = ("session", "tenant", "created_at", "export_actions")
+    list_display = ("session", "tenant", "message_count", "raw_size", "compressed_size", "created_at", "export_actions")
     list_filter = ("tenant", "created_at")
     ordering = ("-created_at",)
+    list_select_related = ("tenant", "session")
+    exclude = ("transcript",)
+    readonly_fields = ("conversation_preview",)
     actions = ["export_chat_history_json"]
 
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path("<uuid:history_id>/export/", self.admin_site.admin_view(self.export_history_view), name="chat_conversationhistory_export"),
+        ]
+        return custom_urls + urls
+
+    def export_history_view(self, request, history_id):
+        """Descarga en JSON la transcripción (descomprimida) de un historial."""
+        return self.export_chat_history_json(request, ConversationHistory.objects.filter(id=history_id))
+
+    def conversation_preview(self, obj):
+        """Transcripción descomprimida, legible en el formulario."""
+        return format_html("<pre>{}</pre>", json.dumps(obj.full_conversation, indent=2, ensure_ascii=False))
+
+    conversation_preview.short_description = "Conversation"
+
     def export_actions(self, obj):
         """Botón para exportar el historial de chat como JSON."""
         return format_html(
@@ -76,7 +149,7 @@ class ConversationHistoryAdmin(admin.ModelAdmin):
     def export_chat_history_json(self, request, queryset):
         """Exporta el historial de chat seleccionado en JSON."""
         chat_data = []
-        for history in queryset:
+        for history in queryset.select_related("session", "tenant"):
             chat_data.append({
                 "session_id": str(history.session.id),
                 "tenant": history.tenant.name,
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.chat'
+
+    def ready(self):
+        from .signals import connect_session_store_signals
+        connect_session_store_signals()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.chat.models import ConversationMessage
+from apps.chat.reaper import storage_report
+
+
+class Command(BaseCommand):
+    help = "Muestra por tenant cuánto ocupan las transcripciones archivadas y cuántos bytes ahorra la compresión."
+
+    def handle(self, *args, **options):
+        report = storage_report()
+        for row in report:
+            self.stdout.write(
+                f"🏢 {row['tenant__name']}: {row['sessions']} sesiones, {row['messages']} mensajes, "
+                f"{row['raw_bytes']} B en JSON → {row['compressed_bytes']} B comprimidos "
+                f"({row['saved_bytes']} B ahorrados, x{row['ratio']})"
+            )
+
+        saved = sum(row["saved_bytes"] for row in report)
+        self.stdout.write(f"📦 Mensajes aún sin archivar: {ConversationMessage.objects.count()}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Total ahorrado: {saved} B en {len(report)} tenants."))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.chat.reaper import reap_expired_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Cierra en lote las sesiones de chat y de IA caducadas, archiva sus transcripciones comprimidas en "
+        "ConversationHistory, purga los mensajes archivados y guarda las métricas de la pasada para el dashboard."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Sesiones cerradas por transacción")
+        parser.add_argument("--loop", action="store_true", help="Repetir indefinidamente (proceso en segundo plano)")
+        parser.add_argument("--interval", type=float, default=60, help="Segundos entre pasadas con --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            metrics = reap_expired_sessions(batch_size=options["batch_size"])
+            self.stdout.write(
+                f"🧹 {metrics['closed_chat_sessions']} chats y {metrics['closed_assistant_sessions']} sesiones de IA "
+                f"cerradas, {metrics['archived_transcripts']} transcripciones archivadas, {metrics['pruned_messages']} "
+                f"mensajes purgados en {metrics['duration_ms']} ms "
+                f"(retraso medio {metrics['avg_close_lag_s']} s, máx. {metrics['max_close_lag_s']} s; "
+                f"activas: {metrics['active_chat_sessions']} chats, {metrics['active_assistant_sessions']} IA)"
+            )
+            if not options["loop"]:
+                break
+            connections.close_all()
+            time.sleep(options["interval"])
@@ -0,0 +1,100 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:54
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+CHAT_SENDER_ROLES = {"client": "user", "bot": "assistant", "system": "system"}
+
+
+def copy_messages_to_log(apps, schema_editor):
+    """
+    Copia `ChatMessage` y `AIMessage` al registro único. Ambos guardaban los mismos mensajes, así que
+    `ChatMessage` es la fuente de las sesiones de chat (enlazando su sesión de IA) y de `AIMessage`
+    solo se copian las sesiones de IA sin mensajes de chat.
+    """
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+    AIMessage = apps.get_model("assistant", "AIMessage")
+    AssistantSession = apps.get_model("assistant", "AssistantSession")
+    ConversationMessage = apps.get_model("chat", "ConversationMessage")
+
+    assistant_by_chat = {}
+    for chat_session_id, assistant_session_id in (
+        AssistantSession.objects.filter(chat_session__isnull=False)
+        .order_by("-start_time")
+        .values_list("chat_session_id", "id")
+    ):
+        assistant_by_chat[chat_session_id] = assistant_session_id  # La más antigua de cada chat prevalece
+
+    batch, copied_chats = [], set()
+
+    def flush():
+        ConversationMessage.objects.bulk_create(batch)
+        batch.clear()
+
+    for tenant_id, chat_session_id, sender, content, timestamp in (
+        ChatMessage.objects.values_list("tenant_id", "session_id", "sender", "message_content", "timestamp").iterator()
+    ):
+        copied_chats.add(chat_session_id)
+        batch.append(ConversationMessage(
+            tenant_id=tenant_id,
+            chat_session_id=chat_session_id,
+            assistant_session_id=assistant_by_chat.get(chat_session_id),
+            role=CHAT_SENDER_ROLES.get(sender, "user"),
+            content=content,
+            timestamp=timestamp,
+        ))
+        if len(batch) >= 1000:
+            flush()
+
+    for tenant_id, assistant_session_id, chat_session_id, role, content, timestamp in (
+        AIMessage.objects.values_list("tenant_id", "session_id", "session__chat_session_id", "role", "content", "timestamp")
+        .iterator()
+    ):
+        if chat_session_id in copied_chats:
+            continue
+        batch.append(ConversationMessage(
+            tenant_id=tenant_id,
+            chat_session_id=chat_session_id,
+            assistant_session_id=assistant_session_id,
+            role=role,
+            content=content,
+            timestamp=timestamp,
+        ))
+        if len(batch) >= 1000:
+            flush()
+    flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0004_openairequestlog_route'),
+        ('chat', '0001_initial'),
+        ('tenants', '0009_tenant_menu_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationMessage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('role', models.CharField(choices=[('user', 'User'), ('assistant', 'Assistant'), ('system', 'System')], help_text='Indicates who sent the message.', max_length=20, verbose_name='Role')),
+                ('content', models.TextField(help_text='Text content of the message.', verbose_name='Message Content')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, help_text='When the message was sent.', verbose_name='Timestamp')),
+                ('assistant_session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='assistant.assistantsession', verbose_name='Assistant Session')),
+                ('chat_session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chat.chatsession', verbose_name='Chat Session')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tenants.tenant', verbose_name='Tenant')),
+            ],
+            options={
+                'verbose_name': 'Conversation Message',
+                'verbose_name_plural': 'Conversation Messages',
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.RunPython(copy_messages_to_log, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='ChatMessage',
+        ),
+    ]
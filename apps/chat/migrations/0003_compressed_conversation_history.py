@@ -0,0 +1,77 @@
+import json
+import zlib
+from datetime import datetime, timezone
+
+import msgpack
+from django.db import migrations, models
+
+
+def pack_transcript(messages):
+    """
+    Copia congelada del empaquetado de `apps.chat.transcripts` en el formato 1 (msgpack + zlib de
+    `[1, [(role, content, timestamp Unix)]]`): la migración no debe cambiar si el módulo evoluciona.
+    """
+    rows = [(role, content, timestamp.timestamp()) for role, content, timestamp in messages]
+    blob = zlib.compress(msgpack.packb([1, rows], use_bin_type=True), 9)
+    raw_size = len(json.dumps([
+        {"role": role, "content": content, "timestamp": datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()}
+        for role, content, timestamp in rows
+    ], ensure_ascii=False).encode())
+    return blob, raw_size
+
+
+def compress_existing_histories(apps, schema_editor):
+    """Comprime las transcripciones ya archivadas en JSON (`full_conversation`)."""
+    ConversationHistory = apps.get_model("chat", "ConversationHistory")
+    histories = list(ConversationHistory.objects.only("id", "full_conversation"))
+    for history in histories:
+        messages = [
+            (
+                entry.get("role") or entry.get("sender") or "user",
+                entry.get("content") or "",
+                datetime.fromisoformat(entry["timestamp"]),
+            )
+            for entry in history.full_conversation or []
+        ]
+        history.transcript, history.raw_size = pack_transcript(messages)
+        history.message_count = len(messages)
+        history.compressed_size = len(history.transcript)
+    ConversationHistory.objects.bulk_update(
+        histories, ["transcript", "raw_size", "message_count", "compressed_size"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_conversation_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationhistory',
+            name='transcript',
+            field=models.BinaryField(default=b'', help_text='Full chat history, msgpack + zlib compressed.', verbose_name='Transcript'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='conversationhistory',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Messages'),
+        ),
+        migrations.AddField(
+            model_name='conversationhistory',
+            name='raw_size',
+            field=models.PositiveIntegerField(default=0, help_text='Size of the transcript as JSON.', verbose_name='Raw Size (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='conversationhistory',
+            name='compressed_size',
+            field=models.PositiveIntegerField(default=0, verbose_name='Compressed Size (bytes)'),
+        ),
+        migrations.RunPython(compress_existing_histories, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='conversationhistory',
+            name='full_conversation',
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0005_delete_aimessage'),
+        ('chat', '0003_compressed_conversation_history'),
+        ('tenants', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['tenant', 'phone_number'], name='chat_session_active_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['last_interaction'], name='chat_session_active_idle_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationmessage',
+            index=models.Index(fields=['assistant_session', 'timestamp'], name='conv_msg_assistant_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationmessage',
+            index=models.Index(fields=['chat_session', 'timestamp'], name='conv_msg_chat_ts_idx'),
+        ),
+        # Los índices compuestos empiezan por la FK y sustituyen a los suyos: se crean antes de quitarlos
+        migrations.AlterField(
+            model_name='conversationmessage',
+            name='assistant_session',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='assistant.assistantsession', verbose_name='Assistant Session'),
+        ),
+        migrations.AlterField(
+            model_name='conversationmessage',
+            name='chat_session',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chat.chatsession', verbose_name='Chat Session'),
+        ),
+    ]
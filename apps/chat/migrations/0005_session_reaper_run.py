@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-19 13:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionReaperRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ran_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Ran At')),
+                ('duration_ms', models.PositiveIntegerField(default=0, verbose_name='Duration (ms)')),
+                ('closed_chat_sessions', models.PositiveIntegerField(default=0, verbose_name='Closed Chat Sessions')),
+                ('closed_assistant_sessions', models.PositiveIntegerField(default=0, verbose_name='Closed Assistant Sessions')),
+                ('archived_transcripts', models.PositiveIntegerField(default=0, verbose_name='Archived Transcripts')),
+                ('pruned_messages', models.PositiveIntegerField(default=0, verbose_name='Pruned Messages')),
+                ('active_chat_sessions', models.PositiveIntegerField(default=0, verbose_name='Active Chat Sessions')),
+                ('active_assistant_sessions', models.PositiveIntegerField(default=0, verbose_name='Active Assistant Sessions')),
+                ('avg_close_lag_s', models.FloatField(blank=True, null=True, verbose_name='Average Close Lag (s)')),
+                ('max_close_lag_s', models.FloatField(blank=True, null=True, verbose_name='Max Close Lag (s)')),
+            ],
+            options={
+                'verbose_name': 'Session Reaper Run',
+                'verbose_name_plural': 'Session Reaper Runs',
+                'ordering': ['-ran_at'],
+            },
+        ),
+    ]
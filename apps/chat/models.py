@@ -3,7 +3,9 @@ from datetime import timedelta
 
 from django.utils.timezone import now
 from django.db import models
+from django.db.models import Q
 
+from apps.chat.transcripts import unpack_transcript
 from apps.tenants.models import Tenant
 
 
@@ -36,6 +38,11 @@ class ChatSession(models.Model):
         verbose_name = "Chat Session"
         verbose_name_plural = "Chat Sessions"
         ordering = ["-start_time"]
+        indexes = [
+            # 🔹 Solo las sesiones activas: resolver la sesión de un mensaje y el barrido del reaper
+            models.Index(fields=["tenant", "phone_number"], condition=Q(is_active=True), name="chat_session_active_phone_idx"),
+            models.Index(fields=["last_interaction"], condition=Q(is_active=True), name="chat_session_active_idle_idx"),
+        ]
 
     def __str__(self):
         return f"Chat {str(self.id)[:8]} ({self.phone_number})"
@@ -55,39 +62,53 @@ class ChatSession(models.Model):
     real_session_duration.fget.short_description = "Real Session Duration"
 
 
-# 📌 **Modelo de Mensajes de Chat**
-class ChatMessage(models.Model):
+# 📌 **Modelo del Registro de Conversación**
+class ConversationMessage(models.Model):
+    """
+    Registro único y de solo inserción de la conversación: cada mensaje del cliente y cada respuesta
+    del asistente es una fila, enlazada a la sesión de chat y a la de IA. Lo leen el historial del
+    asistente, el admin y el archivado de transcripciones.
+    """
+    ROLE_CHOICES = [
+        ("user", "User"),
+        ("assistant", "Assistant"),
+        ("system", "System"),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     tenant = models.ForeignKey(
         Tenant, on_delete=models.CASCADE, verbose_name="Tenant"
-    )  
-    session = models.ForeignKey(
-        ChatSession, on_delete=models.CASCADE, related_name="messages", verbose_name="Chat Session"
     )
-    sender = models.CharField(
-        max_length=50,
-        choices=[
-            ("client", "Client"),
-            ("bot", "Bot"),
-            ("system", "System"),
-        ],
-        verbose_name="Sender",
-        help_text="Indicates who sent the message."
+    chat_session = models.ForeignKey(
+        ChatSession, on_delete=models.CASCADE, null=True, blank=True, related_name="messages", db_index=False,
+        verbose_name="Chat Session"
+    )  # Indexada por `conv_msg_chat_ts_idx`
+    assistant_session = models.ForeignKey(
+        "assistant.AssistantSession", on_delete=models.CASCADE, null=True, blank=True, related_name="messages",
+        db_index=False, verbose_name="Assistant Session"
+    )  # Indexada por `conv_msg_assistant_ts_idx`
+    role = models.CharField(
+        max_length=20, choices=ROLE_CHOICES, verbose_name="Role", help_text="Indicates who sent the message."
     )
-    message_content = models.TextField(
+    content = models.TextField(
         verbose_name="Message Content", help_text="Text content of the message."
     )
     timestamp = models.DateTimeField(
-        auto_now_add=True, verbose_name="Timestamp", help_text="When the message was sent."
+        default=now, verbose_name="Timestamp", help_text="When the message was sent."
     )
 
     class Meta:
-        verbose_name = "Chat Message"
-        verbose_name_plural = "Chat Messages"
+        verbose_name = "Conversation Message"
+        verbose_name_plural = "Conversation Messages"
         ordering = ["-timestamp"]
+        indexes = [
+            # 🔹 Historial del asistente (últimos N mensajes), transcripción y exportación de una sesión
+            models.Index(fields=["assistant_session", "timestamp"], name="conv_msg_assistant_ts_idx"),
+            models.Index(fields=["chat_session", "timestamp"], name="conv_msg_chat_ts_idx"),
+        ]
 
     def __str__(self):
-        return f"Message from {self.sender} at {self.timestamp}"
+        return f"{self.role.capitalize()} message at {self.timestamp:%Y-%m-%d %H:%M:%S}"
 
 
 # 📌 **Modelo de Historial de Conversaciones**
@@ -99,9 +120,14 @@ class ConversationHistory(models.Model):
     session = models.OneToOneField(
         ChatSession, on_delete=models.CASCADE, related_name="history", verbose_name="Chat Session"
     )
-    full_conversation = models.JSONField(
-        verbose_name="Full Conversation", help_text="Stores the full chat history in JSON format."
+    transcript = models.BinaryField(
+        verbose_name="Transcript", help_text="Full chat history, msgpack + zlib compressed."
+    )
+    message_count = models.PositiveIntegerField(default=0, verbose_name="Messages")
+    raw_size = models.PositiveIntegerField(
+        default=0, verbose_name="Raw Size (bytes)", help_text="Size of the transcript as JSON."
     )
+    compressed_size = models.PositiveIntegerField(default=0, verbose_name="Compressed Size (bytes)")
     created_at = models.DateTimeField(
         auto_now_add=True, verbose_name="Created At", help_text="When the conversation history was stored."
     )
@@ -112,4 +138,31 @@ class ConversationHistory(models.Model):
         ordering = ["-created_at"]
 
     def __str__(self):
-        return f"History for Session {self.session.id}"
+        return f"History for Session {self.session_id}"
+
+    @property
+    def full_conversation(self):
+        """Transcripción descomprimida: lista de `{"role", "content", "timestamp"}`."""
+        return unpack_transcript(self.transcript)
+
+
+# 🧹 **Métricas de cada pasada del cierre de sesiones (`reap_sessions`), leídas por el dashboard**
+class SessionReaperRun(models.Model):
+    ran_at = models.DateTimeField(default=now, db_index=True, verbose_name="Ran At")
+    duration_ms = models.PositiveIntegerField(default=0, verbose_name="Duration (ms)")
+    closed_chat_sessions = models.PositiveIntegerField(default=0, verbose_name="Closed Chat Sessions")
+    closed_assistant_sessions = models.PositiveIntegerField(default=0, verbose_name="Closed Assistant Sessions")
+    archived_transcripts = models.PositiveIntegerField(default=0, verbose_name="Archived Transcripts")
+    pruned_messages = models.PositiveIntegerField(default=0, verbose_name="Pruned Messages")
+    active_chat_sessions = models.PositiveIntegerField(default=0, verbose_name="Active Chat Sessions")
+    active_assistant_sessions = models.PositiveIntegerField(default=0, verbose_name="Active Assistant Sessions")
+    avg_close_lag_s = models.FloatField(blank=True, null=True, verbose_name="Average Close Lag (s)")
+    max_close_lag_s = models.FloatField(blank=True, null=True, verbose_name="Max Close Lag (s)")
+
+    class Meta:
+        verbose_name = "Session Reaper Run"
+        verbose_name_plural = "Session Reaper Runs"
+        ordering = ["-ran_at"]
+
+    def __str__(self):
+        return f"Reaper run at {self.ran_at:%Y-%m-%d %H:%M:%S}"
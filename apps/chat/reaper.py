@@ -0,0 +1,158 @@
+import time
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils.timezone import now
+
+from apps.assistant.models import AssistantSession
+from apps.chat.models import ChatSession, ConversationHistory, ConversationMessage, SessionReaperRun
+from apps.chat.services import SESSION_TIMEOUT
+from apps.chat.session_store import session_store
+from apps.chat.transcripts import pack_transcript
+
+REAPER_RUN_RETENTION = timedelta(days=7)  # Pasadas guardadas para el dashboard
+
+
+def archive_transcripts(session_ids):
+    """
+    Guarda en `ConversationHistory` la transcripción comprimida (msgpack + zlib) de las sesiones
+    cerradas de `session_ids` que aún no la tengan (una consulta para los mensajes y un `bulk_create`).
+    Devuelve cuántas ha archivado.
+    """
+    messages = (
+        ConversationMessage.objects.filter(
+            chat_session_id__in=session_ids, chat_session__is_active=False, chat_session__history__isnull=True
+        )
+        .order_by("chat_session_id", "timestamp")
+        .values_list("chat_session_id", "tenant_id", "role", "content", "timestamp")
+    )
+    histories = []
+    for session_id, rows in groupby(messages, key=lambda row: row[0]):
+        rows = list(rows)
+        transcript, raw_size = pack_transcript((role, content, timestamp) for _, _, role, content, timestamp in rows)
+        histories.append(ConversationHistory(
+            tenant_id=rows[0][1],
+            session_id=session_id,
+            transcript=transcript,
+            message_count=len(rows),
+            raw_size=raw_size,
+            compressed_size=len(transcript),
+        ))
+    ConversationHistory.objects.bulk_create(histories, ignore_conflicts=True)
+    return len(histories)
+
+
+def prune_archived_messages(batch_size=1000):
+    """
+    Borra del registro de conversación, en lotes de `batch_size` (transacciones cortas), los mensajes
+    ya archivados en `ConversationHistory`. Un mensaje posterior al archivado no se toca. Devuelve
+    cuántos ha borrado.
+    """
+    deleted = 0
+    while True:
+        ids = list(
+            ConversationMessage.objects.filter(
+                chat_session__is_active=False, timestamp__lte=F("chat_session__history__created_at")
+            ).values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += ConversationMessage.objects.filter(id__in=ids).delete()[0]
+
+
+def storage_report():
+    """Transcripciones archivadas por tenant: sesiones, mensajes y bytes en JSON, comprimidos y ahorrados."""
+    report = (
+        ConversationHistory.objects.values("tenant__name")
+        .annotate(
+            sessions=Count("id"),
+            messages=Sum("message_count"),
+            raw_bytes=Sum("raw_size"),
+            compressed_bytes=Sum("compressed_size"),
+        )
+        .order_by("tenant__name")
+    )
+    return [
+        {
+            **row,
+            "saved_bytes": row["raw_bytes"] - row["compressed_bytes"],
+            "ratio": round(row["raw_bytes"] / row["compressed_bytes"], 1) if row["compressed_bytes"] else None,
+        }
+        for row in report
+    ]
+
+
+def reap_expired_sessions(batch_size=500):
+    """
+    Cierra por lotes las sesiones de chat inactivas más allá de `SESSION_TIMEOUT` (y sus sesiones de IA)
+    con UPDATE por conjuntos, archiva sus transcripciones y las saca del `session_store`. También cierra
+    las sesiones de IA que siguen activas con el chat ya cerrado, archiva las sesiones cerradas por otras
+    vías (pago, nuevo mensaje) y purga los mensajes ya archivados. Devuelve las métricas de la pasada,
+    que quedan también en `SessionReaperRun` (el proceso del reaper no comparte memoria con la web).
+    """
+    started_at = time.perf_counter()
+    closed_at = now()
+    # 🔹 Margen para las interacciones que el store aún no ha escrito en la BD
+    cutoff = closed_at - SESSION_TIMEOUT - timedelta(seconds=settings.CHAT_SESSION_STORE["FLUSH_INTERVAL"])
+    metrics = {"closed_chat_sessions": 0, "closed_assistant_sessions": 0, "archived_transcripts": 0, "pruned_messages": 0}
+    lags = []
+
+    while True:
+        candidates = list(
+            ChatSession.objects.filter(is_active=True, last_interaction__lt=cutoff)
+            .order_by("last_interaction")
+            .values_list("id", "tenant_id", "phone_number", "last_interaction")[:batch_size]
+        )
+        if not candidates:
+            break
+
+        session_ids = [session_id for session_id, _, _, _ in candidates]
+        with transaction.atomic():
+            # El filtro se repite en el UPDATE: si el cliente ha escrito entretanto, su sesión no se cierra
+            metrics["closed_chat_sessions"] += ChatSession.objects.filter(
+                id__in=session_ids, is_active=True, last_interaction__lt=cutoff
+            ).update(is_active=False, end_time=closed_at)
+            metrics["closed_assistant_sessions"] += AssistantSession.objects.filter(
+                chat_session_id__in=session_ids, is_active=True, chat_session__is_active=False
+            ).update(is_active=False, end_time=closed_at)
+            metrics["archived_transcripts"] += archive_transcripts(session_ids)
+
+        # Los UPDATE no lanzan señales: sacar a mano las sesiones del store (la web, además, comprueba
+        # en la BD que la sesión guardada sigue activa antes de reanudarla)
+        cache.delete_many([session_store.key(tenant_id, phone) for _, tenant_id, phone, _ in candidates])
+        lags += [(closed_at - last_interaction - SESSION_TIMEOUT).total_seconds() for _, _, _, last_interaction in candidates]
+
+    # 🧹 Sesiones de IA huérfanas (chat cerrado por el pago o por un mensaje posterior)
+    metrics["closed_assistant_sessions"] += AssistantSession.objects.filter(
+        is_active=True, chat_session__is_active=False
+    ).update(is_active=False, end_time=closed_at)
+
+    # 🗄️ Transcripciones de sesiones cerradas por otras vías que aún no están archivadas
+    while True:
+        session_ids = list(
+            ChatSession.objects.filter(is_active=False, history__isnull=True, messages__isnull=False)
+            .distinct()
+            .values_list("id", flat=True)[:batch_size]
+        )
+        archived = archive_transcripts(session_ids) if session_ids else 0
+        metrics["archived_transcripts"] += archived
+        if not archived:
+            break
+
+    # ✂️ Los mensajes archivados salen de la tabla caliente
+    metrics["pruned_messages"] = prune_archived_messages(batch_size)
+
+    metrics.update({
+        "active_chat_sessions": ChatSession.objects.filter(is_active=True).count(),
+        "active_assistant_sessions": AssistantSession.objects.filter(is_active=True).count(),
+        "avg_close_lag_s": round(sum(lags) / len(lags), 1) if lags else None,
+        "max_close_lag_s": round(max(lags), 1) if lags else None,
+        "duration_ms": round((time.perf_counter() - started_at) * 1000),
+    })
+    SessionReaperRun.objects.create(ran_at=closed_at, **metrics)
+    SessionReaperRun.objects.filter(ran_at__lt=closed_at - REAPER_RUN_RETENTION).delete()
+    return metrics
@@ -1,15 +1,37 @@
 from datetime import timedelta
 from django.utils.timezone import now
 
-from apps.assistant.models import AIMessage, AssistantSession
-from apps.chat.models import ChatMessage, ChatSession
+from apps.assistant.models import AssistantSession
+from apps.chat.models import ChatSession, ConversationMessage
+from apps.chat.session_store import session_store
 
 # TODO: Definir el tiempo de inactividad para cerrar la sesión
 SESSION_TIMEOUT = timedelta(minutes=5)  # Tiempo de inactividad para cerrar la sesión
 
 
 # ✅ 1️⃣ Gestión de la sesión de chat
-def manage_chat_session(tenant, phone_number, message_content):
+def manage_chat_session(tenant, phone_number):
+    """
+    Resuelve las sesiones activas (chat y asistente) del contacto.
+    Con la sesión en el `session_store` basta una consulta (la `AssistantSession` por su clave, con
+    el contexto al día): la última interacción se escribe en segundo plano. Solo se resuelve contra
+    la BD si no está guardada, ha caducado o se ha cerrado.
+    Devuelve `(chat_session, assistant_session)`.
+    """
+    interaction_at = now()
+    state = session_store.get(tenant, phone_number)
+    if state and (interaction_at - state["last_interaction"]) <= SESSION_TIMEOUT:
+        sessions = session_store.load(tenant, phone_number, state, interaction_at)
+        if sessions:
+            return sessions
+
+    chat_session, assistant_session = load_or_create_sessions(tenant, phone_number, interaction_at)
+    session_store.remember(chat_session, assistant_session)
+    return chat_session, assistant_session
+
+
+def load_or_create_sessions(tenant, phone_number, interaction_at):
+    """Sesiones activas del contacto leídas de la BD (cerrando la caducada) o creadas de cero."""
     # Verificar si existe una sesión activa para el contacto
     active_session = ChatSession.objects.filter(
         tenant=tenant,
@@ -19,13 +41,13 @@ def manage_chat_session(tenant, phone_number, message_content):
 
     # Si hay una sesión activa, verificar el tiempo de inactividad
     if active_session:
-        if (now() - active_session.last_interaction) > SESSION_TIMEOUT:
+        if (interaction_at - active_session.last_interaction) > SESSION_TIMEOUT:
             # La sesión ha superado el tiempo de inactividad
             close_chat_and_assistant_session(active_session)
             active_session = None
         else:
             # La sesión está activa y dentro del tiempo de inactividad
-            active_session.last_interaction = now()
+            active_session.last_interaction = interaction_at
             active_session.save()
 
     # Crear una nueva sesión si no hay una activa
@@ -34,36 +56,43 @@ def manage_chat_session(tenant, phone_number, message_content):
             tenant=tenant,
             phone_number=phone_number,
             is_active=True,
-            start_time=now(),
-            last_interaction=now()
+            start_time=interaction_at,
+            last_interaction=interaction_at
         )
 
         # 🚀 Crear una nueva AssistantSession vinculada a la ChatSession
-        AssistantSession.objects.create(
+        assistant_session = AssistantSession.objects.create(
             tenant=tenant,
             chat_session=active_session,
             phone_number=phone_number,
             is_active=True,
-            start_time=now(),
+            start_time=interaction_at,
+        )
+    else:
+        # Verificar si existe una sesión de IA asociada, si no, crearla
+        assistant_session, _ = AssistantSession.objects.get_or_create(
+            chat_session=active_session,
+            defaults={
+                "tenant": tenant,
+                "phone_number": phone_number,
+                "is_active": True,
+                "start_time": interaction_at,
+            },
         )
 
-    # Guardar el mensaje del cliente en la ChatSession
-    ChatMessage.objects.create(
-        tenant=tenant,
-        session=active_session,
-        sender='client',
-        message_content=message_content,
-        timestamp=now()
-    )
-
-    return active_session
+    # 🔗 Compartir las instancias ya cargadas para no volver a consultarlas durante el turno
+    active_session.tenant = tenant
+    assistant_session.tenant = tenant
+    assistant_session.chat_session = active_session
+    return active_session, assistant_session
 
 
 # ✅ 2️⃣ Procesamiento del mensaje de WhatsApp
-def process_whatsapp_message(message, contact, tenant, transcribed_text=None):
+def process_whatsapp_message(message, turn, transcribed_text=None):
     """
     Procesa el mensaje de WhatsApp para gestionar la sesión de chat y la IA.
     Si es un audio, usa `transcribed_text` como el contenido del mensaje.
+    La sesión del asistente queda asociada al `TurnContext` del turno.
     """
     print("🔥🔥🔥🔥🔥 process_whatsapp_message", message, flush=True)
     # Determinar el contenido del mensaje
@@ -75,32 +104,41 @@ def process_whatsapp_message(message, contact, tenant, transcribed_text=None):
     if not message_content:
         return None  # Evita procesar mensajes vacíos o sin contenido útil
 
-    phone_number = contact.phone_number
+    tenant = turn.tenant
+    phone_number = turn.phone_number
 
-    # Obtener o crear la sesión de chat
-    chat_session = manage_chat_session(tenant, phone_number, message_content)
+    # Obtener o crear las sesiones de chat y de IA
+    _, assistant_session = manage_chat_session(tenant, phone_number)
+    turn.attach_session(assistant_session)
 
-    # Verificar si existe una sesión de IA asociada, si no, crearla
-    assistant_session, _ = AssistantSession.objects.get_or_create(
-        chat_session=chat_session,
-        defaults={
-            "tenant": tenant,
-            "phone_number": phone_number,
-            "is_active": True,
-            "start_time": now(),
-        },
-    )
-
-    # Guardar el mensaje del usuario en la sesión de IA
-    AIMessage.objects.create(
-        tenant=tenant,
-        session=assistant_session,
-        role="user",
-        content=message_content,  # Guardamos el texto transcrito o el mensaje normal
-    )
+    # Anotar el mensaje del usuario (texto transcrito o mensaje normal); se inserta junto a la respuesta
+    log_turn_message(turn, "user", message_content)
 
     return assistant_session
 
+
+def log_turn_message(turn, role, content):
+    """Anota una entrada del registro de conversación del turno, pendiente de `flush_turn_messages`."""
+    session = turn.session
+    turn.pending_messages.append(ConversationMessage(
+        tenant=turn.tenant,
+        chat_session_id=session.chat_session_id,
+        assistant_session=session,
+        role=role,
+        content=content,
+        timestamp=now(),
+    ))
+
+
+def flush_turn_messages(turn):
+    """
+    Inserta en un solo `bulk_create` las entradas pendientes del turno (mensaje del cliente y
+    respuesta). Si el turno termina sin respuesta guardada, inserta solo el mensaje del cliente.
+    """
+    if turn.pending_messages:
+        ConversationMessage.objects.bulk_create(turn.pending_messages)
+        turn.pending_messages = []
+
 # ✅ 3️⃣ Cierre de sesiones de Chat y Asistente
 def close_chat_and_assistant_session(chat_session):
     now_time = now()
@@ -0,0 +1,128 @@
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from apps.assistant.models import AssistantSession
+from apps.chat.models import ChatSession
+
+SESSION_STORE_KEY = "chat_session:{tenant_id}:{phone_number}"
+
+
+class SessionStore:
+    """
+    Sesiones activas por `(tenant, teléfono)` en la caché (Redis o memoria del proceso): solo IDs de la
+    `ChatSession` y la `AssistantSession` y sus marcas de tiempo. Lo mutable (contexto, idioma, estado)
+    se lee siempre de la BD con una sola consulta por la clave primaria, que además comprueba que
+    ninguna de las dos sesiones se ha cerrado (basta con que otro proceso la cierre en la BD). La última interacción se acumula en memoria y un hilo en segundo plano la
+    escribe en lote (varias interacciones de la misma sesión, un solo UPDATE).
+    """
+
+    def __init__(self, ttl, flush_interval=2.0, asynchronous=True):
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.asynchronous = asynchronous
+        self._touches = {}  # chat_session_id → última interacción pendiente de guardar
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @staticmethod
+    def key(tenant_id, phone_number):
+        return SESSION_STORE_KEY.format(tenant_id=tenant_id, phone_number=phone_number)
+
+    def get(self, tenant, phone_number):
+        """Estado guardado de la sesión activa (o None), sin consultas."""
+        return cache.get(self.key(tenant.id, phone_number))
+
+    def remember(self, chat_session, assistant_session):
+        """Guarda (o refresca) los IDs y marcas de tiempo de la sesión activa a partir de las instancias."""
+        state = {
+            "chat_session_id": chat_session.id,
+            "chat_started_at": chat_session.start_time,
+            "last_interaction": chat_session.last_interaction,
+            "assistant_session_id": assistant_session.id,
+        }
+        cache.set(self.key(chat_session.tenant_id, chat_session.phone_number), state, self.ttl)
+
+    def forget(self, tenant_id, phone_number, chat_session_id=None):
+        """Olvida la sesión guardada (si es la indicada): el siguiente mensaje la resolverá contra la BD."""
+        key = self.key(tenant_id, phone_number)
+        if chat_session_id is not None:
+            state = cache.get(key)
+            if not state or state["chat_session_id"] != chat_session_id:
+                return
+        cache.delete(key)
+
+    def load(self, tenant, phone_number, state, interaction_at):
+        """
+        `ChatSession` (reconstruida desde el estado guardado) y `AssistantSession` (leída de la BD, con
+        su contexto al día) de la sesión guardada, con una sola consulta. Si alguna de las dos se ha
+        cerrado entretanto (reaper, pago), la olvida y devuelve None. Anota la nueva interacción, que
+        se escribirá en la BD en segundo plano.
+        """
+        assistant_session = AssistantSession.objects.filter(
+            pk=state["assistant_session_id"], is_active=True, chat_session__is_active=True
+        ).first()
+        if assistant_session is None:
+            self.forget(tenant.id, phone_number, state["chat_session_id"])
+            return None
+
+        chat_session = ChatSession.from_db(
+            "default",
+            ["id", "tenant_id", "phone_number", "is_active", "start_time", "last_interaction"],
+            [state["chat_session_id"], tenant.id, phone_number, True, state["chat_started_at"], interaction_at],
+        )
+        chat_session.tenant = tenant
+        assistant_session.tenant = tenant
+        assistant_session.chat_session = chat_session
+
+        state["last_interaction"] = interaction_at
+        cache.set(self.key(tenant.id, phone_number), state, self.ttl)
+        self.touch(chat_session.id, interaction_at)
+        return chat_session, assistant_session
+
+    def touch(self, chat_session_id, interaction_at):
+        with self._lock:
+            self._touches[chat_session_id] = interaction_at
+        self._schedule()
+
+    def flush(self):
+        """Escribe inmediatamente las interacciones pendientes."""
+        with self._lock:
+            touches, self._touches = self._touches, {}
+        if not touches:
+            return
+
+        try:
+            ChatSession.objects.bulk_update(
+                [ChatSession(id=session_id, last_interaction=at) for session_id, at in touches.items()],
+                ["last_interaction"],
+            )
+        except Exception as e:
+            print(f"❌ Error guardando {len(touches)} sesiones de chat: {e}", flush=True)
+
+    def _schedule(self):
+        if not self.asynchronous:
+            self.flush()
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="chat-session-store", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+            connections.close_all()  # 🔹 Respeta CONN_MAX_AGE=0 también en el hilo de escritura
+
+
+session_store = SessionStore(
+    ttl=settings.CHAT_SESSION_STORE["TTL"],
+    flush_interval=settings.CHAT_SESSION_STORE["FLUSH_INTERVAL"],
+    asynchronous=settings.CHAT_SESSION_STORE["ASYNC"],
+)
+atexit.register(session_store.flush)
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+
+from apps.assistant.models import AssistantSession
+from apps.chat.models import ChatSession
+from apps.chat.session_store import session_store
+
+
+def assistant_session_saved(sender, instance, **kwargs):
+    # 🔹 Una sesión cerrada deja de resolverse desde el store
+    if not instance.is_active:
+        session_store.forget(instance.tenant_id, instance.phone_number, instance.chat_session_id)
+
+
+def chat_session_closed(sender, instance, **kwargs):
+    if kwargs.get("signal") is post_delete or not instance.is_active:
+        session_store.forget(instance.tenant_id, instance.phone_number, instance.id)
+
+
+def connect_session_store_signals():
+    post_save.connect(assistant_session_saved, sender=AssistantSession, dispatch_uid="session_store_assistant_saved")
+    post_save.connect(chat_session_closed, sender=ChatSession, dispatch_uid="session_store_chat_saved")
+    post_delete.connect(chat_session_closed, sender=ChatSession, dispatch_uid="session_store_chat_deleted")
@@ -1,3 +1,64 @@
-from django.test import TestCase
-
-# Create your tests here.
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.timezone import now
+
+from apps.assistant.models import AssistantSession
+from apps.chat.models import ChatSession, SessionReaperRun
+from apps.chat.reaper import reap_expired_sessions
+from apps.chat.services import manage_chat_session
+from apps.chat.session_store import SessionStore, session_store
+from apps.tenants.models import Tenant
+
+CUSTOMER = "34611111111"
+
+
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(
+            name="Bar Test", owner_name="-", phone_number="34600000000", phone_number_id="test-id",
+            whatsapp_access_token="-", nif="-",
+        )
+        patcher = mock.patch.object(SessionStore, "_schedule")  # Sin escritura en segundo plano
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(session_store.flush)  # Lo pendiente se escribe dentro de la transacción del test
+
+    def test_context_is_read_from_the_database_not_the_cache(self):
+        _, session = manage_chat_session(self.tenant, CUSTOMER)
+        # Otro proceso guarda la mesa y el paso del flujo después de que la sesión quedara en el store
+        AssistantSession.objects.filter(pk=session.pk).update(
+            context={"table_number": "7", "flow_state": "categories"}, last_detected_language="en"
+        )
+
+        _, resumed = manage_chat_session(self.tenant, CUSTOMER)
+        self.assertEqual(resumed.pk, session.pk)
+        self.assertEqual(resumed.context, {"table_number": "7", "flow_state": "categories"})
+        self.assertEqual(resumed.last_detected_language, "en")
+
+    def test_session_closed_elsewhere_is_not_resumed(self):
+        chat_session, session = manage_chat_session(self.tenant, CUSTOMER)
+        # Cierre por UPDATE (sin señales) que no ha llegado a borrar la entrada del store
+        ChatSession.objects.filter(pk=chat_session.pk).update(is_active=False)
+        AssistantSession.objects.filter(pk=session.pk).update(is_active=False)
+
+        new_chat_session, new_session = manage_chat_session(self.tenant, CUSTOMER)
+        self.assertNotEqual(new_chat_session.pk, chat_session.pk)
+        self.assertNotEqual(new_session.pk, session.pk)
+        self.assertTrue(new_session.is_active)
+
+    def test_reaper_closes_expired_sessions_and_records_the_run(self):
+        chat_session, session = manage_chat_session(self.tenant, CUSTOMER)
+        ChatSession.objects.filter(pk=chat_session.pk).update(last_interaction=now() - timedelta(hours=1))
+
+        metrics = reap_expired_sessions()
+
+        self.assertEqual((metrics["closed_chat_sessions"], metrics["closed_assistant_sessions"]), (1, 1))
+        run = SessionReaperRun.objects.get()
+        self.assertEqual((run.closed_chat_sessions, run.active_chat_sessions), (1, 0))
+        self.assertIsNone(session_store.get(self.tenant, CUSTOMER))
+        _, new_session = manage_chat_session(self.tenant, CUSTOMER)
+        self.assertNotEqual(new_session.pk, session.pk)
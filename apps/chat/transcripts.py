@@ -0,0 +1,33 @@
+import json
+import zlib
+from datetime import datetime, timezone
+
+import msgpack
+
+TRANSCRIPT_FORMAT = 1
+COMPRESSION_LEVEL = 9  # Se comprime una vez y se lee poco: prima el tamaño
+
+
+def pack_transcript(messages):
+    """
+    Empaqueta `messages` (`(role, content, timestamp)` en orden) en msgpack + zlib.
+    Cada mensaje es una tupla con la marca de tiempo en segundos Unix, sin claves repetidas.
+    Devuelve `(blob, raw_size)`, donde `raw_size` es lo que ocuparía la transcripción en JSON.
+    """
+    rows = [(role, content, timestamp.timestamp()) for role, content, timestamp in messages]
+    blob = zlib.compress(msgpack.packb([TRANSCRIPT_FORMAT, rows], use_bin_type=True), COMPRESSION_LEVEL)
+    raw_size = len(json.dumps(decode_rows(rows), ensure_ascii=False).encode())
+    return blob, raw_size
+
+
+def unpack_transcript(blob):
+    """Transcripción de `blob` como lista de `{"role", "content", "timestamp"}` (ISO 8601, UTC)."""
+    _, rows = msgpack.unpackb(zlib.decompress(bytes(blob)), raw=False)
+    return decode_rows(rows)
+
+
+def decode_rows(rows):
+    return [
+        {"role": role, "content": content, "timestamp": datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()}
+        for role, content, timestamp in rows
+    ]
@@ -5,13 +5,30 @@ from django.shortcuts import render, redirect
 from django.urls import path
 from django import forms
 from django.utils.html import format_html
-from django.urls import reverse
-from django.test import Client
 
 from apps.menu.models import (
     Product, Category, Allergen, Extra, ProductAllergen, ProductExtra, ExtraAllergen
 )
 from apps.tenants.models import Tenant
+from apps.menu.importer import import_menu, sync_menu
+from apps.menu.versioning import coalesce_menu_version_bumps, request_menu_version_bump
+
+IMPORT_LABELS = {"categories": "categorías", "products": "productos", "allergens": "alérgenos", "extras": "extras", "relations": "relaciones"}
+
+
+def sync_summary(diff):
+    """Resumen legible del diff de `sync_menu` para los mensajes del admin."""
+    if not diff["has_changes"]:
+        return "sin cambios"
+    parts = [
+        f"{len(diff[section][kind])} {IMPORT_LABELS[kind]} {label}"
+        for section, label in (("added", "añadidos"), ("changed", "cambiados"), ("removed", "retirados"))
+        for kind in diff[section] if diff[section][kind]
+    ]
+    relations = diff["relations"]
+    if relations["added"] or relations["removed"]:
+        parts.append(f"relaciones +{relations['added']}/-{relations['removed']}")
+    return ", ".join(parts)
 
 # 📌 **Formulario para importar Menú desde JSON**
 class MenuUploadForm(forms.Form):
@@ -21,6 +38,28 @@ class MenuUploadForm(forms.Form):
         required=True
     )
     json_file = forms.FileField(label="Sube un archivo JSON")
+    mode = forms.ChoiceField(
+        choices=[
+            ("import", "Importar (solo crea lo que falte)"),
+            ("sync", "Sincronizar (actualiza precios/disponibilidad y retira lo que no venga)"),
+        ],
+        initial="import",
+        label="Modo",
+    )
+
+# 📌 **Ediciones masivas (`list_editable`, acciones) con un único incremento de `menu_version`**
+class MenuVersionAdminMixin:
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "POST":
+            return super().changelist_view(request, extra_context=extra_context)
+        with coalesce_menu_version_bumps():
+            return super().changelist_view(request, extra_context=extra_context)
+
+    def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+        if request.method != "POST":
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        with coalesce_menu_version_bumps():  # El objeto y sus inlines cuentan como un solo cambio
+            return super().changeform_view(request, object_id, form_url, extra_context)
 
 # 📌 **Inline para manejar los alérgenos dentro de Productos**
 class ProductAllergenInline(admin.TabularInline):  # También puede ser `StackedInline`
@@ -36,7 +75,7 @@ class ProductExtraInline(admin.TabularInline):
 
 # 📌 **Admin de Productos**
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ("name", "category", "price", "available", "created_at")
     search_fields = ("name", "category__name")
     list_filter = ("category", "available", "created_at")
@@ -59,7 +98,7 @@ class ProductAdmin(admin.ModelAdmin):
 
 # 📌 **Admin de Categorías con Importación de Menú**
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ("name", "tenant", "order", "is_active", "created_at")
     list_filter = ("tenant", "is_active", "created_at")
     list_editable = ("order",)
@@ -87,7 +126,7 @@ class CategoryAdmin(admin.ModelAdmin):
     def import_menu_view(self, request):
         """
         Vista personalizada para importar menús desde un archivo JSON.
-        Ahora redirige los datos al endpoint de `MenuUploadView` y le agrega `tenant_id`.
+        Llama directamente al importador por lotes (el mismo que usa `MenuUploadView`).
         """
         if request.method == "POST":
             form = MenuUploadForm(request.POST, request.FILES)
@@ -97,25 +136,16 @@ class CategoryAdmin(admin.ModelAdmin):
 
                 try:
                     data = json.load(json_file)
-                    data["tenant_id"] = str(tenant.id)  # 🔹 Agregamos manualmente `tenant_id`
-
-                    # 🔹 Simula una petición POST al endpoint de `MenuUploadView`
-                    client = Client()
-                    response = client.post(
-                        reverse("upload_menu"),  # Asegúrate de que este nombre coincide con tu URL
-                        data=json.dumps(data),
-                        content_type="application/json",
-                    )
-
-                    # 🔹 Manejo de la respuesta
-                    if response.status_code == 201:
-                        messages.success(request, f"✅ Menú importado exitosamente para {tenant.name}.")
+                    if form.cleaned_data["mode"] == "sync":
+                        diff = sync_menu(tenant, data)
+                        messages.success(request, f"🔄 Menú de {tenant.name} sincronizado: {sync_summary(diff)}.")
                     else:
-                        messages.error(request, f"❌ Error en la importación: {response.json().get('error', 'Desconocido')}")
-
+                        created = import_menu(tenant, data)
+                        summary = ", ".join(f"{count} {IMPORT_LABELS[kind]}" for kind, count in created.items())
+                        messages.success(request, f"✅ Menú importado exitosamente para {tenant.name} ({summary}).")
                     return redirect("admin:menu_category_changelist")
 
-                except Exception as e:
+                except Exception as e:  # JSON no válido, `MenuImportError`... (la transacción ya se ha deshecho)
                     messages.error(request, f"❌ Error al procesar el archivo JSON: {e}")
 
         else:
@@ -153,8 +183,9 @@ class CategoryAdmin(admin.ModelAdmin):
         for index, category in enumerate(categories, start=1):
             category.order = index
         
-        # 🔹 Usa `bulk_update` para evitar múltiples llamadas a la BD
+        # 🔹 Usa `bulk_update` para evitar múltiples llamadas a la BD (no emite señales: se marca el cambio a mano)
         Category.objects.bulk_update(categories, ["order"])
+        request_menu_version_bump(tenant.id if tenant else None)
 
         
     import_menu_button.allow_tags = True
@@ -162,7 +193,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
 # 📌 **Admin de Alérgenos**
 @admin.register(Allergen)
-class AllergenAdmin(admin.ModelAdmin):
+class AllergenAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ("name", "description")
     search_fields = ("name",)
     ordering = ("name",)
@@ -170,7 +201,7 @@ class AllergenAdmin(admin.ModelAdmin):
 
 # 📌 **Admin de Extras**
 @admin.register(Extra)
-class ExtraAdmin(admin.ModelAdmin):
+class ExtraAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ("name", "price", "available", "is_default", "max_quantity", "created_at")
     search_fields = ("name",)
     list_filter = ("available", "is_default")
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MenuConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.menu'
+
+    def ready(self):
+        from .signals import connect_menu_signals
+        connect_menu_signals()
@@ -0,0 +1,149 @@
+import threading
+
+from django.db.models import Prefetch
+
+from apps.menu.lookup import normalize_name, singular_key
+from apps.menu.models import Allergen, Extra, Product
+from apps.menu.versioning import get_menu_version
+
+DIET_VEGAN = "vegano"
+DIET_VEGETARIAN = "vegetariano"
+DIET_GLUTEN_FREE = "sin_gluten"
+DIETS = (DIET_VEGAN, DIET_VEGETARIAN, DIET_GLUTEN_FREE)
+
+GLUTEN = singular_key(normalize_name("Gluten"))
+
+
+def allergen_key(name):
+    """Clave de comparación de un alérgeno: "Lácteos", "lacteo" y "LACTEOS" dan la misma."""
+    return singular_key(normalize_name(name))
+
+
+def iter_bits(mask):
+    """Posiciones de los bits a 1 de `mask`, de menor a mayor."""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+class DietaryIndex:
+    """
+    Bitsets de alérgenos y dietas del menú del tenant: un entero por alérgeno (o dieta) con un bit por
+    producto (y otro juego para los extras). Filtrar "sin gluten ni lactosa" son un par de AND/NOT
+    sobre enteros, sin recorrer la carta ni consultar la BD.
+    """
+
+    def __init__(self, products, extras):
+        self.extras = [{"name": extra.name, "price": str(extra.price)} for extra in extras]
+        extra_bits = {extra.pk: 1 << position for position, extra in enumerate(extras)}
+        self.all_extras = (1 << len(extras)) - 1
+
+        self.products = []
+        self.all_products = (1 << len(products)) - 1
+        self.allergen_names = {}
+        self._product_allergens = {}
+        self._extra_allergens = {}
+        self._diets = dict.fromkeys(DIETS, 0)
+        self._product_extras = []
+
+        for extra in extras:
+            for allergen in extra.allergens.all():
+                key = self._register_allergen(allergen)
+                self._extra_allergens[key] = self._extra_allergens.get(key, 0) | extra_bits[extra.pk]
+
+        for position, product in enumerate(products):
+            bit = 1 << position
+            self.products.append({"name": product.name, "category": product.category.name, "price": str(product.price)})
+            self._product_extras.append(sum(extra_bits.get(extra.pk, 0) for extra in product.extras.all()))
+
+            allergen_keys = set()
+            for allergen in product.allergens.all():
+                key = self._register_allergen(allergen)
+                allergen_keys.add(key)
+                self._product_allergens[key] = self._product_allergens.get(key, 0) | bit
+
+            # 🔹 Dietas: solo cuenta lo marcado explícitamente; el gluten declarado como alérgeno prevalece
+            if product.is_vegan:
+                self._diets[DIET_VEGAN] |= bit
+            if product.is_vegan or product.is_vegetarian:
+                self._diets[DIET_VEGETARIAN] |= bit
+            if product.gluten_free is True and GLUTEN not in allergen_keys:
+                self._diets[DIET_GLUTEN_FREE] |= bit
+
+    def _register_allergen(self, allergen):
+        key = allergen_key(allergen.name)
+        self.allergen_names.setdefault(key, allergen.name)
+        return key
+
+    def filter(self, allergens=(), diets=()):
+        """
+        Productos aptos sin los alérgenos indicados y que cumplen todas las dietas, cada uno con los
+        extras que también son aptos. Los alérgenos que no figuran en la carta se devuelven aparte
+        en `unknown_allergens` (no se puede garantizar nada sobre ellos).
+        """
+        excluded_keys = {allergen_key(name) for name in allergens} - {""}
+        diets = set(diets) & set(DIETS)
+        if GLUTEN in excluded_keys or DIET_GLUTEN_FREE in diets:
+            # 🔹 "Sin gluten" combina el alérgeno declarado con la marca `gluten_free` del producto
+            excluded_keys.add(GLUTEN)
+            diets.add(DIET_GLUTEN_FREE)
+
+        product_mask, extra_mask = self.all_products, self.all_extras
+        for key in excluded_keys:
+            product_mask &= ~self._product_allergens.get(key, 0)
+            extra_mask &= ~self._extra_allergens.get(key, 0)
+        for diet in diets:
+            product_mask &= self._diets[diet]
+
+        return {
+            "allergens": sorted(self.allergen_names.get(key, key) for key in excluded_keys),
+            "diets": sorted(diets),
+            "unknown_allergens": sorted(
+                name for name in allergens
+                if allergen_key(name) and allergen_key(name) not in self.allergen_names and allergen_key(name) != GLUTEN
+            ),
+            "products": [
+                {
+                    **self.products[position],
+                    "extras": [self.extras[extra] for extra in iter_bits(self._product_extras[position] & extra_mask)],
+                }
+                for position in iter_bits(product_mask)
+            ],
+        }
+
+
+_indexes = {}  # tenant_id → (menu_version, DietaryIndex)
+_indexes_lock = threading.Lock()
+
+
+def get_dietary_index(tenant):
+    """Índice de alérgenos y dietas del tenant para su `menu_version` actual (5 consultas al construirse)."""
+    menu_version = get_menu_version(tenant)
+    cached = _indexes.get(tenant.id)
+    if cached and cached[0] == menu_version:
+        return cached[1]
+
+    allergens = Prefetch("allergens", queryset=Allergen.objects.only("id", "name"))
+    extras = list(
+        Extra.objects.filter(tenant=tenant, available=True)
+        .only("id", "name", "price")
+        .prefetch_related(allergens)
+        .order_by("name")
+    )
+    products = list(
+        Product.objects.filter(tenant=tenant, available=True, category__is_active=True)
+        .select_related("category")
+        .only("id", "name", "price", "is_vegan", "is_vegetarian", "gluten_free", "category__name", "category__order")
+        .prefetch_related(allergens, Prefetch("extras", queryset=Extra.objects.only("id")))
+        .order_by("category__order", "name")
+    )
+    index = DietaryIndex(products, extras)
+    with _indexes_lock:
+        _indexes[tenant.id] = (menu_version, index)
+    return index
+
+
+def filter_menu(tenant, allergens=(), diets=()):
+    """Productos (con sus extras aptos) del menú del tenant sin los alérgenos indicados y aptos para las dietas."""
+    return get_dietary_index(tenant).filter(allergens=allergens, diets=diets)
@@ -0,0 +1,384 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Max
+
+from apps.menu.models import Allergen, Category, Extra, ExtraAllergen, Product, ProductAllergen, ProductExtra
+from apps.menu.lookup import normalize_name
+from apps.menu.versioning import coalesce_menu_version_bumps, request_menu_version_bump
+
+
+class MenuImportError(ValueError):
+    """El documento del menú no tiene el formato esperado."""
+
+
+def parse_menu_document(data):
+    """
+    Recorre el JSON del menú una sola vez y lo normaliza: precios por tamaño desdoblados en productos
+    (`Nombre (Tamaño)`), alérgenos y extras resueltos por nombre. No toca la base de datos.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("categories", []), list):
+        raise MenuImportError("El documento debe tener una lista 'categories'")
+
+    categories = []
+    for category_index, category_data in enumerate(data.get("categories", []), start=1):
+        if not category_data.get("name"):
+            raise MenuImportError(f"Categoría #{category_index} sin 'name'")
+
+        products = []
+        for item in category_data.get("items", []):
+            if not item.get("name"):
+                raise MenuImportError(f"Producto sin 'name' en la categoría '{category_data['name']}'")
+
+            base = {
+                "description": item.get("description", ""),
+                "ingredients": ", ".join(item.get("ingredients", [])),
+                "available": item.get("available", True),
+                "allergens": list(item.get("allergens", [])),
+                "extras": [parse_extra(extra_data, item["name"]) for extra_data in item.get("extras", [])],
+            }
+
+            # Si el precio es un diccionario (ej: {"half": 2.5, "full": 4.5}), un producto por tamaño
+            price_data = item.get("price", 0)
+            if isinstance(price_data, dict):
+                for size, price in price_data.items():
+                    products.append({**base, "name": f"{item['name']} ({size.capitalize()})", "price": parse_price(price, item["name"])})
+            else:
+                products.append({**base, "name": item["name"], "price": parse_price(price_data, item["name"])})
+
+        categories.append({
+            "name": category_data["name"],
+            "description": category_data.get("description", ""),
+            "order": category_data.get("order"),
+            "products": products,
+        })
+
+    return categories
+
+
+def parse_extra(extra_data, product_name):
+    if not extra_data.get("name"):
+        raise MenuImportError(f"Extra sin 'name' en el producto '{product_name}'")
+    return {
+        "name": extra_data["name"],
+        "price": parse_price(extra_data.get("price", 0), extra_data["name"]),
+        "available": extra_data.get("available", True),
+        "allergens": list(extra_data.get("allergens", [])),
+    }
+
+
+def parse_price(value, name):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise MenuImportError(f"Precio no válido en '{name}': {value!r}")
+
+
+def import_menu(tenant, data):
+    """
+    Importa un menú completo para el tenant: crea lo que falte y deja intacto lo que ya existe
+    (mismo criterio que el antiguo `get_or_create` por fila). Resuelve las filas existentes con
+    unas pocas consultas por conjunto y escribe con `bulk_create` dentro de una única transacción,
+    así que un error no deja el menú a medio importar. Devuelve cuántas filas se han creado por tipo.
+    """
+    categories = parse_menu_document(data)
+    created = {"categories": 0, "products": 0, "allergens": 0, "extras": 0, "relations": 0}
+
+    with transaction.atomic(), coalesce_menu_version_bumps():
+        # 🔹 Filas existentes del tenant, una consulta por modelo
+        existing_categories = by_name(Category.objects.filter(tenant=tenant, name__in=[c["name"] for c in categories]))
+        products_by_name = by_name(Product.objects.filter(
+            tenant=tenant, name__in=[p["name"] for c in categories for p in c["products"]],
+        ))
+        extras_by_name = by_name(Extra.objects.filter(
+            tenant=tenant, name__in=[e["name"] for c in categories for p in c["products"] for e in p["extras"]],
+        ))
+        allergens_by_name = by_name(Allergen.objects.filter(tenant=tenant, name__in={
+            *(a for c in categories for p in c["products"] for a in p["allergens"]),
+            *(a for c in categories for p in c["products"] for e in p["extras"] for a in e["allergens"]),
+        }))
+
+        new_categories, new_products, new_extras, new_allergens = [], [], [], []
+        product_allergens, product_extras, extra_allergens = set(), set(), set()
+
+        def resolve_allergen(name):
+            if name not in allergens_by_name:
+                allergens_by_name[name] = Allergen(tenant=tenant, name=name)
+                new_allergens.append(allergens_by_name[name])
+            return allergens_by_name[name]
+
+        # 🔹 Siguiente orden disponible para las categorías que no lo traen (una sola agregación)
+        next_order = (Category.objects.filter(tenant=tenant).aggregate(Max("order"))["order__max"] or 0) + 1
+
+        for category_data in categories:
+            category = existing_categories.get(category_data["name"])
+            if category is None:
+                order = category_data["order"]
+                if not order:
+                    order, next_order = next_order, next_order + 1
+                category = Category(tenant=tenant, name=category_data["name"], description=category_data["description"], order=order)
+                existing_categories[category.name] = category
+                new_categories.append(category)
+
+            for product_data in category_data["products"]:
+                product = products_by_name.get(product_data["name"])
+                if product is None:
+                    product = Product(
+                        tenant=tenant,
+                        category=category,
+                        name=product_data["name"],
+                        description=product_data["description"],
+                        ingredients=product_data["ingredients"],
+                        price=product_data["price"],
+                        available=product_data["available"],
+                    )
+                    products_by_name[product.name] = product
+                    new_products.append(product)
+
+                for allergen_name in product_data["allergens"]:
+                    product_allergens.add((product, resolve_allergen(allergen_name)))
+
+                for extra_data in product_data["extras"]:
+                    extra = extras_by_name.get(extra_data["name"])
+                    if extra is None:
+                        extra = Extra(tenant=tenant, name=extra_data["name"], price=extra_data["price"], available=extra_data["available"])
+                        extras_by_name[extra.name] = extra
+                        new_extras.append(extra)
+                    product_extras.add((product, extra))
+                    for allergen_name in extra_data["allergens"]:
+                        extra_allergens.add((extra, resolve_allergen(allergen_name)))
+
+        # 🔹 Escritura por lotes (los UUID se generan en Python, así que las relaciones ya apuntan bien)
+        Category.objects.bulk_create(new_categories)
+        Allergen.objects.bulk_create(new_allergens)
+        Extra.objects.bulk_create(new_extras)
+        Product.objects.bulk_create(new_products)
+        created["relations"] += create_missing_relations(ProductAllergen, "product", "allergen", tenant, product_allergens)
+        created["relations"] += create_missing_relations(ProductExtra, "product", "extra", tenant, product_extras)
+        created["relations"] += create_missing_relations(ExtraAllergen, "extra", "allergen", tenant, extra_allergens)
+
+        created.update(
+            categories=len(new_categories), products=len(new_products),
+            allergens=len(new_allergens), extras=len(new_extras),
+        )
+        if any(created.values()):
+            request_menu_version_bump(tenant.id)  # `bulk_create` no emite señales
+
+    return created
+
+
+def by_name(queryset):
+    """Indexa por nombre; con nombres repetidos gana el primero, como hacía `get_or_create`."""
+    rows = {}
+    for row in queryset.order_by("pk"):
+        rows.setdefault(row.name, row)
+    return rows
+
+
+def create_missing_relations(model, left, right, tenant, pairs):
+    """Crea las filas intermedias que falten con una consulta de lectura y un `bulk_create`."""
+    if not pairs:
+        return 0
+    existing = set(model.objects.filter(
+        tenant=tenant,
+        **{f"{left}__in": {a.pk for a, _ in pairs}, f"{right}__in": {b.pk for _, b in pairs}},
+    ).values_list(f"{left}_id", f"{right}_id"))
+    missing = [
+        model(tenant=tenant, **{left: a, right: b})
+        for a, b in pairs if (a.pk, b.pk) not in existing
+    ]
+    model.objects.bulk_create(missing)
+    return len(missing)
+
+
+def by_normalized_name(rows):
+    """Indexa por nombre normalizado; con nombres repetidos gana el primero (por pk)."""
+    indexed = {}
+    for row in sorted(rows, key=lambda row: str(row.pk)):
+        indexed.setdefault(normalize_name(row.name), row)
+    return indexed
+
+
+def sync_menu(tenant, data, dry_run=False):
+    """
+    Sincroniza el catálogo del tenant con un documento completo del TPV: calcula el diff
+    (añadidos, cambiados y retirados, emparejando por nombre normalizado) y aplica solo esos cambios.
+    Lo retirado no se borra: las categorías pasan a inactivas y los productos y extras a no disponibles,
+    para no romper pedidos antiguos. Con `dry_run` solo se devuelve el diff. `menu_version` solo se
+    incrementa si algo ha cambiado de verdad.
+    """
+    categories = parse_menu_document(data)
+    diff = {
+        "added": {"categories": [], "products": [], "extras": [], "allergens": []},
+        "changed": {"categories": {}, "products": {}, "extras": {}},
+        "removed": {"categories": [], "products": [], "extras": []},
+        "relations": {"added": 0, "removed": 0},
+    }
+
+    with transaction.atomic(), coalesce_menu_version_bumps():
+        # 🔹 Catálogo actual completo del tenant (una consulta por modelo)
+        stored_category_rows = list(Category.objects.filter(tenant=tenant))
+        stored_categories = by_normalized_name(stored_category_rows)
+        stored_products = by_normalized_name(Product.objects.filter(tenant=tenant))
+        stored_extras = by_normalized_name(Extra.objects.filter(tenant=tenant))
+        allergens = by_normalized_name(Allergen.objects.filter(tenant=tenant))
+        category_names = {category.pk: category.name for category in stored_category_rows}
+
+        new_rows = {Category: [], Allergen: [], Extra: [], Product: []}
+        updated_rows = {Category: {}, Extra: {}, Product: {}}
+        updated_fields = {Category: set(), Extra: set(), Product: set()}
+        seen = {Category: {}, Product: {}, Extra: {}}
+        product_allergens, product_extras, extra_allergens = set(), set(), set()
+        next_order = max((category.order for category in stored_category_rows), default=0) + 1
+
+        def update_fields(row, values, kind):
+            changes = {
+                field: [getattr(row, field), value] for field, value in values.items()
+                if getattr(row, field) != value and not (getattr(row, field) is None and value == "")
+            }
+            if not changes:
+                return
+            for field, (_, value) in changes.items():
+                setattr(row, field, value)
+            model = type(row)
+            updated_rows[model][row.pk] = row
+            updated_fields[model].update(changes)
+            diff["changed"][kind].setdefault(row.name, {}).update(changes)
+
+        def resolve_allergen(name):
+            key = normalize_name(name)
+            if key not in allergens:
+                allergens[key] = Allergen(tenant=tenant, name=name)
+                new_rows[Allergen].append(allergens[key])
+                diff["added"]["allergens"].append(name)
+            return allergens[key]
+
+        for category_data in categories:
+            key = normalize_name(category_data["name"])
+            category = seen[Category].get(key)
+            if category is None:
+                category = stored_categories.get(key)
+                if category is None:
+                    order = category_data["order"]
+                    if not order:
+                        order, next_order = next_order, next_order + 1
+                    category = Category(tenant=tenant, name=category_data["name"], description=category_data["description"], order=order)
+                    new_rows[Category].append(category)
+                    diff["added"]["categories"].append(category.name)
+                else:
+                    values = {"description": category_data["description"], "is_active": True}
+                    if category_data["order"]:
+                        values["order"] = category_data["order"]
+                    update_fields(category, values, "categories")
+                seen[Category][key] = category
+                category_names[category.pk] = category.name
+
+            for product_data in category_data["products"]:
+                key = normalize_name(product_data["name"])
+                if key in seen[Product]:
+                    continue  # Repetido en el documento: gana la primera aparición
+                product = stored_products.get(key)
+                if product is None:
+                    product = Product(
+                        tenant=tenant,
+                        category=category,
+                        name=product_data["name"],
+                        description=product_data["description"],
+                        ingredients=product_data["ingredients"],
+                        price=product_data["price"],
+                        available=product_data["available"],
+                    )
+                    new_rows[Product].append(product)
+                    diff["added"]["products"].append(product.name)
+                else:
+                    if product.category_id != category.pk:
+                        diff["changed"]["products"].setdefault(product.name, {})["category"] = [
+                            category_names.get(product.category_id), category.name,
+                        ]
+                        product.category = category
+                        updated_rows[Product][product.pk] = product
+                        updated_fields[Product].add("category")
+                    update_fields(product, {
+                        "description": product_data["description"],
+                        "ingredients": product_data["ingredients"],
+                        "price": product_data["price"],
+                        "available": product_data["available"],
+                    }, "products")
+                seen[Product][key] = product
+
+                for allergen_name in product_data["allergens"]:
+                    product_allergens.add((product.pk, resolve_allergen(allergen_name).pk))
+
+                for extra_data in product_data["extras"]:
+                    key = normalize_name(extra_data["name"])
+                    extra = seen[Extra].get(key)
+                    if extra is None:
+                        extra = stored_extras.get(key)
+                        if extra is None:
+                            extra = Extra(tenant=tenant, name=extra_data["name"], price=extra_data["price"], available=extra_data["available"])
+                            new_rows[Extra].append(extra)
+                            diff["added"]["extras"].append(extra.name)
+                        else:
+                            update_fields(extra, {"price": extra_data["price"], "available": extra_data["available"]}, "extras")
+                        seen[Extra][key] = extra
+                    product_extras.add((product.pk, extra.pk))
+                    for allergen_name in extra_data["allergens"]:
+                        extra_allergens.add((extra.pk, resolve_allergen(allergen_name).pk))
+
+        # 🔹 Lo que ya no viene en el documento se retira (sin borrarlo)
+        for key, category in stored_categories.items():
+            if key not in seen[Category] and category.is_active:
+                update_fields(category, {"is_active": False}, "categories")
+                diff["removed"]["categories"].append(category.name)
+        for model, stored, kind in ((Product, stored_products, "products"), (Extra, stored_extras, "extras")):
+            for key, row in stored.items():
+                if key not in seen[model] and row.available:
+                    update_fields(row, {"available": False}, kind)
+                    diff["removed"][kind].append(row.name)
+        for kind in ("categories", "products", "extras"):
+            for name in diff["removed"][kind]:
+                diff["changed"][kind].pop(name, None)  # Un retirado se informa solo como retirado
+
+        # 🔹 Relaciones: las de lo sincronizado quedan exactamente como en el documento
+        relation_changes = [
+            diff_relations(ProductAllergen, "product", "allergen", tenant, {row.pk for row in seen[Product].values()}, product_allergens),
+            diff_relations(ProductExtra, "product", "extra", tenant, {row.pk for row in seen[Product].values()}, product_extras),
+            diff_relations(ExtraAllergen, "extra", "allergen", tenant, {row.pk for row in seen[Extra].values()}, extra_allergens),
+        ]
+        diff["relations"]["added"] = sum(len(missing) for _, missing, _ in relation_changes)
+        diff["relations"]["removed"] = sum(len(stale_ids) for _, _, stale_ids in relation_changes)
+        diff["has_changes"] = bool(
+            any(diff["added"].values()) or any(diff["changed"].values())
+            or any(diff["removed"].values()) or any(diff["relations"].values())
+        )
+
+        if dry_run or not diff["has_changes"]:
+            return diff
+
+        for model, rows in new_rows.items():
+            model.objects.bulk_create(rows)
+        for model, rows in updated_rows.items():
+            if rows:
+                model.objects.bulk_update(list(rows.values()), sorted(updated_fields[model]))
+        for model, missing, stale_ids in relation_changes:
+            model.objects.bulk_create(missing)
+            if stale_ids:
+                model.objects.filter(pk__in=stale_ids).delete()
+
+        request_menu_version_bump(tenant.id)  # `bulk_create`/`bulk_update` no emiten señales
+
+    return diff
+
+
+def diff_relations(model, left, right, tenant, synced_ids, desired_pairs):
+    """Filas intermedias que faltan y las que sobran para los elementos sincronizados."""
+    existing = {
+        (left_id, right_id): pk
+        for pk, left_id, right_id in model.objects.filter(**{f"{left}__tenant": tenant}).values_list("pk", f"{left}_id", f"{right}_id")
+    }
+    missing = [
+        model(tenant=tenant, **{f"{left}_id": left_id, f"{right}_id": right_id})
+        for left_id, right_id in desired_pairs if (left_id, right_id) not in existing
+    ]
+    stale_ids = [pk for (left_id, right_id), pk in existing.items() if left_id in synced_ids and (left_id, right_id) not in desired_pairs]
+    return model, missing, stale_ids
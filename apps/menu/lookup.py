@@ -0,0 +1,118 @@
+import re
+import threading
+from difflib import SequenceMatcher
+
+from text_unidecode import unidecode
+
+from apps.menu.models import Extra, Product
+from apps.menu.versioning import get_menu_version
+
+FUZZY_CUTOFF = 0.88  # Similitud mínima para aceptar un nombre aproximado
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def normalize_name(name):
+    """Clave de comparación de nombres: sin tildes (text-unidecode), en minúsculas y con los espacios colapsados."""
+    return " ".join(unidecode(str(name or "")).casefold().split())
+
+
+def singular_key(normalized):
+    """
+    Variante sin plurales simples y sin puntuación, aplicada a ambos lados de la comparación:
+    "cafes con leche" y "cafe con leche" (o "panes" y "pan") dan la misma clave.
+    """
+    return " ".join(_singular_word(word) for word in _NON_ALNUM_RE.sub(" ", normalized).split())
+
+
+def _singular_word(word):
+    if len(word) > 3 and word.endswith("s"):
+        word = word[:-1]
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+class NameIndex:
+    """Índice de filas por nombre normalizado, con variante en singular y búsqueda aproximada acotada."""
+
+    def __init__(self, rows):
+        self._exact = {}
+        self._singular = {}
+        for row in sorted(rows, key=lambda row: str(row.pk)):
+            key = normalize_name(row.name)
+            self._exact.setdefault(key, row)
+            self._singular.setdefault(singular_key(key), row)
+        # 🔹 La búsqueda aproximada solo considera filas disponibles, con sus números ya extraídos
+        self._fuzzy_candidates = [
+            (candidate, _NUMBER_RE.findall(candidate), row)
+            for candidate, row in self._singular.items()
+            if getattr(row, "available", True)
+        ]
+
+    def __len__(self):
+        return len(self._exact)
+
+    def get(self, name):
+        key = normalize_name(name)
+        if not key:
+            return None
+        row = self._exact.get(key) or self._singular.get(singular_key(key))
+        return row if row is not None else self._fuzzy(singular_key(key))
+
+    def _fuzzy(self, key):
+        """
+        Último recurso para erratas ("cafe con lece"): solo compara con nombres disponibles de longitud
+        parecida y con los mismos números ("hamburguesa 300g" no es "hamburguesa 200g"), y exige una
+        similitud alta, así que el coste está acotado y no empareja productos distintos.
+        """
+        max_length_gap = max(2, len(key) // 5)
+        numbers = _NUMBER_RE.findall(key)
+        best, best_ratio = None, FUZZY_CUTOFF
+        for candidate, candidate_numbers, row in self._fuzzy_candidates:
+            if abs(len(candidate) - len(key)) > max_length_gap or candidate_numbers != numbers:
+                continue
+            matcher = SequenceMatcher(None, key, candidate)
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio > best_ratio:
+                best, best_ratio = row, ratio
+        return best
+
+
+class MenuLookup:
+    """Productos y extras del tenant indexados por nombre, para resolver pedidos sin consultas."""
+
+    def __init__(self, products, extras):
+        self.products = NameIndex(products)
+        self.extras = NameIndex(extras)
+
+    def product(self, name):
+        return self.products.get(name)
+
+    def extra(self, name):
+        return self.extras.get(name)
+
+
+_lookups = {}  # tenant_id → (menu_version, MenuLookup)
+_lookups_lock = threading.Lock()
+
+
+def get_menu_lookup(tenant):
+    """
+    Índice de nombres del menú del tenant para su `menu_version` actual. Solo se construye
+    (2 consultas) cuando cambia el menú; el resto de pedidos se resuelven sin tocar la BD.
+    """
+    menu_version = get_menu_version(tenant)
+    cached = _lookups.get(tenant.id)
+    if cached and cached[0] == menu_version:
+        return cached[1]
+
+    lookup = MenuLookup(
+        Product.objects.filter(tenant=tenant).only("id", "tenant_id", "category_id", "name", "price", "available"),
+        Extra.objects.filter(tenant=tenant).only("id", "tenant_id", "name", "price", "available"),
+    )
+    with _lookups_lock:
+        _lookups[tenant.id] = (menu_version, lookup)
+    return lookup
@@ -0,0 +1,99 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.menu.importer import import_menu
+from apps.menu.models import Allergen, Category, Extra, ExtraAllergen, Product, ProductAllergen, ProductExtra
+from apps.tenants.models import Tenant
+
+
+def legacy_import_menu(tenant, data):
+    """Implementación anterior de `MenuUploadView`: `get_or_create` por fila (solo para comparar)."""
+    for category_data in data.get("categories", []):
+        order = category_data.get("order")
+        if not order:
+            last_order = Category.objects.filter(tenant=tenant).aggregate(models.Max("order"))["order__max"] or 0
+            order = last_order + 1
+        category, _ = Category.objects.get_or_create(
+            name=category_data["name"], tenant=tenant,
+            defaults={"description": category_data.get("description", ""), "order": order},
+        )
+        for item in category_data.get("items", []):
+            product, _ = Product.objects.get_or_create(
+                name=item["name"], tenant=tenant,
+                defaults={
+                    "category": category, "description": item.get("description", ""),
+                    "ingredients": ", ".join(item.get("ingredients", [])),
+                    "price": item.get("price", 0), "available": item.get("available", True),
+                },
+            )
+            for allergen_name in item.get("allergens", []):
+                allergen, _ = Allergen.objects.get_or_create(name=allergen_name, tenant=tenant)
+                ProductAllergen.objects.get_or_create(product=product, allergen=allergen, tenant=tenant)
+            for extra_data in item.get("extras", []):
+                extra, _ = Extra.objects.get_or_create(
+                    name=extra_data["name"], tenant=tenant,
+                    defaults={"price": extra_data.get("price", 0), "available": extra_data.get("available", True)},
+                )
+                ProductExtra.objects.get_or_create(product=product, extra=extra, tenant=tenant)
+                for allergen_name in extra_data.get("allergens", []):
+                    allergen, _ = Allergen.objects.get_or_create(name=allergen_name, tenant=tenant)
+                    ExtraAllergen.objects.get_or_create(extra=extra, allergen=allergen, tenant=tenant)
+
+
+def synthetic_menu(items, seed=42):
+    """Exportación de TPV sintética: ~20 productos por categoría, con alérgenos y extras compartidos."""
+    rng = random.Random(seed)
+    allergens = ["Gluten", "Lactosa", "Huevo", "Frutos secos", "Soja", "Pescado", "Mostaza", "Sésamo"]
+    extras = [{"name": f"Extra {i}", "price": round(rng.uniform(0.2, 2), 2), "allergens": rng.sample(allergens, k=1)} for i in range(30)]
+    categories = []
+    for index in range(items):
+        if index % 20 == 0:
+            categories.append({"name": f"Categoría {len(categories) + 1}", "items": []})
+        categories[-1]["items"].append({
+            "name": f"Producto {index}",
+            "description": "Descripción de prueba",
+            "ingredients": ["agua", "harina"],
+            "price": round(rng.uniform(1, 15), 2),
+            "allergens": rng.sample(allergens, k=2),
+            "extras": rng.sample(extras, k=2),
+        })
+    return {"categories": categories}
+
+
+class Command(BaseCommand):
+    help = "Mide la importación de menús (importador por lotes vs legacy) a 100/1.000/10.000 productos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+        parser.add_argument("--legacy", action="store_true", help="Mide también la importación legacy (lenta a 10.000)")
+
+    def handle(self, *args, **options):
+        importers = [("⚡ Por lotes", import_menu)] + ([("🐢 Legacy", legacy_import_menu)] if options["legacy"] else [])
+
+        for size in options["sizes"]:
+            data = synthetic_menu(size)
+            for label, importer in importers:
+                # 🧪 Tenant temporal dentro de una transacción que se deshace al terminar
+                with transaction.atomic():
+                    tenant = Tenant.objects.create(
+                        name=f"Benchmark {uuid.uuid4().hex[:8]}", owner_name="-", phone_number="-",
+                        phone_number_id=uuid.uuid4().hex, whatsapp_access_token="-", nif="-",
+                    )
+                    with CaptureQueriesContext(connection) as queries:
+                        started_at = time.perf_counter()
+                        importer(tenant, data)
+                        elapsed_ms = (time.perf_counter() - started_at) * 1000
+                    reimport_started_at = time.perf_counter()
+                    importer(tenant, data)  # Reimportación: todo existe ya, no debe crear nada
+                    reimport_ms = (time.perf_counter() - reimport_started_at) * 1000
+                    transaction.set_rollback(True)
+
+                self.stdout.write(
+                    f"{label} · {size} productos: {elapsed_ms:.0f} ms, {len(queries)} consultas "
+                    f"(reimportación: {reimport_ms:.0f} ms)"
+                )
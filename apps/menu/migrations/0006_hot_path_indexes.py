@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0005_alter_category_options_alter_category_order'),
+        ('printers', '0002_hot_path_indexes'),
+        ('tenants', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='extra',
+            index=models.Index(fields=['tenant', 'name'], name='extra_tenant_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['tenant', 'name'], name='product_tenant_name_idx'),
+        ),
+    ]
@@ -80,6 +80,9 @@ class Extra(models.Model):
     class Meta:
         verbose_name = "Extra"
         verbose_name_plural = "Extras"
+        indexes = [
+            models.Index(fields=["tenant", "name"], name="extra_tenant_name_idx"),  # Importación del menú
+        ]
 
 # Tabla intermedia para Extras y Alérgenos
 class ExtraAllergen(models.Model):
@@ -141,3 +144,6 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
+        indexes = [
+            models.Index(fields=["tenant", "name"], name="product_tenant_name_idx"),  # Importación del menú
+        ]
@@ -1,43 +1,65 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
 from apps.menu.models import Category, Product, Extra, Allergen
+from apps.menu.versioning import get_menu_version
+
+MENU_CACHE_KEY = "menu_data:{tenant_id}:{menu_version}"
+
 
 def get_menu_data(tenant):
-    menu_data = []
-    
-    # 🔹 Obtener el total de categorías activas utilizando el método de clase
-    total_categories = Category.get_total_categories(tenant)
+    """
+    Menú activo del tenant en el formato que consume el asistente.
+    Se materializa una vez y se cachea por tenant y `menu_version`: las señales de `apps.menu.signals`
+    incrementan la versión en cuanto cambia cualquier categoría, producto, extra o alérgeno.
+    """
+    key = MENU_CACHE_KEY.format(tenant_id=tenant.id, menu_version=get_menu_version(tenant))
+    menu_data = cache.get(key)
+    if menu_data is None:
+        menu_data = build_menu_data(tenant)
+        cache.set(key, menu_data, settings.MENU_CACHE_TTL)
+    return menu_data
+
+
+def build_menu_data(tenant):
+    """Construye el menú con 4 consultas (categorías, productos, extras y alérgenos), sin N+1."""
+    products = (
+        Product.objects.filter(tenant=tenant, available=True)
+        .only("id", "category_id", "name", "description", "price", "available")
+        .prefetch_related(
+            Prefetch("extras", queryset=Extra.objects.filter(available=True).only("id", "name", "price", "available")),
+            Prefetch("allergens", queryset=Allergen.objects.only("id", "name")),
+        )
+    )
 
     # 🔹 Filtrar categorías activas y ordenarlas correctamente
-    categories = Category.objects.filter(tenant=tenant, is_active=True).order_by("order")
-    
+    categories = list(
+        Category.objects.filter(tenant=tenant, is_active=True)
+        .order_by("order")
+        .only("id", "name", "order")
+        .prefetch_related(Prefetch("products", queryset=products))
+    )
+    total_categories = len(categories)  # 🔹 Mismo filtro que `Category.get_total_categories`
+
+    menu_data = []
     for category in categories:
-        category_data = {
+        menu_data.append({
             "category": category.name,
             "order": category.order,
-            "total_categories": total_categories,  # 🔹 Se obtiene desde el método de clase
-            "items": []
-        }
-
-        # 🔹 Obtener productos activos de la categoría
-        products = Product.objects.filter(category=category, tenant=tenant, available=True)
-        
-        for product in products:
-            # 🔹 Obtener extras relacionados con el producto
-            extras = Extra.objects.filter(productextra__product=product, available=True)
-            
-            # 🔹 Obtener alérgenos relacionados con el producto
-            allergens = Allergen.objects.filter(productallergen__product=product)
-
-            product_data = {
-                "name": product.name,
-                "description": product.description,
-                "price": product.price,
-                "available": product.available,
-                "extras": [{"name": extra.name, "price": extra.price, "available": extra.available} for extra in extras],
-                "allergens": [allergen.name for allergen in allergens]
-            }
-            
-            category_data["items"].append(product_data)
-
-        menu_data.append(category_data)
+            "total_categories": total_categories,
+            "items": [
+                {
+                    "name": product.name,
+                    "description": product.description,
+                    "price": product.price,
+                    "available": product.available,
+                    "extras": [{"name": extra.name, "price": extra.price, "available": extra.available} for extra in product.extras.all()],
+                    "allergens": [allergen.name for allergen in product.allergens.all()],
+                }
+                for product in category.products.all()
+            ],
+        })
 
     return {"menu": menu_data}
+
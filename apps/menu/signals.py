@@ -0,0 +1,25 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .models import Allergen, Category, Extra, ExtraAllergen, Product, ProductAllergen, ProductExtra
+from .versioning import request_menu_version_bump
+
+# 🔹 Cualquier cambio en estos modelos altera el menú del tenant (y todo lo que se cachea a partir de él)
+MENU_MODELS = (Category, Product, Extra, Allergen, ProductExtra, ProductAllergen, ExtraAllergen)
+
+
+def menu_changed(sender, instance, **kwargs):
+    request_menu_version_bump(getattr(instance, "tenant_id", None))
+
+
+def menu_relations_changed(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        request_menu_version_bump(getattr(instance, "tenant_id", None))
+
+
+def connect_menu_signals():
+    for model in MENU_MODELS:
+        post_save.connect(menu_changed, sender=model, dispatch_uid=f"menu_version_save_{model.__name__}")
+        post_delete.connect(menu_changed, sender=model, dispatch_uid=f"menu_version_delete_{model.__name__}")
+
+    for through in (Product.extras.through, Product.allergens.through, Extra.allergens.through):
+        m2m_changed.connect(menu_relations_changed, sender=through, dispatch_uid=f"menu_version_m2m_{through.__name__}")
@@ -0,0 +1,73 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from apps.menu.models import Product
+from apps.menu.versioning import request_menu_version_bump
+
+
+class OutOfStockError(ValueError):
+    """No queda stock suficiente de algún producto del pedido; `products` son sus nombres."""
+
+    def __init__(self, products):
+        self.products = products
+        super().__init__(f"Sin stock suficiente: {', '.join(products)}")
+
+
+def order_quantities(items):
+    """Unidades por producto de `(product_id, quantity)`, sumando las líneas repetidas."""
+    quantities = Counter()
+    for product_id, quantity in items:
+        quantities[product_id] += quantity
+    return quantities
+
+
+def reserve_stock(tenant_id, quantities):
+    """
+    Descuenta `quantities` (`{product_id: unidades}`) del stock con un `UPDATE ... WHERE stock >= n`
+    por producto: la comprobación y el descuento son una sola sentencia, así que dos pedidos a la vez
+    nunca venden la misma unidad. Los productos sin stock controlado (`stock` nulo) no se tocan.
+    Si alguno no alcanza, no se descuenta nada y se lanza `OutOfStockError`.
+    """
+    with transaction.atomic():
+        short = [
+            product_id
+            for product_id, quantity in sorted(quantities.items(), key=lambda item: str(item[0]))  # Orden fijo: sin interbloqueos
+            if not Product.objects.filter(Q(stock__isnull=True) | Q(stock__gte=quantity), pk=product_id)
+            .update(stock=F("stock") - quantity)
+        ]
+        if short:
+            names = list(Product.objects.filter(pk__in=short).values_list("name", flat=True))
+            transaction.set_rollback(True)
+            raise OutOfStockError(names)
+
+        # 🔴 Agotados: dejan de ofrecerse y se invalida lo derivado del menú
+        if Product.objects.filter(pk__in=quantities, stock=0, available=True).update(available=False):
+            print(f"🔴 Productos agotados marcados como no disponibles (tenant {tenant_id})", flush=True)
+            transaction.on_commit(lambda: request_menu_version_bump(tenant_id))
+
+
+def release_stock(tenant_id, quantities):
+    """
+    Devuelve al stock las unidades de `quantities`. Los productos que el pedido había agotado
+    (estaban a 0 y no disponibles) vuelven a estar disponibles.
+    """
+    with transaction.atomic():
+        restocked = False
+        for product_id, quantity in sorted(quantities.items(), key=lambda item: str(item[0])):
+            current = (
+                Product.objects.select_for_update()
+                .filter(pk=product_id, stock__isnull=False)
+                .values_list("stock", "available")
+                .first()
+            )
+            if current is None:
+                continue
+            sold_out = current == (0, False)
+            Product.objects.filter(pk=product_id).update(stock=F("stock") + quantity, **({"available": True} if sold_out else {}))
+            restocked = restocked or sold_out
+
+        if restocked:
+            print(f"🟢 Productos repuestos vuelven a estar disponibles (tenant {tenant_id})", flush=True)
+            transaction.on_commit(lambda: request_menu_version_bump(tenant_id))
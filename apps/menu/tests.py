@@ -1,3 +1,300 @@
-from django.test import TestCase
-
-# Create your tests here.
+import json
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.menu.dietary import filter_menu
+from apps.menu.importer import MenuImportError, import_menu, sync_menu
+from apps.menu.lookup import NameIndex
+from apps.menu.models import Allergen, Category, Extra, Product, ProductAllergen, ProductExtra
+from apps.menu.services import build_menu_data
+from apps.menu.stock import OutOfStockError, release_stock, reserve_stock
+from apps.menu.versioning import bump_menu_version, request_menu_version_bump
+from apps.tenants.models import Tenant
+
+
+def retry_while_locked(func):
+    """
+    Ejecuta `func` reintentando si la BD está bloqueada: la BD de test de SQLite (en memoria) no admite
+    escritores concurrentes y falla en vez de esperar. En PostgreSQL no se reintenta nunca.
+    """
+    while True:
+        try:
+            return func()
+        except OperationalError as e:
+            if connection.vendor != "sqlite" or "locked" not in str(e):
+                raise
+            time.sleep(0.005)
+
+
+def create_tenant(name="Bar Test"):
+    return Tenant.objects.create(
+        name=name, owner_name="-", phone_number="34600000000", phone_number_id=f"{name}-id",
+        whatsapp_access_token="-", nif="-",
+    )
+
+
+class BuildMenuDataTests(TestCase):
+    def setUp(self):
+        self.tenant = create_tenant()
+        gluten = Allergen.objects.create(tenant=self.tenant, name="Gluten")
+        milk = Allergen.objects.create(tenant=self.tenant, name="Lácteos")
+        extras = [
+            Extra.objects.create(tenant=self.tenant, name="Queso", price=1),
+            Extra.objects.create(tenant=self.tenant, name="Bacon", price=1.5),
+            Extra.objects.create(tenant=self.tenant, name="Trufa", price=3, available=False),
+        ]
+        for order, name in enumerate(["Hamburguesas", "Cafés", "Postres"], start=1):
+            category = Category.objects.create(tenant=self.tenant, name=name, order=order)
+            for number in range(4):
+                product = Product.objects.create(
+                    tenant=self.tenant, category=category, name=f"{name} {number}", price=5, ingredients="-",
+                    available=number != 3,
+                )
+                for extra in extras:
+                    ProductExtra.objects.create(tenant=self.tenant, product=product, extra=extra)
+                for allergen in (gluten, milk):
+                    ProductAllergen.objects.create(tenant=self.tenant, product=product, allergen=allergen)
+        Category.objects.create(tenant=self.tenant, name="Fuera de carta", order=9, is_active=False)
+
+    def test_menu_is_built_with_a_fixed_number_of_queries(self):
+        # Categorías, productos, extras y alérgenos: una consulta cada uno, sin importar el tamaño de la carta
+        with self.assertNumQueries(4):
+            menu = build_menu_data(self.tenant)["menu"]
+
+        self.assertEqual([category["category"] for category in menu], ["Hamburguesas", "Cafés", "Postres"])
+        items = menu[0]["items"]
+        self.assertEqual(len(items), 3)  # El producto no disponible no sale
+        self.assertCountEqual([extra["name"] for extra in items[0]["extras"]], ["Queso", "Bacon"])
+        self.assertCountEqual(items[0]["allergens"], ["Gluten", "Lácteos"])
+
+
+def menu_document(products=3, **overrides):
+    """Documento de menú del TPV: una categoría de cafés con `products` productos, extras y alérgenos."""
+    items = [
+        {
+            "name": f"Café {number}", "price": 1.5, "allergens": ["Lácteos"],
+            "extras": [{"name": "Leche de avena", "price": 0.3}, {"name": f"Sirope {number}", "price": 0.5}],
+        }
+        for number in range(products)
+    ]
+    items.append({"name": "Tostada", "price": {"media": 1.8, "entera": 2.5}, "allergens": ["Gluten"]})
+    for item in items:
+        item.update(overrides.get(item["name"], {}))
+    return {"categories": [{"name": "Desayunos", "items": [item for item in items if item.get("name")]}]}
+
+
+class MenuImportTests(TestCase):
+    def setUp(self):
+        self.tenant = create_tenant()
+
+    def test_import_runs_a_few_set_based_queries_whatever_the_menu_size(self):
+        query_counts = []
+        for products in (5, 50):
+            tenant = create_tenant(f"Bar {products}")
+            with CaptureQueriesContext(connection) as queries:
+                import_menu(tenant, menu_document(products))
+            query_counts.append(len(queries))
+
+        # Consultas por conjunto: 10 veces más productos no añaden consultas (salvo algún lote más de `bulk_create`)
+        self.assertLessEqual(query_counts[1], query_counts[0] + 2)
+        self.assertEqual(Product.objects.filter(tenant=tenant).count(), 52)  # Tostada media y entera
+        self.assertEqual(ProductExtra.objects.filter(product__tenant=tenant).count(), 100)
+
+    def test_reimporting_creates_nothing_and_an_invalid_document_writes_nothing(self):
+        created = import_menu(self.tenant, menu_document())
+        self.assertEqual(
+            created, {"categories": 1, "products": 5, "allergens": 2, "extras": 4, "relations": 11},
+        )
+        self.assertEqual(set(import_menu(self.tenant, menu_document()).values()), {0})
+
+        with self.assertRaises(MenuImportError):
+            import_menu(create_tenant("Otro bar"), menu_document(**{"Tostada": {"price": "gratis"}}))
+        self.assertFalse(Category.objects.filter(tenant__name="Otro bar").exists())
+
+    def test_upload_view_imports_the_document(self):
+        response = self.client.post(
+            reverse("upload_menu"), json.dumps({"tenant_id": str(self.tenant.id), **menu_document()}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"]["products"], 5)
+
+
+class MenuSyncTests(TestCase):
+    def setUp(self):
+        self.tenant = create_tenant()
+        import_menu(self.tenant, menu_document())
+
+    def menu_version(self):
+        return Tenant.objects.get(pk=self.tenant.pk).menu_version
+
+    def test_sync_applies_only_the_diff_and_bumps_the_version_once(self):
+        version = self.menu_version()
+        document = menu_document(**{"Café 0": {"price": 1.8}, "Café 2": {"name": None}})
+        document["categories"][0]["items"].append({"name": "Zumo de naranja", "price": 2.5})
+
+        diff = sync_menu(self.tenant, document)
+
+        self.assertEqual(diff["added"]["products"], ["Zumo de naranja"])
+        self.assertEqual(diff["changed"]["products"], {"Café 0": {"price": [Decimal("1.50"), Decimal("1.8")]}})
+        self.assertEqual(diff["removed"]["products"], ["Café 2"])
+        self.assertEqual(diff["removed"]["extras"], ["Sirope 2"])
+        self.assertEqual(Product.objects.get(tenant=self.tenant, name="Café 0").price, Decimal("1.80"))
+        self.assertFalse(Product.objects.get(tenant=self.tenant, name="Café 2").available)  # Retirado, no borrado
+        self.assertEqual(self.menu_version(), version + 1)
+
+    def test_unchanged_document_and_dry_run_leave_the_catalog_and_version_alone(self):
+        version = self.menu_version()
+        self.assertFalse(sync_menu(self.tenant, menu_document())["has_changes"])
+
+        diff = sync_menu(self.tenant, menu_document(**{"Café 0": {"available": False}}), dry_run=True)
+        self.assertEqual(diff["changed"]["products"], {"Café 0": {"available": [True, False]}})
+        self.assertTrue(Product.objects.get(tenant=self.tenant, name="Café 0").available)
+        self.assertEqual(self.menu_version(), version)
+
+
+class PublicMenuViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["local"].clear()
+        self.tenant = create_tenant()
+        category = Category.objects.create(tenant=self.tenant, name="Cafés")
+        Product.objects.create(tenant=self.tenant, category=category, name="Café con leche", price=1.5, ingredients="-")
+        self.url = reverse("public_menu", args=[self.tenant.id])
+
+    def test_conditional_get_is_answered_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Café con leche")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_when_the_menu_version_is_bumped(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        bump_menu_version([self.tenant.id])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class DietaryFilterTests(TestCase):
+    def setUp(self):
+        self.tenant = create_tenant()
+        category = Category.objects.create(tenant=self.tenant, name="Platos")
+        gluten = Allergen.objects.create(tenant=self.tenant, name="Gluten")
+        milk = Allergen.objects.create(tenant=self.tenant, name="Lácteos")
+
+        def product(name, gluten_free, *allergens):
+            created = Product.objects.create(
+                tenant=self.tenant, category=category, name=name, price=5, ingredients="-", gluten_free=gluten_free,
+            )
+            for allergen in allergens:
+                ProductAllergen.objects.create(tenant=self.tenant, product=created, allergen=allergen)
+
+        product("Ensalada", True)
+        product("Tortilla", None)  # Sin marcar: no se sabe si lleva gluten
+        product("Pan", False, gluten)
+        product("Croquetas", True, gluten)  # Marcado por error: el alérgeno declarado manda
+        product("Risotto", True, milk)
+        self.tenant.refresh_from_db()
+
+    def names(self, **filters):
+        return [product["name"] for product in filter_menu(self.tenant, **filters)["products"]]
+
+    def test_gluten_free_only_includes_products_explicitly_marked_without_the_allergen(self):
+        self.assertEqual(self.names(diets=["sin_gluten"]), ["Ensalada", "Risotto"])
+        self.assertEqual(self.names(allergens=["gluten"]), ["Ensalada", "Risotto"])
+
+    def test_excluded_allergens_combine(self):
+        self.assertEqual(self.names(allergens=["Gluten", "lacteos"]), ["Ensalada"])
+        self.assertEqual(self.names(allergens=["Lácteos"]), ["Croquetas", "Ensalada", "Pan", "Tortilla"])
+
+
+class NameIndexFuzzyTests(SimpleTestCase):
+    def index(self, *rows):
+        return NameIndex(SimpleNamespace(pk=number, name=name, available=available) for number, (name, available) in enumerate(rows))
+
+    def test_typos_match_but_different_numbers_do_not(self):
+        index = self.index(("Hamburguesa 200g", True))
+        self.assertEqual(index.get("hamburgesa 200g").name, "Hamburguesa 200g")
+        self.assertIsNone(index.get("hamburguesa 300g"))
+
+    def test_unavailable_products_are_not_fuzzy_matched(self):
+        index = self.index(("Café con leche", False), ("Tostada", True))
+        self.assertIsNone(index.get("cafe con lece"))
+        self.assertEqual(index.get("Café con leche").name, "Café con leche")  # El nombre exacto sí se resuelve
+        self.assertEqual(index.get("tostda").name, "Tostada")
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    """Reservas concurrentes con conexiones propias (sin la transacción envolvente de `TestCase`)."""
+
+    STOCK = 20
+    BUYERS = 50
+
+    def test_concurrent_reservations_never_oversell(self):
+        tenant = create_tenant()
+        category = Category.objects.create(tenant=tenant, name="Pruebas")
+        product = Product.objects.create(
+            tenant=tenant, category=category, name="Producto limitado", price=1, ingredients="-", stock=self.STOCK,
+        )
+        initial_version = Tenant.objects.get(pk=tenant.pk).menu_version
+
+        results = Counter()
+        results_lock = threading.Lock()
+        start = threading.Barrier(self.BUYERS)
+
+        def reserve():
+            try:
+                reserve_stock(tenant.id, {product.pk: 1})
+                return "reserved"
+            except OutOfStockError:
+                return "out_of_stock"
+
+        def buy():
+            start.wait()
+            try:
+                outcome = retry_while_locked(reserve)
+            except Exception as e:
+                outcome = f"error: {e}"
+            finally:
+                connection.close()
+            with results_lock:
+                results[outcome] += 1
+
+        # 🔹 El incremento de versión corre tras el commit: un bloqueo ahí no debe repetir una reserva ya hecha
+        with mock.patch(
+            "apps.menu.stock.request_menu_version_bump",
+            side_effect=lambda tenant_id: retry_while_locked(lambda: request_menu_version_bump(tenant_id)),
+        ):
+            threads = [threading.Thread(target=buy) for _ in range(self.BUYERS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(results, {"reserved": self.STOCK, "out_of_stock": self.BUYERS - self.STOCK})
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertFalse(product.available)  # Agotado: deja de ofrecerse
+        self.assertNotEqual(Tenant.objects.get(pk=tenant.pk).menu_version, initial_version)
+
+        # 🔁 Liberar una unidad (pago fallido/cancelación) lo repone y lo vuelve a ofrecer
+        release_stock(tenant.id, {product.pk: 1})
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 1)
+        self.assertTrue(product.available)
@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import MenuUploadView
+from .views import MenuUploadView, public_menu_view
 
 urlpatterns = [
     path('upload-menu/', MenuUploadView.as_view(), name='upload_menu'),
+    path('<uuid:tenant_id>/', public_menu_view, name='public_menu'),
+    path('<uuid:tenant_id>.json', public_menu_view, {'fmt': 'json'}, name='public_menu_json'),
 ]
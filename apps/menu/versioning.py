@@ -0,0 +1,81 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.tenants.models import Tenant
+
+ALL_TENANTS = "*"  # Cambio en un elemento sin tenant (p. ej. un alérgeno global)
+MENU_STATE_CACHE_KEY = "menu_state:{tenant_id}"
+
+_coalescing = threading.local()
+
+
+def get_menu_version(tenant):
+    """
+    Versión del menú del tenant, para usarla en las claves de caché de todo lo derivado del menú.
+    Con la instancia ya cargada (p. ej. la del `TurnContext`) no hace ninguna consulta.
+    """
+    if isinstance(tenant, Tenant):
+        return tenant.menu_version
+    return Tenant.objects.filter(pk=tenant).values_list("menu_version", flat=True).first() or 0
+
+
+def get_menu_state(tenant_id):
+    """
+    `{"name", "menu_version", "menu_updated_at"}` del tenant (o None si no existe o no está activo),
+    cacheado en memoria del proceso para que las peticiones condicionales a la carta pública se respondan
+    sin consultar la BD. Cada incremento borra la entrada; `MENU_STATE_CACHE_TTL` acota el retraso en el
+    resto de procesos.
+    """
+    cache = caches["local"]
+    key = MENU_STATE_CACHE_KEY.format(tenant_id=tenant_id)
+    state = cache.get(key)
+    if state is None:
+        state = (
+            Tenant.objects.filter(pk=tenant_id, is_active=True)
+            .values("name", "menu_version", "menu_updated_at")
+            .first()
+        ) or {}
+        cache.set(key, state, settings.MENU_STATE_CACHE_TTL)
+    return state or None
+
+
+def bump_menu_version(tenant_ids=None):
+    """Incrementa `menu_version` (de los tenants indicados o de todos) y olvida su estado cacheado."""
+    Tenant.bump_menu_version(tenant_ids)
+    if tenant_ids is None:
+        tenant_ids = Tenant.objects.values_list("id", flat=True)
+    caches["local"].delete_many([MENU_STATE_CACHE_KEY.format(tenant_id=tenant_id) for tenant_id in tenant_ids])
+
+
+def request_menu_version_bump(tenant_id):
+    """Marca el menú del tenant como cambiado: al momento o, dentro de `coalesce_menu_version_bumps`, al salir."""
+    pending = getattr(_coalescing, "tenant_ids", None)
+    if pending is not None:
+        pending.add(tenant_id if tenant_id is not None else ALL_TENANTS)
+        return
+    bump_menu_version(None if tenant_id is None else [tenant_id])
+
+
+@contextmanager
+def coalesce_menu_version_bumps():
+    """
+    Agrupa los cambios de menú de un bloque (importación, edición masiva con `list_editable`...)
+    en un único incremento por tenant, en lugar de uno por fila guardada.
+    """
+    if getattr(_coalescing, "tenant_ids", None) is not None:
+        yield  # Ya hay un bloque abierto más arriba: él se encarga del incremento
+        return
+
+    _coalescing.tenant_ids = set()
+    try:
+        yield
+    finally:
+        tenant_ids = _coalescing.tenant_ids
+        _coalescing.tenant_ids = None
+        if ALL_TENANTS in tenant_ids:
+            bump_menu_version()
+        elif tenant_ids:
+            bump_menu_version(tenant_ids)
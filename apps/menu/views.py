@@ -1,22 +1,21 @@
 import json
-from django.db import models
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_safe
 from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
 
 from apps.tenants.models import Tenant
-from .models import (
-    Allergen,
-    Category,
-    Extra,
-    ExtraAllergen,
-    Product,
-    ProductAllergen,
-    ProductExtra,
-)
+from .importer import MenuImportError, import_menu, sync_menu
+from .services import get_menu_data
+from .versioning import get_menu_state
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -33,83 +32,71 @@ class MenuUploadView(View):
             except Tenant.DoesNotExist:
                 return JsonResponse({'error': 'Tenant no encontrado'}, status=404)
 
-            for category_data in data.get('categories', []):
-                # 🔹 Obtener el orden si está presente, de lo contrario, asignar el siguiente número disponible
-                order = category_data.get('order')  # Si existe en el JSON, lo toma
-                if not order:  # Si no existe, asignar el siguiente número secuencial
-                    last_order = Category.objects.filter(tenant=tenant).aggregate(models.Max("order"))["order__max"] or 0
-                    order = last_order + 1
-
-                category, _ = Category.objects.get_or_create(
-                    name=category_data['name'],
-                    tenant=tenant,
-                    defaults={
-                        "description": category_data.get("description", ""),
-                        "order": order  # ✅ Siempre tendrá un número válido
-                    }
-                )
-
-                for item in category_data.get('items', []):
-                    price_data = item.get('price', 0)
-
-                    # Si el precio es un diccionario (ej: {"half": 2.5, "full": 4.5})
-                    if isinstance(price_data, dict):
-                        for size, price in price_data.items():
-                            product_name = f"{item['name']} ({size.capitalize()})"
-                            product, _ = Product.objects.get_or_create(
-                                name=product_name,
-                                tenant=tenant,
-                                defaults={
-                                    'category': category,
-                                    'description': item.get('description', ''),
-                                    'ingredients': ", ".join(item.get('ingredients', [])),
-                                    'price': price,
-                                    'available': item.get('available', True)
-                                }
-                            )
-                            process_allergens_and_extras(item, product, tenant)
-
-                    # Si el precio es un número normal
-                    else:
-                        product, _ = Product.objects.get_or_create(
-                            name=item['name'],
-                            tenant=tenant,
-                            defaults={
-                                'category': category,
-                                'description': item.get('description', ''),
-                                'ingredients': ", ".join(item.get('ingredients', [])),
-                                'price': price_data,
-                                'available': item.get('available', True)
-                            }
-                        )
-                        process_allergens_and_extras(item, product, tenant)
-
-            return JsonResponse({'status': 'Menú importado exitosamente'}, status=201)
+            # 🔄 Sincronización con el TPV: aplica solo el diff y lo devuelve
+            if data.get('mode') == 'sync':
+                diff = sync_menu(tenant, data, dry_run=bool(data.get('dry_run')))
+                return JsonResponse({'status': 'Menú sincronizado', 'diff': diff}, status=200)
+
+            # 📥 Importación por lotes y en una sola transacción
+            created = import_menu(tenant, data)
+            return JsonResponse({'status': 'Menú importado exitosamente', 'created': created}, status=201)
 
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except MenuImportError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
-def process_allergens_and_extras(item, product, tenant):
-    # Procesar alérgenos y guardar en ProductAllergen
-    for allergen_name in item.get('allergens', []):
-        allergen, _ = Allergen.objects.get_or_create(name=allergen_name, tenant=tenant)
-        ProductAllergen.objects.get_or_create(product=product, allergen=allergen, tenant=tenant)
-
-    # Procesar extras y guardar en ProductExtra y ExtraAllergen
-    for extra_data in item.get('extras', []):
-        extra, _ = Extra.objects.get_or_create(
-            name=extra_data['name'],
-            tenant=tenant,
-            defaults={
-                'price': extra_data.get('price', 0),
-                'available': extra_data.get('available', True)
-            }
-        )
-        ProductExtra.objects.get_or_create(product=product, extra=extra, tenant=tenant)
-
-        # Si el extra tiene alérgenos
-        for allergen_name in extra_data.get('allergens', []):
-            allergen, _ = Allergen.objects.get_or_create(name=allergen_name, tenant=tenant)
-            ExtraAllergen.objects.get_or_create(extra=extra, allergen=allergen, tenant=tenant)
+
+# 🌐 **Carta pública del tenant (HTML y JSON)**
+PUBLIC_MENU_CACHE_KEY = "public_menu:{tenant_id}:{menu_version}:{fmt}"
+
+
+def public_menu_state(request, tenant_id):
+    """Estado del menú leído una sola vez por petición (lo usan el ETag, el Last-Modified y la vista)."""
+    if not hasattr(request, "_menu_state"):
+        request._menu_state = get_menu_state(tenant_id)
+    return request._menu_state
+
+
+def public_menu_etag(request, tenant_id, fmt="html"):
+    state = public_menu_state(request, tenant_id)
+    return f'"{tenant_id}-{state["menu_version"]}-{fmt}"' if state else None
+
+
+def public_menu_last_modified(request, tenant_id, fmt="html"):
+    state = public_menu_state(request, tenant_id)
+    return state["menu_updated_at"] if state else None
+
+
+@gzip_page
+@require_safe
+@condition(etag_func=public_menu_etag, last_modified_func=public_menu_last_modified)
+def public_menu_view(request, tenant_id, fmt="html"):
+    """
+    Carta de solo lectura del tenant, renderizada desde el menú cacheado. ETag y Last-Modified salen
+    de `menu_version`, así que una petición condicional se responde con 304 sin tocar la BD, y la
+    respuesta completa se cachea por versión y formato.
+    """
+    state = public_menu_state(request, tenant_id)
+    if not state:
+        raise Http404("Carta no encontrada")
+
+    key = PUBLIC_MENU_CACHE_KEY.format(tenant_id=tenant_id, menu_version=state["menu_version"], fmt=fmt)
+    body = cache.get(key)
+    if body is None:
+        tenant = Tenant.objects.get(pk=tenant_id)
+        menu = get_menu_data(tenant)["menu"]
+        if fmt == "json":
+            body = json.dumps(
+                {"tenant": tenant.name, "menu_version": tenant.menu_version, "menu": menu},
+                cls=DjangoJSONEncoder, ensure_ascii=False,
+            )
+        else:
+            body = render_to_string("menu/public_menu.html", {"tenant_name": tenant.name, "menu": menu})
+        cache.set(key, body, settings.MENU_CACHE_TTL)
+
+    response = HttpResponse(body, content_type="application/json" if fmt == "json" else "text/html; charset=utf-8")
+    response["Cache-Control"] = "public, max-age=60"
+    return response
@@ -42,6 +42,12 @@ class OrderAdmin(admin.ModelAdmin):
 
     inlines = [OrderItemInline]  # ✅ Ahora los `OrderItem` aparecen dentro del pedido
 
+    def save_model(self, request, obj, form, change):
+        """Al cancelar un pedido desde su ficha, devolver también su stock reservado."""
+        super().save_model(request, obj, form, change)
+        if obj.status in ("CANCELLED", "FAILED") and obj.stock_reserved and obj.payment_status != "PAID":
+            obj.release_stock()
+
     def formatted_items(self, obj):
         """
         Muestra los productos del pedido en una segunda línea en la lista de pedidos.
@@ -76,9 +82,12 @@ class OrderAdmin(admin.ModelAdmin):
     mark_as_completed.short_description = "✅ Mark as Completed"
 
     def mark_as_cancelled(self, request, queryset):
-        """Acción para marcar pedidos como cancelados."""
+        """Acción para marcar pedidos como cancelados (y devolver el stock de los que lo tienen reservado sin pagar)."""
         queryset.update(status="CANCELLED")
-        self.message_user(request, "Selected orders have been marked as cancelled.")
+        released = sum(
+            order.release_stock() for order in queryset.filter(stock_reserved=True).exclude(payment_status="PAID")
+        )
+        self.message_user(request, f"Selected orders have been marked as cancelled ({released} with reserved stock returned).")
     mark_as_cancelled.short_description = "❌ Mark as Cancelled"
 
 @admin.register(OrderItem)
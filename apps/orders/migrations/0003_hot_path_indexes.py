@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_hot_path_indexes'),
+        ('orders', '0002_order_stock_reserved'),
+        ('tenants', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['tenant', 'payment_status', 'created_at'], name='order_tenant_paystatus_idx'),
+        ),
+    ]
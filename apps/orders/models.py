@@ -1,8 +1,9 @@
 import uuid
 
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
 
+from apps.menu.stock import order_quantities, release_stock
 from apps.tenants.models import Tenant
 from django.core.exceptions import ValidationError
 
@@ -128,6 +129,10 @@ class Order(models.Model):
         default='PENDING',
         verbose_name="Order Status"
     )
+    stock_reserved = models.BooleanField(
+        default=False,
+        verbose_name="Stock Reserved?"
+    )  # 📦 Sus unidades están descontadas del stock (se devuelven si se cancela o falla el pago)
     created_at = models.DateTimeField(
         auto_now_add=True, 
         verbose_name="Order Created At"
@@ -156,10 +161,34 @@ class Order(models.Model):
         """Calcula el total con impuestos y descuentos aplicados."""
         return self.total_price + self.tax_amount - self.discount
 
+    def release_stock(self):
+        """
+        Devuelve al stock las unidades de un pedido cancelado o con el pago fallido. Solo las devuelve
+        quien cambia `stock_reserved` (en la misma transacción), así que llamarlo dos veces, o desde
+        dos sitios a la vez, no repone el stock dos veces. Un pedido pagado ya ha vendido sus unidades
+        y no devuelve nada. Devuelve True si ha devuelto algo.
+        """
+        with transaction.atomic():
+            released = (
+                Order.objects.filter(pk=self.pk, stock_reserved=True)
+                .exclude(payment_status="PAID")
+                .update(stock_reserved=False)
+            )
+            if not released:
+                return False
+            self.stock_reserved = False
+            release_stock(self.tenant_id, order_quantities(self.items.values_list("product_id", "quantity")))
+        print(f"📦 Stock del pedido {self.order_number} devuelto", flush=True)
+        return True
+
     class Meta:
         verbose_name = "Order"
         verbose_name_plural = "Orders"
         ordering = ["-created_at"]
+        indexes = [
+            # 🔹 Pedidos del tenant por estado de pago y fecha (ingresos, listados del admin)
+            models.Index(fields=["tenant", "payment_status", "created_at"], name="order_tenant_paystatus_idx"),
+        ]
 
 
 class OrderItem(models.Model):
@@ -4,17 +4,17 @@ import threading
 from decimal import Decimal
 
 # Django imports
+from django.db import transaction
 from django.utils import timezone
 
 # Local imports
-from apps.menu.models import Extra, Product
+from apps.menu.lookup import get_menu_lookup
+from apps.menu.stock import OutOfStockError, order_quantities, reserve_stock
 from apps.orders.models import Order, OrderItem
 from apps.payments.models import Payment
 from apps.payments.services import generate_payment_link
 from apps.payments.utils import send_order_email
 from apps.payments.views import process_successful_payment
-from apps.vip.utils import is_vip
-from apps.whatsapp.models import WhatsAppContact
 from apps.whatsapp.utils import (
     send_promotion_opt_in_message,
     send_whatsapp_message,
@@ -25,96 +25,120 @@ def generate_order_number():
     print(f"🔢 Número de pedido generado: {number_generated}", flush=True)
     return number_generated  # Convierte UUID a número y toma 12 dígitos
 
-def save_order_to_db(order_data, session):
-    print(f"🔍 Guardando pedido: {order_data}", flush=True)
-    try:
-        order = Order.objects.create(
-            tenant=session.tenant,
-            phone_number=session.phone_number,
-            chat_session=session.chat_session,
-            table_number=order_data.get('table_number'),
-            notes=order_data.get('notes', ''),
-            order_number=generate_order_number(),
-            status='PENDING',
-            delivery_type=order_data.get('delivery_type', 'DINE_IN'),
-            payment_status='PENDING',
-            discount=Decimal(order_data.get('discount', 0.00)),
-            tax_amount=Decimal(order_data.get('tax_amount', 0.00)),
-            is_scheduled=False,
-        )
-        print(f"📝 Pedido creado: {order}", flush=True)
-
-        total_price = Decimal('0.00') 
-
-        for item in order_data.get('order_items', []):
-            print(f"🍔 Procesando ítem: {item}", flush=True)
-            product_name = item.get('product_name')
-            quantity = item.get('quantity', 1)
-            unit_price = Decimal(str(item.get('unit_price', 0.00)))
-            extras_data = item.get('extras', [])
-            exclusions = item.get('exclusions', [])
-            special_instructions = item.get('special_instructions', '')
-            item_discount = Decimal(str(item.get('discount', 0.00)))
-            item_tax = Decimal(str(item.get('tax_amount', 0.00)))
-
-            try:
-                product = Product.objects.get(name__iexact=product_name, tenant=session.tenant)
-            except Product.DoesNotExist:
-                print(f"❌ Producto no encontrado: {product_name}", flush=True)
-                continue
-
-            extras_list = []
-            for extra_data in extras_data:
-                extra_name = extra_data.get('name')
-                extra_price = Decimal(str(extra_data.get('price', 0.00)))
-
-                extra = Extra.objects.filter(name__iexact=extra_name, tenant=session.tenant).first()
-                
-                if extra:
-                    extras_list.append({"name": extra.name, "price": float(extra_price)})
-                else:
-                    print(f"❌ Extra no encontrado: {extra_name}", flush=True)
-            
-            # 🚀 Obtener el contacto del usuario de manera segura
-            contact = WhatsAppContact.objects.filter(phone_number=session.phone_number, tenants=session.tenant).first()
-            is_first_buy = contact.first_buy if contact else False
-
-            # ✅ Solo permitir precio 0 si es la primera compra y el producto es café
-            if is_first_buy:
-                print(f"🎁 Aplicando promoción de café gratis para {contact.phone_number}", flush=True)
+def resolve_order_items(order_data, tenant):
+    """
+    Resuelve productos y extras del pedido contra el índice en memoria del menú (nombres sin tildes,
+    plurales y erratas leves), sin consultas. Devuelve `(lines, unresolved)`: `lines` son tuplas
+    `(item, product, [(extra, extra_data), ...])` y `unresolved` los nombres que no están en la carta.
+    """
+    lookup = get_menu_lookup(tenant)
+    lines, unresolved = [], []
+    for item in order_data.get('order_items', []):
+        product = lookup.product(item.get('product_name'))
+        if product is None:
+            unresolved.append(item.get('product_name'))
+            continue
+
+        extras = []
+        for extra_data in item.get('extras', []):
+            extra = lookup.extra(extra_data.get('name'))
+            if extra is None:
+                unresolved.append(f"{extra_data.get('name')} ({product.name})")
             else:
-                unit_price = product.price  # ❌ Si no es la primera compra, usar el precio de la BD
+                extras.append((extra, extra_data))
+        lines.append((item, product, extras))
+    return lines, unresolved
+
 
-            order_item = OrderItem.objects.create(
+def save_order_to_db(order_data, turn, lines=None):
+    """
+    Guarda el pedido de `submit_order`. `turn` es el `TurnContext` del mensaje: el contacto,
+    la promoción de primera compra y el estado VIP se leen de ahí, no se consultan por ítem.
+    `lines` son los ítems ya resueltos con `resolve_order_items` (si no se pasan, se resuelven aquí).
+    """
+    print(f"🔍 Guardando pedido: {order_data}", flush=True)
+    session, contact = turn.session, turn.contact
+    is_first_buy = contact.first_buy
+    if lines is None:
+        lines, unresolved = resolve_order_items(order_data, session.tenant)
+        for name in unresolved:
+            print(f"❌ No encontrado en la carta: {name}", flush=True)
+    quantities = order_quantities((product.pk, item.get('quantity', 1)) for item, product, _ in lines)
+
+    order = None
+    try:
+        # 📦 Reservar el stock y crear el pedido en la misma transacción: si algo falla, no queda nada descontado
+        with transaction.atomic():
+            reserve_stock(session.tenant.id, quantities)
+            order = Order.objects.create(
                 tenant=session.tenant,
-                order=order,
-                product=product,
-                quantity=quantity,
-                price=unit_price,
-                exclusions=", ".join(exclusions) if exclusions else "",
-                special_instructions=special_instructions or "",
-                extras=extras_list if extras_list else [],
-                discount=item_discount,
-                tax_amount=item_tax
+                phone_number=session.phone_number,
+                chat_session=session.chat_session,
+                table_number=order_data.get('table_number'),
+                notes=order_data.get('notes', ''),
+                order_number=generate_order_number(),
+                status='PENDING',
+                delivery_type=order_data.get('delivery_type', 'DINE_IN'),
+                payment_status='PENDING',
+                discount=Decimal(order_data.get('discount', 0.00)),
+                tax_amount=Decimal(order_data.get('tax_amount', 0.00)),
+                is_scheduled=False,
+                stock_reserved=True,
             )
-
-            # ✅ Si el producto no es gratuito, sumarlo al total
-            if order_item.price > 0:
-                total_price += order_item.final_price
-
-        order.total_price = Decimal(total_price - order.discount + order.tax_amount).quantize(Decimal("0.01"))
-        order.save()
+            print(f"📝 Pedido creado: {order}", flush=True)
+
+            total_price = Decimal('0.00') 
+
+            for item, product, extras in lines:
+                print(f"🍔 Procesando ítem: {item}", flush=True)
+                quantity = item.get('quantity', 1)
+                unit_price = Decimal(str(item.get('unit_price', 0.00)))
+                exclusions = item.get('exclusions', [])
+                special_instructions = item.get('special_instructions', '')
+                item_discount = Decimal(str(item.get('discount', 0.00)))
+                item_tax = Decimal(str(item.get('tax_amount', 0.00)))
+
+                extras_list = [
+                    {"name": extra.name, "price": float(Decimal(str(extra_data.get('price', 0.00))))}
+                    for extra, extra_data in extras
+                ]
+
+                # ✅ Solo permitir precio 0 si es la primera compra y el producto es café
+                if is_first_buy:
+                    print(f"🎁 Aplicando promoción de café gratis para {contact.phone_number}", flush=True)
+                else:
+                    unit_price = product.price  # ❌ Si no es la primera compra, usar el precio de la BD
+
+                order_item = OrderItem.objects.create(
+                    tenant=session.tenant,
+                    order=order,
+                    product=product,
+                    quantity=quantity,
+                    price=unit_price,
+                    exclusions=", ".join(exclusions) if exclusions else "",
+                    special_instructions=special_instructions or "",
+                    extras=extras_list if extras_list else [],
+                    discount=item_discount,
+                    tax_amount=item_tax
+                )
+
+                # ✅ Si el producto no es gratuito, sumarlo al total
+                if order_item.price > 0:
+                    total_price += order_item.final_price
+
+            order.total_price = Decimal(total_price - order.discount + order.tax_amount).quantize(Decimal("0.01"))
+            order.save()
 
         print("✅ Pedido guardado correctamente en la base de datos.", flush=True)
 
         # ✅ Si es la primera compra, actualizar el estado del contacto
-        if contact and contact.first_buy:
+        if is_first_buy:
             contact.first_buy = False
-            contact.save()
+            contact.save(update_fields=["first_buy"])
             print(f"🎉 Primera compra registrada para {contact.phone_number}. `first_buy` actualizado a False.", flush=True)
         
         # 🔍 **Verificar si el usuario es VIP**
-        is_vip_user = is_vip(session.phone_number, session.tenant)
+        is_vip_user = turn.is_vip
 
         if is_vip_user:
             print("🏆 Cliente VIP detectado. Saltando proceso de pago...", flush=True)
@@ -160,12 +184,8 @@ def save_order_to_db(order_data, session):
             send_order_email(order)
 
             # 🔹 Comprobar si el usuario ya aceptó recibir promociones
-            try:
-                whatsapp_contact = WhatsAppContact.objects.filter(phone_number=order.phone_number, tenants=order.tenant).first()
-                if whatsapp_contact and whatsapp_contact.accepts_promotions is None:
-                    send_promotion_opt_in_message(whatsapp_contact.phone_number, order.tenant)
-            except WhatsAppContact.DoesNotExist:
-                pass
+            if contact.accepts_promotions is None:
+                send_promotion_opt_in_message(contact.phone_number, order.tenant)
 
         else:
             # 📦 **Generar el link de pago normalmente**
@@ -189,5 +209,30 @@ def save_order_to_db(order_data, session):
             
             print(f"✉️ Mensaje enviado al usuario: {message}", flush=True)
 
+        return order
+
+    except OutOfStockError:
+        raise
     except Exception as e:
         print(f"❌ Error al guardar el pedido: {e}", flush=True)
+        # 📦 El cliente tendrá que confirmar otra vez: el pedido a medias no puede quedarse con el stock
+        if order is not None and order.release_stock():
+            Order.objects.filter(pk=order.pk).update(status='CANCELLED')
+        return None
+
+
+def build_order_summary(order):
+    """Genera el resumen del pedido para el cliente a partir del pedido guardado."""
+    lines = ["🌟 Este es tu pedido:", ""]
+    for item in order.items.select_related("product"):
+        extras = ", ".join(extra["name"] for extra in (item.extras or []))
+        extras_text = f" (con {extras})" if extras else ""
+        lines.append(f"    {item.quantity}x {item.product.name}{extras_text} - {item.final_price:.2f}€")
+
+    lines += [
+        "",
+        f"💰 Total: {order.total_price:.2f}€ 🌟",
+        "",
+        "💳 El pago se realiza con tarjeta al finalizar el pedido. 🚀",
+    ]
+    return "\n".join(lines)
@@ -1,3 +1,80 @@
-from django.test import TestCase
-
-# Create your tests here.
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.test import RequestFactory, TestCase
+
+from apps.menu.models import Category, Product
+from apps.menu.stock import reserve_stock
+from apps.orders.admin import OrderAdmin
+from apps.orders.models import Order, OrderItem
+from apps.orders.services import save_order_to_db
+from apps.tenants.models import Tenant
+from apps.whatsapp.models import WhatsAppContact
+
+
+class MarkAsCancelledTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(
+            name="Bar Test", owner_name="-", phone_number="34600000000", phone_number_id="test-id",
+            whatsapp_access_token="-", nif="-",
+        )
+        category = Category.objects.create(tenant=self.tenant, name="Cafés")
+        self.product = Product.objects.create(
+            tenant=self.tenant, category=category, name="Café con leche", price=1.5, ingredients="-", stock=10,
+        )
+
+    def order(self, number, stock_reserved, payment_status="PENDING"):
+        if stock_reserved:
+            reserve_stock(self.tenant.id, {self.product.pk: 2})
+        order = Order.objects.create(
+            tenant=self.tenant, phone_number="34611111111", order_number=number,
+            payment_status=payment_status, stock_reserved=stock_reserved,
+        )
+        OrderItem.objects.create(tenant=self.tenant, order=order, product=self.product, quantity=2, price=Decimal("1.50"))
+        return order
+
+    def test_only_unpaid_reserved_orders_return_their_stock(self):
+        self.order("reserved", stock_reserved=True)
+        self.order("never-reserved", stock_reserved=False)
+        self.order("paid", stock_reserved=True, payment_status="PAID")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 6)
+
+        model_admin = OrderAdmin(Order, site)
+        with mock.patch.object(model_admin, "message_user"):
+            model_admin.mark_as_cancelled(RequestFactory().post("/"), Order.objects.filter(tenant=self.tenant))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)  # Solo vuelven las 2 unidades del pedido reservado sin pagar
+        self.assertEqual(
+            dict(Order.objects.values_list("order_number", "stock_reserved")),
+            {"reserved": False, "never-reserved": False, "paid": True},
+        )
+        self.assertEqual(set(Order.objects.values_list("status", flat=True)), {"CANCELLED"})
+
+
+class SaveOrderFailureTests(TestCase):
+    def setUp(self):
+        tenant = Tenant.objects.create(
+            name="Bar Test", owner_name="-", phone_number="34600000000", phone_number_id="test-id",
+            whatsapp_access_token="-", nif="-",
+        )
+        category = Category.objects.create(tenant=tenant, name="Cafés")
+        self.product = Product.objects.create(
+            tenant=tenant, category=category, name="Café con leche", price=Decimal("1.50"), ingredients="-", stock=10,
+        )
+        contact = WhatsAppContact.objects.create(phone_number="34611111111", wa_id="34611111111", first_buy=False)
+        session = SimpleNamespace(tenant=tenant, phone_number=contact.phone_number, chat_session=None)
+        self.turn = SimpleNamespace(session=session, contact=contact, is_vip=False)
+
+    def test_failed_payment_link_returns_the_reserved_stock(self):
+        lines = [({"product_name": "Café con leche", "quantity": 2}, self.product, [])]
+        with mock.patch("apps.orders.services.generate_payment_link", side_effect=RuntimeError("Redsys caído")):
+            self.assertIsNone(save_order_to_db({"table_number": "5"}, self.turn, lines=lines))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        order = Order.objects.get()
+        self.assertEqual((order.status, order.stock_reserved), ("CANCELLED", False))
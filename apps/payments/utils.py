@@ -104,7 +104,7 @@ def send_order_email(order):
 
     try:
         # 🚀 Cliente de SendGrid
-        sg = sendgrid.SendGridAPIClient(api_key=settings.SENDGRID_API_KEY)
+        sg = sendgrid.SendGridAPIClient(api_key=settings.SENDGRID_API_KEY, host=settings.SENDGRID_HOST)
 
         # ⚡ Aplicar configuraciones opcionales
         if settings.SENDGRID_SANDBOX_MODE_IN_DEBUG:
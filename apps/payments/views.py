@@ -14,6 +14,7 @@ from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from escpos.printer import Network
 
+from apps.menu.stock import OutOfStockError, order_quantities, reserve_stock
 from apps.orders.models import Order, OrderItem
 from apps.payments.models import Payment
 from apps.payments.services import PaymentServiceRedsys, decode_redsys_parameters, generate_payment_link
@@ -140,39 +141,57 @@ def redsys_notify(request):
             old_order.payment_status = "FAILED"
             old_order.save()
 
-            # 🔄 **Clonar el pedido con un nuevo número de pedido**
-            new_order_number = str(uuid.uuid4().int)[:12]
-
-            new_order = Order.objects.create(
-                tenant=old_order.tenant,
-                phone_number=old_order.phone_number,
-                chat_session=old_order.chat_session,
-                table_number=old_order.table_number,
-                notes=old_order.notes,
-                order_number=new_order_number,
-                status='PENDING',  # Nuevo pedido en estado pendiente
-                delivery_type=old_order.delivery_type,
-                payment_status='PENDING',
-                discount=old_order.discount,
-                tax_amount=old_order.tax_amount,
-                is_scheduled=old_order.is_scheduled,
-                total_price=old_order.total_price,
-            )
-
-            # 🔄 **Clonar los items del pedido (con related_name='items')**
-            for item in old_order.items.all():  # 🔥 FIX AQUÍ 🔥
-                OrderItem.objects.create(
-                    tenant=item.tenant,
-                    order=new_order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=item.price,
-                    exclusions=item.exclusions,
-                    special_instructions=item.special_instructions,
-                    extras=item.extras,
-                    discount=item.discount,
-                    tax_amount=item.tax_amount
+            # 📦 Devolver el stock del pedido fallido y volver a reservarlo para el pedido de reintento
+            old_order.release_stock()
+            try:
+                # 📦 Reserva y pedido nuevo en la misma transacción: si falla la copia, no queda stock descontado
+                with transaction.atomic():
+                    reserve_stock(old_order.tenant_id, order_quantities(old_order.items.values_list("product_id", "quantity")))
+
+                    # 🔄 **Clonar el pedido con un nuevo número de pedido**
+                    new_order_number = str(uuid.uuid4().int)[:12]
+
+                    new_order = Order.objects.create(
+                        tenant=old_order.tenant,
+                        phone_number=old_order.phone_number,
+                        chat_session=old_order.chat_session,
+                        table_number=old_order.table_number,
+                        notes=old_order.notes,
+                        order_number=new_order_number,
+                        status='PENDING',  # Nuevo pedido en estado pendiente
+                        delivery_type=old_order.delivery_type,
+                        payment_status='PENDING',
+                        discount=old_order.discount,
+                        tax_amount=old_order.tax_amount,
+                        is_scheduled=old_order.is_scheduled,
+                        total_price=old_order.total_price,
+                        stock_reserved=True,
+                    )
+
+                    # 🔄 **Clonar los items del pedido (con related_name='items')**
+                    for item in old_order.items.all():  # 🔥 FIX AQUÍ 🔥
+                        OrderItem.objects.create(
+                            tenant=item.tenant,
+                            order=new_order,
+                            product=item.product,
+                            quantity=item.quantity,
+                            price=item.price,
+                            exclusions=item.exclusions,
+                            special_instructions=item.special_instructions,
+                            extras=item.extras,
+                            discount=item.discount,
+                            tax_amount=item.tax_amount
+                        )
+
+            except OutOfStockError as e:
+                send_whatsapp_message(
+                    old_order.phone_number,
+                    f"❌ Tu pago no se ha completado y ya no nos queda: {', '.join(e.products)}.\n"
+                    f"📩 Escríbenos de nuevo para hacer otro pedido.",
+                    tenant=old_order.tenant,
                 )
+                print(f"❌ Pago fallido y sin stock para reintentar el pedido {old_order.id}", flush=True)
+                return JsonResponse({"status": "failed", "message": "Pago rechazado, sin stock para un nuevo pedido"})
 
             # 🏦 **Crear un nuevo registro de pago para el nuevo pedido**
             new_payment = Payment.objects.create(
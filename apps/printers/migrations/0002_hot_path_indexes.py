@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_hot_path_indexes'),
+        ('printers', '0001_initial'),
+        ('tenants', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='printticket',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['tenant', 'created_at'], name='ticket_pending_tenant_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.db.models import Q
 from apps.orders.models import Order
 from apps.tenants.models import Tenant
 
@@ -48,6 +49,10 @@ class PrintTicket(models.Model):
         verbose_name = "Print Ticket"
         verbose_name_plural = "Print Tickets"
         ordering = ["-created_at"]  # Order by latest tickets
+        indexes = [
+            # 🔹 Solo los pendientes: lo que consulta el agente de impresión del tenant en cada sondeo
+            models.Index(fields=["tenant", "created_at"], condition=Q(status="PENDING"), name="ticket_pending_tenant_idx"),
+        ]
 
     def __str__(self):
         return f"Ticket {self.printer_zone.name} - Order {self.order.order_number}"
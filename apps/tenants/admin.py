@@ -15,7 +15,7 @@ from apps.whatsapp.models import WhatsAppContact
 class TenantAdmin(admin.ModelAdmin):
     list_display = ("name", "nif", "phone_number", "phone_number_id", "is_active", "has_first_buy_promo")  # ✅ Añadido
     search_fields = ("name", "nif", "phone_number", "phone_number_id")
-    list_filter = ("is_active", "has_first_buy_promo", "created_at",)  # ✅ Filtrado rápido
+    list_filter = ("is_active", "has_first_buy_promo", "response_cache_enabled", "scripted_flow_enabled", "created_at",)  # ✅ Filtrado rápido
     ordering = ("-created_at",)
     actions = ["toggle_active_status", "toggle_first_buy_promo", "export_as_csv", "export_as_json"]  # ✅ Añadida acción
     
@@ -148,7 +148,7 @@ class TenantAdmin(admin.ModelAdmin):
     fieldsets = (
         ("Información Básica", {"fields": ("name", "owner_name", "phone_number", "phone_number_id", "whatsapp_access_token")}),
         ("Detalles de Negocio", {"fields": ("email", "address", "nif", "timezone", "currency")}),
-        ("Configuraciones", {"fields": ("is_active", "has_first_buy_promo")}),  # ✅ Campo visible en el formulario
+        ("Configuraciones", {"fields": ("is_active", "has_first_buy_promo", "response_cache_enabled", "scripted_flow_enabled", "table_count")}),  # ✅ Campo visible en el formulario
         ("Más Información", {
             "fields": (
                 "total_orders",
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class TenantsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.tenants'
+
+    def ready(self):
+        from .signals import connect_prompt_signals
+        connect_prompt_signals()
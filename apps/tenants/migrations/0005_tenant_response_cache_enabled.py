@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0004_tenant_has_first_buy_promo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='response_cache_enabled',
+            field=models.BooleanField(default=False, verbose_name='Caché de respuestas informativas activa'),
+        ),
+    ]
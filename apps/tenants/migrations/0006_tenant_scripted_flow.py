@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0005_tenant_response_cache_enabled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='scripted_flow_enabled',
+            field=models.BooleanField(default=False, verbose_name='Flujo guiado (saludo, mesa y categorías) sin IA'),
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='table_count',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Número de mesas'),
+        ),
+    ]
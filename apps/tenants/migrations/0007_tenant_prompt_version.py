@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0006_tenant_scripted_flow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='prompt_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Prompt Version'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0007_tenant_prompt_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='menu_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Menu Version'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0008_tenant_menu_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='menu_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Menu Last Updated'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0009_tenant_menu_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tenant',
+            name='phone_number',
+            field=models.CharField(db_index=True, max_length=20, verbose_name='Contact Phone'),
+        ),
+        migrations.AlterField(
+            model_name='tenant',
+            name='phone_number_id',
+            field=models.CharField(db_index=True, max_length=50, verbose_name='WhatsApp Business ID'),
+        ),
+    ]
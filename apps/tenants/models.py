@@ -1,6 +1,9 @@
 import uuid
 
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils.timezone import now
 
 TIMEZONE_CHOICES = [
     ("Europe/London", "🇬🇧 Reino Unido - Londres"),
@@ -56,8 +59,8 @@ class Tenant(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100, verbose_name="Company Name")  # ✅ Required
     owner_name = models.CharField(max_length=100, verbose_name="Owner Name")  # ✅ Required
-    phone_number = models.CharField(max_length=20, verbose_name="Contact Phone")  # ✅ Required
-    phone_number_id = models.CharField(max_length=50, verbose_name="WhatsApp Business ID")  # ✅ Required
+    phone_number = models.CharField(max_length=20, db_index=True, verbose_name="Contact Phone")  # ✅ Required (webhook)
+    phone_number_id = models.CharField(max_length=50, db_index=True, verbose_name="WhatsApp Business ID")  # ✅ Required (impresoras)
     whatsapp_access_token = models.CharField(max_length=255, verbose_name="WhatsApp Access Token")  # ✅ Required
     email = models.EmailField(blank=True, null=True, verbose_name="Email Address")  # 🟡 Optional
     address = models.TextField(blank=True, null=True, verbose_name="Physical Address")  # 🟡 Optional
@@ -76,12 +79,35 @@ class Tenant(models.Model):
     )  # 🟡 Optional, but with predefined values
     is_active = models.BooleanField(default=True, verbose_name="Active?")  # 🟡 Optional
     has_first_buy_promo = models.BooleanField(default=False, verbose_name="Promoción de primera compra activa")
+    response_cache_enabled = models.BooleanField(default=False, verbose_name="Caché de respuestas informativas activa")
+    scripted_flow_enabled = models.BooleanField(default=False, verbose_name="Flujo guiado (saludo, mesa y categorías) sin IA")
+    table_count = models.PositiveIntegerField(blank=True, null=True, verbose_name="Número de mesas")  # 🟡 Valida la mesa en el flujo guiado
+    prompt_version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Prompt Version")  # 🟢 Auto: invalida la caché de prompts
+    menu_version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Menu Version")  # 🟢 Auto: invalida lo derivado del menú
+    menu_updated_at = models.DateTimeField(default=now, editable=False, verbose_name="Menu Last Updated")  # 🟢 Auto: Last-Modified de la carta pública
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Creation Date")  # 🟢 Auto
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Last Updated")  # 🟢 Auto
 
+    # 🔢 Contadores que solo se incrementan con F(); guardar un Tenant nunca debe devolverlos a un valor antiguo
+    VERSION_FIELDS = ("prompt_version", "menu_version", "menu_updated_at")
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.VERSION_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bump_menu_version(cls, tenant_ids=None):
+        """Incrementa de forma atómica la versión del menú de los tenants indicados (o de todos si es None)."""
+        tenants = cls.objects.all() if tenant_ids is None else cls.objects.filter(pk__in=tenant_ids)
+        tenants.update(menu_version=F("menu_version") + 1, menu_updated_at=Now())
+
 class TenantPrompt(models.Model):
     id = models.UUIDField(
         primary_key=True, 
@@ -110,3 +136,10 @@ class TenantPrompt(models.Model):
 
     def __str__(self):
         return f"{self.tenant.name} - {self.name} {'(Active)' if self.is_active else '(Inactive)'}"
+
+    def bump_tenant_prompt_version(self):
+        """
+        Invalida los prompts compilados y cacheados del tenant (en todos los procesos). Lo llaman las
+        señales `post_save`/`post_delete` (`apps/tenants/signals.py`).
+        """
+        Tenant.objects.filter(pk=self.tenant_id).update(prompt_version=F("prompt_version") + 1)
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+
+from .models import TenantPrompt
+
+
+def prompt_changed(sender, instance, **kwargs):
+    instance.bump_tenant_prompt_version()
+
+
+def connect_prompt_signals():
+    # 🔹 Señales en lugar de `save`/`delete` del modelo: también cubren `QuerySet.delete()` (borrado masivo del admin)
+    post_save.connect(prompt_changed, sender=TenantPrompt, dispatch_uid="prompt_version_save")
+    post_delete.connect(prompt_changed, sender=TenantPrompt, dispatch_uid="prompt_version_delete")
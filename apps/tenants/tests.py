@@ -1,3 +1,31 @@
-from django.test import TestCase
-
-# Create your tests here.
+from django.test import TestCase
+
+from apps.assistant.prompt import get_tenant_prompt
+from apps.tenants.models import Tenant, TenantPrompt
+
+
+class TenantPromptVersionTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(
+            name="Bar Test", owner_name="-", phone_number="34600000000", phone_number_id="test-id",
+            whatsapp_access_token="-", nif="-",
+        )
+
+    def prompt(self):
+        self.tenant.refresh_from_db()
+        return get_tenant_prompt(self.tenant)
+
+    def test_bulk_delete_invalidates_the_compiled_prompt(self):
+        TenantPrompt.objects.create(tenant=self.tenant, content="Prompt del bar")
+        self.assertEqual(self.prompt(), "Prompt del bar")
+
+        TenantPrompt.objects.filter(tenant=self.tenant).delete()  # Como el "Eliminar seleccionados" del admin
+        self.assertNotEqual(self.prompt(), "Prompt del bar")
+
+    def test_saving_a_prompt_invalidates_the_compiled_prompt(self):
+        prompt = TenantPrompt.objects.create(tenant=self.tenant, content="Prompt del bar")
+        self.assertEqual(self.prompt(), "Prompt del bar")
+
+        prompt.content = "Prompt nuevo"
+        prompt.save()
+        self.assertEqual(self.prompt(), "Prompt nuevo")
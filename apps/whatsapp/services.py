@@ -6,8 +6,9 @@ from django.utils.timezone import make_aware, now
 from django.db import transaction
 
 from .models import Tenant, WebhookEvent, WhatsAppContact, WhatsAppMessage
+from .turn import TurnContext
 from apps.assistant.services import generate_openai_response
-from apps.chat.services import process_whatsapp_message
+from apps.chat.services import flush_turn_messages, process_whatsapp_message
 from apps.whatsapp.utils import (
     download_whatsapp_media,
     mark_message_as_read,
@@ -95,6 +96,9 @@ def process_whatsapp_message_entry(message, contacts, tenant):
         send_policy_interactive_message(whatsapp_contact.phone_number, tenant)
         return
 
+    # 🧾 Contexto del turno: tenant y contacto cargados una sola vez y compartidos por todos los subsistemas
+    turn = TurnContext(tenant=tenant, contact=whatsapp_contact)
+
     # 🔹 Procesar mensaje de audio
     transcribed_text = None
     if message_type == "audio":
@@ -107,10 +111,11 @@ def process_whatsapp_message_entry(message, contacts, tenant):
         return
 
     # 🔹 Procesar el mensaje en la sesión del asistente
-    assistant_session = process_whatsapp_message(message, whatsapp_contact, tenant, transcribed_text=transcribed_text)
+    process_whatsapp_message(message, turn, transcribed_text=transcribed_text)
 
     # 🔹 Generar y enviar la respuesta de OpenAI
-    ai_response = sanitize_ai_response(generate_openai_response(message, assistant_session, whatsapp_contact, transcribed_text))
+    ai_response = sanitize_ai_response(generate_openai_response(message, turn, transcribed_text))
+    flush_turn_messages(turn)  # Turnos sin respuesta guardada (p. ej. error de OpenAI): solo el mensaje del cliente
     send_whatsapp_message(whatsapp_contact.phone_number, ai_response, tenant)
 
     # 🔹 Marcar mensaje como leído
@@ -165,7 +170,7 @@ def process_audio_message(message, tenant):
     audio_id = message.get("audio", {}).get("id")
     audio_path = download_whatsapp_media(audio_id, tenant)
     if audio_path:
-        transcribed_text = transcribe_audio(audio_path)
+        transcribed_text = transcribe_audio(audio_path, tenant=tenant)
         os.remove(audio_path)
         return transcribed_text
     return None
@@ -177,11 +182,6 @@ def save_message(message, tenant, transcribed_text=None):
     if WhatsAppMessage.objects.filter(message_id=message_id).exists():
         return None
 
-    # 🔹 Validar que el tenant es válido
-    if not Tenant.objects.filter(id=tenant.id).exists():
-        print(f"❌ Error: Tenant {tenant.id} no existe.", flush=True)
-        return None
-
     # 🔹 Guardar el mensaje
     message_data = {
         "from_number": message.get("from"),
@@ -191,7 +191,7 @@ def save_message(message, tenant, transcribed_text=None):
         "status": "delivered",
         "direction": "inbound",
         "timestamp": make_aware(datetime.fromtimestamp(int(message.get("timestamp")))),
-        "tenant": tenant,  # Se asigna el tenant validado
+        "tenant": tenant,  # Tenant ya cargado al recibir el webhook
     }
 
     return WhatsAppMessage.objects.create(message_id=message_id, **message_data)
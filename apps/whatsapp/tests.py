@@ -1,3 +1,97 @@
-from django.test import TestCase
-
-# Create your tests here.
+import json
+import time
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.chat.session_store import SessionStore, session_store
+from apps.menu.models import Category, Product
+from apps.orders.models import Order
+from apps.tenants.models import Tenant
+from apps.whatsapp.models import WhatsAppContact
+from apps.whatsapp.services import process_webhook_event
+
+CUSTOMER = "34611111111"
+
+
+def completion(content=None, tool_calls=None):
+    """Respuesta mínima con la forma de `ChatCompletion` que leen los servicios."""
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], model="gpt-4o-mini", usage=None)
+
+
+def submit_order(arguments):
+    return [SimpleNamespace(function=SimpleNamespace(name="submit_order", arguments=json.dumps(arguments)))]
+
+
+# Caché en memoria aunque haya `REDIS_URL`: solo se cuentan las consultas del propio turno
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "local": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "local"},
+})
+class OrderingTurnQueriesTests(TestCase):
+    """Fija el número de consultas de un turno de pedido completo, de la entrada del webhook al envío."""
+
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(
+            name="Bar Test", owner_name="-", phone_number="34600000000", phone_number_id="test-id",
+            whatsapp_access_token="-", nif="-",
+        )
+        category = Category.objects.create(tenant=self.tenant, name="Cafés")
+        Product.objects.create(tenant=self.tenant, category=category, name="Café con leche", price=1.5, available=True)
+        WhatsAppContact.objects.create(phone_number=CUSTOMER, wa_id=CUSTOMER, policy_accepted=True, first_buy=False)
+
+        # 🔹 OpenAI, la Graph API y los escritores en segundo plano quedan fuera del turno medido
+        self.replies = []
+        for target, options in (
+            ("apps.assistant.services.gateway.chat", {"side_effect": self.chat}),
+            ("apps.whatsapp.utils.requests.post", {"return_value": mock.Mock(status_code=200, json=dict)}),
+            ("apps.assistant.services.request_log_writer", {}),
+            ("apps.whatsapp.utils.request_log_writer", {}),
+        ):
+            patcher = mock.patch(target, **options)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(SessionStore, "_schedule")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(session_store.flush)  # Lo pendiente se escribe dentro de la transacción del test
+
+    def chat(self, purpose, **payload):
+        if purpose == "detect":
+            return completion("es")
+        return self.replies.pop(0)
+
+    def send(self, text):
+        process_webhook_event({"object": "whatsapp_business_account", "entry": [{"id": "1", "changes": [{
+            "field": "messages",
+            "value": {
+                "metadata": {"display_phone_number": self.tenant.phone_number, "phone_number_id": self.tenant.phone_number_id},
+                "contacts": [{"profile": {"name": "Cliente"}, "wa_id": CUSTOMER}],
+                "messages": [{
+                    "from": CUSTOMER, "id": f"wamid.{uuid.uuid4().hex}", "timestamp": str(int(time.time())),
+                    "type": "text", "text": {"body": text},
+                }],
+            },
+        }]}]})
+
+    def test_ordering_turn_query_count(self):
+        self.replies = [completion("¡Hola! ¿Qué te apetece?")]
+        self.send("Hola")  # Abre la sesión: el turno medido ya la encuentra en el store
+
+        self.replies = [completion("Un café con leche. ¿Para qué mesa?")]
+        with self.assertNumQueries(13):
+            self.send("Quiero un café con leche para la mesa 5")
+
+        self.replies = [completion(tool_calls=submit_order({
+            "table_number": "5",
+            "order_items": [{"product_name": "Café con leche", "quantity": 1, "unit_price": 1.5}],
+        }))]
+        with self.assertNumQueries(27):
+            self.send("Eso es todo, confirmo")
+
+        self.assertEqual(Order.objects.filter(tenant=self.tenant, phone_number=CUSTOMER).count(), 1)
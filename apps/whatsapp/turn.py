@@ -0,0 +1,42 @@
+from dataclasses import dataclass, field
+from functools import cached_property
+
+from apps.menu.services import get_menu_data
+from apps.vip.utils import is_vip
+
+
+@dataclass
+class TurnContext:
+    """
+    Foto de todo lo que necesita un turno (un mensaje entrante), cargada una sola vez al empezar
+    y pasada explícitamente a chat, asistente, pedidos y pagos. Así el tenant, el contacto,
+    el estado VIP y el menú no se vuelven a consultar en cada subsistema.
+    """
+
+    tenant: object
+    contact: object
+    session: object = None  # `AssistantSession`, se asigna al procesar el mensaje en el chat
+    pending_messages: list = field(default_factory=list)  # `ConversationMessage` del turno aún sin insertar
+
+    @property
+    def phone_number(self):
+        return self.contact.phone_number
+
+    @property
+    def first_buy(self):
+        return self.contact.first_buy
+
+    @cached_property
+    def is_vip(self):
+        """Solo se consulta si el turno llega a necesitarlo (p. ej. al guardar un pedido)."""
+        return is_vip(self.contact.phone_number, self.tenant)
+
+    @cached_property
+    def menu_data(self):
+        return get_menu_data(self.tenant)
+
+    def attach_session(self, session):
+        """Asocia la sesión del asistente compartiendo las instancias ya cargadas (sin consultas extra)."""
+        session.tenant = self.tenant
+        self.session = session
+        return session
@@ -1,19 +1,18 @@
 import json
+import os
 import tempfile
-import openai
+import time
+import uuid
 import requests
 
 from django.conf import settings
 
-
-openai.api_key = settings.OPENAI_API_KEY
-client = openai.Client(
-    api_key=settings.OPENAI_API_KEY,
-)
+from apps.assistant.gateway import OpenAIGatewayError, gateway
+from apps.assistant.request_log import request_log_writer
 
 
 def send_whatsapp_message(to_phone_number, ai_response, tenant):
-    url = f"https://graph.facebook.com/v22.0/{tenant.phone_number_id}/messages"
+    url = f"{settings.WHATSAPP_GRAPH_API_URL}/{tenant.phone_number_id}/messages"
     headers = {
         "Authorization": f"Bearer {tenant.whatsapp_access_token}",
         "Content-Type": "application/json"
@@ -36,7 +35,7 @@ def send_policy_interactive_message(phone_number, tenant):
     """
     Envía un mensaje interactivo en WhatsApp para que el usuario acepte o rechace la política de privacidad.
     """
-    url = f"https://graph.facebook.com/v22.0/{tenant.phone_number_id}/messages"
+    url = f"{settings.WHATSAPP_GRAPH_API_URL}/{tenant.phone_number_id}/messages"
 
     headers = {
         "Authorization": f"Bearer {tenant.whatsapp_access_token}",
@@ -78,7 +77,7 @@ def send_policy_interactive_message(phone_number, tenant):
 
 def download_whatsapp_media(media_id, tenant):
     """Descargar archivos multimedia de WhatsApp"""
-    url = f"https://graph.facebook.com/v22.0/{media_id}"
+    url = f"{settings.WHATSAPP_GRAPH_API_URL}/{media_id}"
     headers = {
         "Authorization": f"Bearer {tenant.whatsapp_access_token}"
     }
@@ -97,21 +96,34 @@ def download_whatsapp_media(media_id, tenant):
             
         return None
     
-def transcribe_audio(audio_path):
+def transcribe_audio(audio_path, tenant=None):
     """ Transcribe un archivo de audio usando OpenAI Whisper """
+    started_at = time.perf_counter()
+    response, error = None, None
     try:
-        with open(audio_path, "rb") as audio_file:
-            response = client.audio.transcriptions.create(
+        response = gateway.transcribe(audio_path, model="whisper-1")
+        return response.text
+    except OpenAIGatewayError as e:
+        error = e
+        print(f"❌ Error en la transcripción: {e}", flush=True)
+        return None
+    finally:
+        # 📋 Registrar la transcripción para la contabilidad de consumo por tenant
+        if tenant is not None:
+            request_log_writer.log(
+                tenant=tenant,
+                request_id=str(uuid.uuid4()),
+                endpoint="AudioTranscription",
+                purpose="transcribe",
                 model="whisper-1",
-                file=audio_file,
+                request_delta={"bytes": os.path.getsize(audio_path) if os.path.exists(audio_path) else None},
+                response=response,
+                error=error,
+                latency_ms=(time.perf_counter() - started_at) * 1000,
             )
-            
-            return response.text
-    except Exception as e:
-        return f"Error en la transcripción: {str(e)}"
 
 def mark_message_as_read(message_id, tenant):
-    url = f"https://graph.facebook.com/v22.0/{tenant.phone_number_id}/messages"
+    url = f"{settings.WHATSAPP_GRAPH_API_URL}/{tenant.phone_number_id}/messages"
     headers = {
         "Authorization": f"Bearer {tenant.whatsapp_access_token}",
         "Content-Type": "application/json"
@@ -134,7 +146,7 @@ def send_promotion_opt_in_message(phone_number, tenant):
     """
     print(f"🔹 Enviando mensaje interactivo de promoción a {phone_number}", flush=True)
 
-    url = f"https://graph.facebook.com/v22.0/{tenant.phone_number_id}/messages"
+    url = f"{settings.WHATSAPP_GRAPH_API_URL}/{tenant.phone_number_id}/messages"
 
     headers = {
         "Authorization": f"Bearer {tenant.whatsapp_access_token}",
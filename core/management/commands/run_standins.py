@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.standins import SERVICES, Cassette, StandinConfig, make_server
+
+
+def parse_per_service(values, option, default_second):
+    """Convierte `servicio=a[:b]` en `{servicio: (a, b)}` (p. ej. `openai=800:200` o `graph=0.1:503`)."""
+    parsed = {}
+    for value in values or []:
+        try:
+            service, spec = value.split("=", 1)
+            first, _, second = spec.partition(":")
+            parsed[service] = (float(first), float(second) if second else default_second)
+        except ValueError:
+            raise CommandError(f"Formato no válido en --{option}: {value}")
+        if service not in SERVICES:
+            raise CommandError(f"Servicio desconocido en --{option}: {service} (válidos: {', '.join(SERVICES)})")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Arranca los stand-ins locales de OpenAI, Graph API de WhatsApp, Redsys y SendGrid."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic")
+        parser.add_argument("--cassette", default="standins.jsonl", help="Fichero JSONL de grabación/reproducción")
+        parser.add_argument(
+            "--latency", action="append", metavar="SERVICIO=MS[:JITTER]",
+            help="Latencia inyectada por servicio, p. ej. --latency openai=800:200",
+        )
+        parser.add_argument(
+            "--errors", action="append", metavar="SERVICIO=TASA[:STATUS]",
+            help="Tasa de errores por servicio, p. ej. --errors openai=0.05:503 (en redsys: pagos denegados)",
+        )
+        parser.add_argument("--transcript", help="Texto devuelto por la transcripción simulada")
+
+    def handle(self, *args, **options):
+        mode = options["mode"]
+        cassette = Cassette(options["cassette"]).load() if mode in ("record", "replay") else None
+
+        errors = parse_per_service(options["errors"], "errors", 500)
+        config = StandinConfig(
+            mode=mode,
+            cassette=cassette,
+            latency=parse_per_service(options["latency"], "latency", 0),
+            errors={service: (rate, int(status)) for service, (rate, status) in errors.items()},
+            transcript=options["transcript"],
+            redsys_secret=settings.REDSYS["SECRET_KEY"],
+        )
+
+        base_url = f"http://{options['host']}:{options['port']}"
+        server = make_server(options["host"], options["port"], config)
+        self.stdout.write(self.style.SUCCESS(f"🧪 Stand-ins en {base_url} (modo {mode})"))
+        self.stdout.write(
+            "   Configura la app con:\n"
+            f"   OPENAI_BASE_URL={base_url}/v1\n"
+            f"   WHATSAPP_GRAPH_API_URL={base_url}/graph/v22.0\n"
+            f"   SENDGRID_HOST={base_url}/sendgrid\n"
+            f"   REDSYS_URL_REDSYS={base_url}/redsys/sis/realizarPago"
+        )
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"📊 Peticiones atendidas: {dict(config.counters)}")
@@ -0,0 +1,355 @@
+"""
+Stand-ins locales de los servicios externos (OpenAI, Graph API de WhatsApp, Redsys y SendGrid)
+para ejecutar el flujo webhook → pedido sin servicios reales.
+
+Un único servidor HTTP atiende todos los servicios por prefijo de ruta:
+
+    /v1/...            OpenAI (chat.completions y audio.transcriptions)   → OPENAI_BASE_URL
+    /graph/<versión>/  Graph API de WhatsApp (mensajes y media)           → WHATSAPP_GRAPH_API_URL
+    /sendgrid/...      SendGrid (v3/mail/send)                            → SENDGRID_HOST
+    /redsys/...        Pasarela de Redsys (formulario de pago)            → REDSYS_URL_REDSYS
+
+Modos: `synthetic` (respuestas generadas), `record` (reenvía al servicio real y graba el tráfico
+en un cassette JSONL) y `replay` (responde con el tráfico grabado). En todos los modos se puede
+inyectar latencia y errores por servicio.
+"""
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+SERVICES = ("openai", "graph", "sendgrid", "redsys")
+
+UPSTREAMS = {
+    "openai": "https://api.openai.com",
+    "graph": "https://graph.facebook.com",
+    "sendgrid": "https://api.sendgrid.com",
+}
+
+MENU_PRODUCT_RE = re.compile(r"'name': '([^']+)', 'description': [^{}]*?'price': Decimal\('([\d.]+)'\)")
+ID_SEGMENT_RE = re.compile(r"/[0-9A-Za-z._-]*\d[0-9A-Za-z._-]*")
+LANGUAGE_TAG_RE = re.compile(r"^\[Idioma detectado: \w+\] ")
+CONFIRM_RE = re.compile(r"\b(?:confirm\w*|eso es todo|nada m[aá]s|s[ií],? (?:eso|confirmo))\b", re.IGNORECASE)
+
+
+def estimate_tokens(text):
+    return max(1, len(text or "") // 4)
+
+
+class Cassette:
+    """Tráfico grabado (JSONL). En replay busca primero la petición exacta y si no, la siguiente de la misma ruta."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._by_route = defaultdict(list)
+        self._cursor = defaultdict(int)
+
+    @staticmethod
+    def request_key(method, path, body):
+        try:
+            canonical = json.dumps(json.loads(body), sort_keys=True)
+        except (TypeError, ValueError):
+            canonical = body.decode("latin-1") if isinstance(body, bytes) else str(body or "")
+        return hashlib.sha1(f"{method} {path} {canonical}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def route_key(method, path):
+        # 🔹 Los IDs (teléfonos, media, pedidos) no deben impedir la reproducción en orden
+        return f"{method} {ID_SEGMENT_RE.sub('/:id', path)}"
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as cassette:
+                for line in cassette:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._by_key[entry["key"]] = entry
+                        self._by_route[entry["route"]].append(entry)
+        except FileNotFoundError:
+            pass
+        return self
+
+    def record(self, method, path, body, status, content_type, content):
+        entry = {
+            "key": self.request_key(method, path, body),
+            "route": self.route_key(method, path),
+            "status": status,
+            "content_type": content_type,
+            "body": base64.b64encode(content).decode("ascii"),
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as cassette:
+                cassette.write(json.dumps(entry) + "\n")
+
+    def find(self, method, path, body):
+        entry = self._by_key.get(self.request_key(method, path, body))
+        if entry:
+            return entry
+        route = self.route_key(method, path)
+        with self._lock:
+            entries = self._by_route.get(route) or []
+            if not entries:
+                return None
+            entry = entries[self._cursor[route] % len(entries)]
+            self._cursor[route] += 1
+            return entry
+
+
+class StandinConfig:
+    """Latencia (ms, con jitter) y tasa de errores inyectados por servicio."""
+
+    def __init__(self, mode="synthetic", cassette=None, latency=None, errors=None, transcript=None, redsys_secret=None):
+        self.mode = mode
+        self.cassette = cassette
+        self.latency = latency or {}   # servicio → (ms, jitter_ms)
+        self.errors = errors or {}     # servicio → (tasa, status)
+        self.transcript = transcript or "Quiero un café con leche, por favor."
+        self.redsys_secret = redsys_secret
+        self.counters = defaultdict(int)
+
+    def apply_latency(self, service):
+        delay_ms, jitter_ms = self.latency.get(service, (0, 0))
+        if delay_ms or jitter_ms:
+            time.sleep(max(0, delay_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+    def injected_error(self, service):
+        rate, status = self.errors.get(service, (0, 500))
+        return status if rate and random.random() < rate else None
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    config = None  # StandinConfig, asignado por `make_server`
+    protocol_version = "HTTP/1.1"
+
+    # ------------------------------------------------------------------
+    # Entrada
+    # ------------------------------------------------------------------
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        print(f"🧪 [stand-in] {self.address_string()} {format % args}", flush=True)
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        path = urlsplit(self.path).path
+        service = next((name for name in SERVICES if path.startswith(f"/{name}/")), None)
+        if path.startswith("/v1/"):
+            service = "openai"
+        if service is None:
+            return self._send_json(404, {"error": f"Ruta desconocida: {path}"})
+
+        config = self.config
+        config.counters[service] += 1
+        config.apply_latency(service)
+
+        # 🔹 En Redsys el error inyectado es un pago denegado (ver `_redsys`), no un fallo HTTP
+        status = config.injected_error(service) if service != "redsys" else None
+        if status:
+            return self._send_json(status, {"error": {"message": f"Error inyectado ({service})", "type": "standin_error"}})
+
+        if service == "redsys":
+            return self._redsys(path, body)
+
+        upstream_path = path if service == "openai" else path[len(f"/{service}"):]
+        if config.mode == "replay":
+            entry = config.cassette.find(method, path, body)
+            if entry:
+                return self._send(entry["status"], entry["content_type"], base64.b64decode(entry["body"]))
+            print(f"⚠️ [stand-in] Sin grabación para {method} {path}, respuesta sintética.", flush=True)
+        elif config.mode == "record" and not upstream_path.startswith("/media/"):
+            return self._proxy(service, method, path, upstream_path, body)
+
+        return getattr(self, f"_{service}")(method, upstream_path, body)
+
+    # ------------------------------------------------------------------
+    # Salida
+    # ------------------------------------------------------------------
+    def _send(self, status, content_type, content):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_json(self, status, data):
+        self._send(status, "application/json", json.dumps(data).encode("utf-8"))
+
+    def _base_url(self):
+        return f"http://{self.headers.get('Host')}"
+
+    # ------------------------------------------------------------------
+    # Grabación
+    # ------------------------------------------------------------------
+    def _proxy(self, service, method, path, upstream_path, body):
+        headers = {name: value for name, value in self.headers.items() if name.lower() in ("authorization", "content-type")}
+        try:
+            upstream = requests.request(method, f"{UPSTREAMS[service]}{upstream_path}", headers=headers, data=body, timeout=60)
+        except requests.RequestException as e:
+            print(f"❌ [stand-in] No se pudo grabar {method} {path}: {e}", flush=True)
+            return self._send_json(502, {"error": {"message": f"Servicio real no disponible: {e}"}})
+        content_type = upstream.headers.get("Content-Type", "application/json")
+        content = upstream.content
+
+        # 🔹 La URL de descarga de media apunta a Meta: se reescribe al stand-in para poder reproducirla
+        if service == "graph" and method == "GET" and "json" in content_type:
+            data = upstream.json()
+            if "url" in data:
+                data["url"] = f"{self._base_url()}/graph/media/{data.get('id', uuid.uuid4().hex)}"
+                content = json.dumps(data).encode("utf-8")
+
+        self.config.cassette.record(method, path, body, upstream.status_code, content_type, content)
+        self._send(upstream.status_code, content_type, content)
+
+    # ------------------------------------------------------------------
+    # Respuestas sintéticas
+    # ------------------------------------------------------------------
+    def _openai(self, method, path, body):
+        if path.endswith("/audio/transcriptions"):
+            return self._send_json(200, {"text": self.config.transcript})
+
+        if not path.endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": f"Endpoint no simulado: {path}"}})
+
+        payload = json.loads(body or b"{}")
+        messages = payload.get("messages") or []
+        system = " ".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+        user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+
+        content, tool_calls = None, None
+        if "ISO 639-1" in system:
+            content = "en" if re.search(r"\b(?:hello|hi|want|please|thanks)\b", user, re.IGNORECASE) else "es"
+        elif "Traduce este texto" in system:
+            content = user
+        elif payload.get("tools") and CONFIRM_RE.search(user) and MENU_PRODUCT_RE.search(system):
+            name, price = MENU_PRODUCT_RE.search(system).groups()
+            tool_calls = [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": "submit_order", "arguments": json.dumps({
+                    "table_number": "1", "notes": "", "delivery_type": "DINE_IN", "payment_method": "CARD",
+                    "discount": 0, "tax_amount": 0, "scheduled_time": None,
+                    "order_items": [{
+                        "product_name": name, "quantity": 1, "unit_price": float(price), "extras": [],
+                        "exclusions": [], "special_instructions": "", "discount": 0, "tax_amount": 0,
+                    }],
+                })},
+            }]
+        else:
+            content = f"🤖 Respuesta simulada a: {LANGUAGE_TAG_RE.sub('', user)}"
+
+        prompt_tokens = sum(estimate_tokens(m.get("content")) for m in messages)
+        completion_tokens = estimate_tokens(content or json.dumps(tool_calls))
+        return self._send_json(200, {
+            "id": f"chatcmpl-standin-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "tool_calls": tool_calls, "refusal": None},
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _graph(self, method, path, body):
+        if method == "POST" and path.endswith("/messages"):
+            payload = json.loads(body or b"{}")
+            if payload.get("status") == "read":
+                return self._send_json(200, {"success": True})
+            return self._send_json(200, {
+                "messaging_product": "whatsapp",
+                "contacts": [{"input": payload.get("to"), "wa_id": payload.get("to")}],
+                "messages": [{"id": f"wamid.standin.{uuid.uuid4().hex}"}],
+            })
+
+        if method == "GET" and path.startswith("/media/"):
+            return self._send(200, "audio/ogg", b"OggS" + b"\0" * 1024)  # Audio "vacío": la transcripción también es simulada
+
+        if method == "GET":
+            media_id = path.rstrip("/").rsplit("/", 1)[-1]
+            return self._send_json(200, {
+                "messaging_product": "whatsapp",
+                "id": media_id,
+                "mime_type": "audio/ogg; codecs=opus",
+                "url": f"{self._base_url()}/graph/media/{media_id}",
+            })
+
+        return self._send_json(404, {"error": {"message": f"Endpoint no simulado: {path}"}})
+
+    def _sendgrid(self, method, path, body):
+        if path.endswith("/mail/send"):
+            self.send_response(202)
+            self.send_header("Content-Length", "0")
+            self.send_header("X-Message-Id", uuid.uuid4().hex)
+            self.end_headers()
+            return None
+        return self._send_json(404, {"errors": [{"message": f"Endpoint no simulado: {path}"}]})
+
+    def _redsys(self, path, body):
+        """
+        Simula la pasarela: recibe el formulario de pago, envía la notificación firmada a la
+        `merchant_url` del pedido (como haría Redsys) y redirige a la URL de OK/KO.
+        """
+        from redsys.client import RedirectClient
+
+        form = {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+        client = RedirectClient(self.config.redsys_secret)
+        request_parameters = client.decode_parameters(form["Ds_MerchantParameters"].encode())
+
+        order = request_parameters["Ds_Merchant_Order"]
+        approved = self.config.injected_error("redsys") is None
+        notification = client.encode_parameters({
+            "Ds_Date": time.strftime("%d/%m/%Y"),
+            "Ds_Hour": time.strftime("%H:%M"),
+            "Ds_Amount": str(request_parameters["Ds_Merchant_Amount"]),
+            "Ds_Currency": str(request_parameters["Ds_Merchant_Currency"]),
+            "Ds_Order": order,
+            "Ds_MerchantCode": request_parameters["Ds_Merchant_MerchantCode"],
+            "Ds_Terminal": request_parameters["Ds_Merchant_Terminal"],
+            "Ds_Response": "0000" if approved else "0190",
+            "Ds_TransactionType": request_parameters["Ds_Merchant_TransactionType"],
+            "Ds_AuthorisationCode": f"{random.randint(0, 999999):06d}" if approved else "",
+        })
+        signature = client.generate_signature(order, notification)
+
+        try:
+            notify = requests.post(request_parameters["Ds_Merchant_MerchantURL"], data={
+                "Ds_SignatureVersion": "HMAC_SHA256_V1",
+                "Ds_MerchantParameters": notification.decode(),
+                "Ds_Signature": signature.decode(),
+            }, timeout=60)
+            print(f"💳 [stand-in] Notificación Redsys {order} ({'aprobado' if approved else 'denegado'}) → {notify.status_code}", flush=True)
+        except requests.RequestException as e:
+            print(f"❌ [stand-in] No se pudo enviar la notificación Redsys {order}: {e}", flush=True)
+
+        self.send_response(302)
+        self.send_header("Location", request_parameters["Ds_Merchant_UrlOK" if approved else "Ds_Merchant_UrlKO"])
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def make_server(host, port, config):
+    """Crea el servidor de stand-ins con la configuración indicada."""
+    handler = type("ConfiguredStandinHandler", (StandinHandler,), {"config": config})
+    return ThreadingHTTPServer((host, port), handler)
@@ -1,3 +1,161 @@
+import random
+import re
+import uuid
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.utils.timezone import now
+
+from apps.assistant.models import AssistantSession
+from apps.chat.models import ChatSession, ConversationMessage
+from apps.orders.models import Order
+from apps.payments.models import Payment
+from apps.printers.models import PrinterZone, PrintTicket
+from apps.tenants.models import Tenant
+from apps.whatsapp.models import WhatsAppContact
+
+
+def uses_index(plan, table, index=None):
+    """
+    ¿El plan de `EXPLAIN` resuelve `table` con un índice (el indicado, si se da) en vez de recorrerla entera?
+    Vale para SQLite (`SEARCH tabla USING INDEX ...`) y PostgreSQL (`Index Scan using ... on tabla`).
+    """
+    if index:
+        return index in plan
+    if connection.vendor == "postgresql":
+        return not re.search(rf"Seq Scan on {table}\b", plan)
+    return bool(re.search(rf"SEARCH {table}\b", plan))
+
+
+class HotQueryPlanTests(TestCase):
+    """
+    Siembra volúmenes realistas y comprueba con EXPLAIN que las consultas calientes de chat, pedidos,
+    impresoras y pagos usan sus índices. Falla si alguna recorre la tabla entera.
+    """
+
+    TENANTS = 3
+    SESSIONS = 300  # Sesiones de chat por tenant (un 5 % activas)
+    MESSAGES = 4  # Mensajes por sesión
+    ORDERS = 500  # Pedidos por tenant (con su pago y su ticket)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sample = cls.seed()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")  # Estadísticas al día para que el planificador vea los volúmenes
+
+    @classmethod
+    def seed(cls):
+        """Crea tenants con sesiones, mensajes, contactos, pedidos, pagos y tickets; devuelve una muestra para consultar."""
+        rng = random.Random(42)
+        tenants = [
+            Tenant.objects.create(
+                name=f"Plan {uuid.uuid4().hex[:8]}", owner_name="-", phone_number=f"9{rng.randrange(10**9):09d}",
+                phone_number_id=uuid.uuid4().hex, whatsapp_access_token="-", nif="-",
+            )
+            for _ in range(cls.TENANTS)
+        ]
+
+        for tenant in tenants:
+            phones = [f"34{rng.randrange(10**9):09d}" for _ in range(cls.SESSIONS)]
+            sessions = ChatSession.objects.bulk_create([
+                ChatSession(tenant=tenant, phone_number=phone, is_active=rng.random() < 0.05) for phone in phones
+            ])
+            assistant_sessions = AssistantSession.objects.bulk_create([
+                AssistantSession(tenant=tenant, chat_session=session, phone_number=session.phone_number, is_active=session.is_active)
+                for session in sessions
+            ])
+            sent_at = now() - timedelta(days=90)
+            ConversationMessage.objects.bulk_create([
+                ConversationMessage(
+                    tenant=tenant, chat_session=session, assistant_session=assistant_session,
+                    role="user" if position % 2 == 0 else "assistant", content="Un café con leche, por favor",
+                    timestamp=sent_at + timedelta(minutes=rng.randrange(90 * 24 * 60)),
+                )
+                for session, assistant_session in zip(sessions, assistant_sessions)
+                for position in range(cls.MESSAGES)
+            ], batch_size=2000)
+
+            contacts = WhatsAppContact.objects.bulk_create([
+                WhatsAppContact(phone_number=f"{phone}{uuid.uuid4().hex[:4]}", wa_id=uuid.uuid4().hex) for phone in phones
+            ])
+            WhatsAppContact.tenants.through.objects.bulk_create([
+                WhatsAppContact.tenants.through(whatsappcontact_id=contact.id, tenant_id=tenant.id) for contact in contacts
+            ])
+
+            orders = Order.objects.bulk_create([
+                Order(
+                    tenant=tenant, phone_number=rng.choice(phones)[:15], order_number=uuid.uuid4().hex[:20],
+                    total_price=rng.randrange(300, 6000) / 100,
+                    payment_status=rng.choice(["PAID", "PAID", "PAID", "PENDING", "FAILED"]),
+                )
+                for _ in range(cls.ORDERS)
+            ], batch_size=2000)
+            Payment.objects.bulk_create([
+                Payment(tenant=tenant, order=order, payment_id=uuid.uuid4().hex, amount=order.total_price) for order in orders
+            ], batch_size=2000)
+            zone = PrinterZone.objects.create(tenant=tenant, name=f"COCINA-{uuid.uuid4().hex[:8]}", printer_ip="10.0.0.1")
+            PrintTicket.objects.bulk_create([
+                PrintTicket(
+                    tenant=tenant, order=order, printer_zone=zone, content="-",
+                    status="PENDING" if rng.random() < 0.02 else "PRINTED",
+                )
+                for order in orders
+            ], batch_size=2000)
+
+        tenant = tenants[0]
+        return {
+            "tenant": tenant,
+            "session": ChatSession.objects.filter(tenant=tenant).first(),
+            "assistant_session": AssistantSession.objects.filter(tenant=tenant).first(),
+            "contact": WhatsAppContact.objects.filter(tenants=tenant).first(),
+            "payment": Payment.objects.filter(tenant=tenant).first(),
+        }
+
+    def hot_queries(self):
+        """`(nombre, queryset, tabla, índice esperado o None)` de cada consulta caliente, tal como la lanza el código."""
+        sample = self.sample
+        tenant, session = sample["tenant"], sample["session"]
+        return [
+            # 💬 Chat
+            ("chat: sesión activa del contacto",
+             ChatSession.objects.filter(tenant=tenant, phone_number=session.phone_number, is_active=True),
+             "chat_chatsession", "chat_session_active_phone_idx"),
+            ("chat: sesiones caducadas (reaper)",
+             ChatSession.objects.filter(is_active=True, last_interaction__lt=now() - timedelta(minutes=5)).order_by("last_interaction"),
+             "chat_chatsession", "chat_session_active_idle_idx"),
+            ("chat: historial del asistente",
+             sample["assistant_session"].messages.order_by("-timestamp")[:10],
+             "chat_conversationmessage", "conv_msg_assistant_ts_idx"),
+            ("chat: transcripción de la sesión",
+             ConversationMessage.objects.filter(chat_session_id=session.id).order_by("timestamp"),
+             "chat_conversationmessage", "conv_msg_chat_ts_idx"),
+            ("whatsapp: tenant del webhook",
+             Tenant.objects.filter(phone_number=tenant.phone_number),
+             "tenants_tenant", None),
+            # 🧾 Pedidos
+            ("pedidos: ingresos del tenant (24 h)",
+             Order.objects.filter(tenant=tenant, created_at__gte=now() - timedelta(hours=24), payment_status="PAID"),
+             "orders_order", "order_tenant_paystatus_idx"),
+            # 🖨️ Impresoras
+            ("impresoras: tenant del agente",
+             Tenant.objects.filter(phone_number_id=tenant.phone_number_id),
+             "tenants_tenant", None),
+            ("impresoras: tickets pendientes",
+             PrintTicket.objects.filter(status="PENDING", tenant=tenant),
+             "printers_printticket", "ticket_pending_tenant_idx"),
+            # 💳 Pagos
+            ("pagos: pago de la notificación de Redsys",
+             Payment.objects.filter(payment_id=sample["payment"].payment_id),
+             "payments_payment", None),
+            ("pagos: contacto del tenant",
+             WhatsAppContact.objects.filter(phone_number=sample["contact"].phone_number, tenants=tenant),
+             "whatsapp_whatsappcontact_tenants", None),
+        ]
 
-# Create your tests here.
+    def test_hot_queries_use_indexes(self):
+        for label, queryset, table, index in self.hot_queries():
+            with self.subTest(label):
+                plan = queryset.explain()
+                self.assertTrue(uses_index(plan, table, index), f"{label}: sin índice\n{plan}")
@@ -28,6 +28,95 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('SECRET_KEY')
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None  # None = API oficial de OpenAI
+
+# 📱 API Graph de WhatsApp (sustituible por el stand-in local: `python manage.py run_standins`)
+WHATSAPP_GRAPH_API_URL = (os.getenv("WHATSAPP_GRAPH_API_URL") or "https://graph.facebook.com/v22.0").rstrip("/")
+
+# 🛡️ Gateway de OpenAI: plazos, reintentos, hedging y circuit breaker
+OPENAI_GATEWAY = {
+    "DEADLINES": {  # Plazo total por llamada (segundos), según el propósito
+        "chat": float(os.getenv("OPENAI_DEADLINE_CHAT") or 25),
+        "detect": float(os.getenv("OPENAI_DEADLINE_DETECT") or 6),
+        "translate": float(os.getenv("OPENAI_DEADLINE_TRANSLATE") or 12),
+        "transcribe": float(os.getenv("OPENAI_DEADLINE_TRANSCRIBE") or 30),
+    },
+    "MAX_RETRIES": int(os.getenv("OPENAI_MAX_RETRIES") or 2),
+    "BACKOFF_BASE": float(os.getenv("OPENAI_BACKOFF_BASE") or 0.5),  # Segundos
+    "HEDGE_ENABLED": os.getenv("OPENAI_HEDGE_ENABLED") == "True",
+    "HEDGE_MIN_SAMPLES": int(os.getenv("OPENAI_HEDGE_MIN_SAMPLES") or 20),
+    "HEDGE_MAX_WORKERS": int(os.getenv("OPENAI_HEDGE_MAX_WORKERS") or 8),
+    "FALLBACK_MODEL": os.getenv("OPENAI_FALLBACK_MODEL") or "gpt-4o",
+    "FALLBACK_BUDGET": float(os.getenv("OPENAI_FALLBACK_BUDGET") or 0.4),  # Fracción del plazo reservada al respaldo
+    "BREAKER_FAILURE_THRESHOLD": int(os.getenv("OPENAI_BREAKER_FAILURE_THRESHOLD") or 5),
+    "BREAKER_RESET_TIMEOUT": float(os.getenv("OPENAI_BREAKER_RESET_TIMEOUT") or 30),
+}
+
+# 📋 Registro de solicitudes a OpenAI: escritura asíncrona por lotes
+OPENAI_REQUEST_LOG = {
+    "ASYNC": os.getenv("OPENAI_REQUEST_LOG_ASYNC", "True") == "True",
+    "BATCH_SIZE": int(os.getenv("OPENAI_REQUEST_LOG_BATCH_SIZE") or 50),
+    "FLUSH_INTERVAL": float(os.getenv("OPENAI_REQUEST_LOG_FLUSH_INTERVAL") or 2.0),  # Segundos
+}
+
+# 🗄️ Caché compartida por todos los procesos (web y reaper) con `REDIS_URL`; si no, caché en memoria de cada proceso.
+# Nunca en la BD: menú, prompt y sesiones se leen de aquí en cada mensaje para no consultarla.
+REDIS_URL = os.getenv("REDIS_URL") or None
+CACHES = {
+    "default": (
+        {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}
+        if REDIS_URL
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "w2w"}
+    ),
+    # Siempre en memoria del proceso: lo que se consulta en cada petición y tolera unos segundos de retraso
+    "local": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "w2w-local"},
+}
+
+# 💬 Sesiones activas en caché: resolver la sesión de un mensaje con una consulta y escribir en lote en segundo plano
+CHAT_SESSION_STORE = {
+    "TTL": int(os.getenv("CHAT_SESSION_STORE_TTL") or 900),  # Segundos; más que la inactividad que cierra la sesión
+    "ASYNC": os.getenv("CHAT_SESSION_STORE_ASYNC", "True") == "True",
+    "FLUSH_INTERVAL": float(os.getenv("CHAT_SESSION_STORE_FLUSH_INTERVAL") or 2.0),  # Segundos
+}
+
+# 💰 Precio por millón de tokens (entrada, salida) en USD, por prefijo de modelo
+OPENAI_MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# 🧭 Enrutado de turnos: modelo y contexto según la complejidad del mensaje
+ASSISTANT_ROUTER = {
+    "FULL_MODEL": os.getenv("ASSISTANT_FULL_MODEL") or "gpt-4o-mini",
+    "LIGHT_MODEL": os.getenv("ASSISTANT_LIGHT_MODEL") or "gpt-4o-mini",
+    "FULL_HISTORY": int(os.getenv("ASSISTANT_FULL_HISTORY") or 30),
+    "MENU_HISTORY": int(os.getenv("ASSISTANT_MENU_HISTORY") or 10),
+    "LIGHT_HISTORY": int(os.getenv("ASSISTANT_LIGHT_HISTORY") or 6),
+    "LIGHT_MAX_SCORE": float(os.getenv("ASSISTANT_LIGHT_MAX_SCORE") or 1.0),
+}
+
+# 🔗 Enlaces insertados en los huecos {{menu_link}} y {{policy_link}} del prompt
+ASSISTANT_PROMPT_LINKS = {
+    "MENU": os.getenv("ASSISTANT_MENU_URL") or "https://whats2want.onrender.com/menu/{tenant_id}/",  # Carta pública del tenant
+    "POLICY": os.getenv("ASSISTANT_POLICY_URL") or "https://politicas-y-derechos-de-uso.up.railway.app",
+}
+
+# 🔎 Recuperación del menú relevante: con cartas grandes solo se envían al modelo los productos afines al mensaje
+ASSISTANT_MENU_RETRIEVAL = {
+    "ENABLED": os.getenv("ASSISTANT_MENU_RETRIEVAL_ENABLED", "True") == "True",
+    "TOP_K": int(os.getenv("ASSISTANT_MENU_RETRIEVAL_TOP_K") or 15),
+    "MIN_ITEMS": int(os.getenv("ASSISTANT_MENU_RETRIEVAL_MIN_ITEMS") or 40),  # Con menos productos se envía el menú completo
+    "MIN_SCORE": float(os.getenv("ASSISTANT_MENU_RETRIEVAL_MIN_SCORE") or 0.3),  # Similitud mínima para considerar un producto relevante
+}
+
+# 📋 Tiempo máximo (segundos) que se cachea el menú de cada tenant; las señales lo invalidan antes si cambia
+MENU_CACHE_TTL = int(os.getenv("MENU_CACHE_TTL") or 3600)
+# 🌐 Versión del menú cacheada en cada proceso para la carta pública (ETag/304 sin BD ni Redis); cada cambio
+# la invalida en el proceso que lo hace y este TTL acota el retraso en los demás
+MENU_STATE_CACHE_TTL = int(os.getenv("MENU_STATE_CACHE_TTL") or 30)
+
+# 📏 Presupuesto de tokens para la parte estática del prompt (prompt del tenant + menú)
+ASSISTANT_PROMPT_BUDGET_TOKENS = int(os.getenv("ASSISTANT_PROMPT_BUDGET_TOKENS") or 6000)
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv("DEBUG", default="True")
@@ -158,6 +247,12 @@ REDSYS = {
     "URL_KO": os.getenv("REDSYS_URL_KO", default="https://tudominio.com/payments/failure/"),
 }
 
+# 🧠 Caché de respuestas informativas del asistente (opt-in por Tenant)
+ASSISTANT_RESPONSE_CACHE = {
+    "TTL": int(os.getenv("ASSISTANT_RESPONSE_CACHE_TTL") or 600),  # Segundos
+    "MAX_ENTRIES": int(os.getenv("ASSISTANT_RESPONSE_CACHE_MAX_ENTRIES") or 1000),
+}
+
 CSRF_TRUSTED_ORIGINS = [
     'http://localhost',   # Permitir desde localhost
     'http://127.0.0.1',   # Permitir acceso local
@@ -218,6 +313,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 EMAIL_BACKEND = os.getenv("EMAIL_BACKEND")
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 SENDGRID_FROM_EMAIL = os.getenv("SENDGRID_FROM_EMAIL")
+SENDGRID_HOST = os.getenv("SENDGRID_HOST") or "https://api.sendgrid.com"  # Sustituible por el stand-in local
 
 # Opcionales
 SENDGRID_SANDBOX_MODE_IN_DEBUG = False  # En True para pruebas sin enviar correos reales
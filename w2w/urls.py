@@ -19,12 +19,12 @@ from django.urls import path, include
 from django.conf.urls.i18n import i18n_patterns
 
 urlpatterns = [
+    path("admin/assistant/", include("apps.assistant.urls")),  # Antes de `admin/` para que no lo capture el admin
     path('admin/', admin.site.urls),
     path('menu/', include('apps.menu.urls')),
     path('whatsapp/', include('apps.whatsapp.urls')),
     path('payments/', include('apps.payments.urls')),
     path('printers/', include('apps.printers.urls')),
-    path("admin/assistant/", include("apps.assistant.urls")),
 ]
 
 # Ruta para cambiar idioma